@@ -1,7 +1,7 @@
 
 from app import app, db
-from models import Student
 from sqlalchemy import text
+from reconcile import run_and_report
 
 def add_concatenated_address_column():
     """Add concatenated_address column to students table and populate it"""
@@ -26,16 +26,8 @@ def add_concatenated_address_column():
                 db.session.commit()
                 print("✓ Added concatenated_address column to students table")
 
-            # Update existing records
-            students = Student.query.all()
-            updated_count = 0
-            
-            for student in students:
-                student.update_concatenated_address()
-                updated_count += 1
-
-            db.session.commit()
-            print(f"✓ Updated concatenated_address for {updated_count} students")
+            # Backfill existing records in one UPDATE (flask reconcile student-addresses)
+            run_and_report(['student-addresses'])
             
             # Verify the column exists
             result = db.session.execute(text("""
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add the fee rollover columns to college_fees:
+previous_dues (dues brought forward from the previous course level) and
+dues_carried_forward (set on the record those dues were taken from).
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+ROLLOVER_COLUMNS = [
+    ('previous_dues', 'NUMERIC(10, 2) DEFAULT 0'),
+    ('dues_carried_forward', 'BOOLEAN DEFAULT FALSE'),
+]
+
+def add_fee_rollover_columns():
+    """Add previous_dues and dues_carried_forward columns to college_fees table"""
+    with app.app_context():
+        try:
+            for column_name, column_type in ROLLOVER_COLUMNS:
+                # Check if column already exists
+                result = db.session.execute(text("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name = 'college_fees' 
+                    AND column_name = :column_name
+                """), {'column_name': column_name})
+                
+                if result.fetchone():
+                    print(f"✓ {column_name} column already exists")
+                    continue
+                
+                print(f"Adding {column_name} column to college_fees table...")
+                db.session.execute(text(f"""
+                    ALTER TABLE college_fees 
+                    ADD COLUMN {column_name} {column_type}
+                """))
+                print(f"✓ Successfully added {column_name} column")
+            
+            db.session.commit()
+                
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Error adding fee rollover columns: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    add_fee_rollover_columns()
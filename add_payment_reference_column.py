@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add payment_reference column to invoices table
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+def add_payment_reference_column():
+    """Add payment_reference column (unique bank/UPI reference) to invoices table"""
+    with app.app_context():
+        try:
+            # Check if column already exists
+            result = db.session.execute(text("""
+                SELECT column_name 
+                FROM information_schema.columns 
+                WHERE table_name = 'invoices' 
+                AND column_name = 'payment_reference'
+            """))
+            
+            if result.fetchone():
+                print("✓ payment_reference column already exists")
+                return
+            
+            print("Adding payment_reference column to invoices table...")
+            
+            db.session.execute(text("""
+                ALTER TABLE invoices 
+                ADD COLUMN payment_reference VARCHAR(100)
+            """))
+            
+            # Unique so the same statement row can never be posted twice
+            db.session.execute(text("""
+                ALTER TABLE invoices 
+                ADD CONSTRAINT invoices_payment_reference_key UNIQUE (payment_reference)
+            """))
+            
+            db.session.commit()
+            print("✓ Successfully added payment_reference column")
+                
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Error adding payment_reference column: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    add_payment_reference_column()
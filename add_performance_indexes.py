@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to add the indexes used by the /api/*-stats endpoints,
+with an EXPLAIN ANALYZE benchmark of the affected queries before and after.
+
+Indexes (created CONCURRENTLY, so tables stay writable):
+    students(admission_date), students(current_course), students(student_status),
+    college_fees(student_id), invoices(student_id, date_time), exams(student_id),
+    exams(percentage)
+
+The stats endpoints filter admission years with utils.year_range_filter
+(admission_date >= Jan 1 AND < Jan 1 next year), which can use the
+admission_date index; extract('year', admission_date) = year could not.
+
+Usage:
+    python add_performance_indexes.py            # benchmark, create indexes, benchmark again
+    python add_performance_indexes.py --explain  # benchmark only
+"""
+
+import json
+import sys
+from datetime import date
+
+from app import app, db
+from sqlalchemy import text
+
+PERFORMANCE_INDEXES = [
+    ('ix_students_admission_date', 'students', 'admission_date'),
+    ('ix_students_current_course', 'students', 'current_course'),
+    ('ix_students_student_status', 'students', 'student_status'),
+    ('ix_college_fees_student_id', 'college_fees', 'student_id'),
+    ('ix_invoices_student_id_date_time', 'invoices', 'student_id, date_time'),
+    ('ix_exams_student_id', 'exams', 'student_id'),
+    ('ix_exams_percentage', 'exams', 'percentage'),
+]
+
+BENCHMARK_QUERIES = [
+    ('Students admitted in year (extract)', """
+        SELECT COUNT(*) FROM students
+        WHERE EXTRACT(year FROM admission_date) = :year
+    """),
+    ('Students admitted in year (range)', """
+        SELECT COUNT(*) FROM students
+        WHERE admission_date >= :year_start AND admission_date < :next_year_start
+    """),
+    ('Active students by course', """
+        SELECT current_course, COUNT(*) FROM students
+        WHERE student_status = 'Active'
+        GROUP BY current_course
+    """),
+    ('Course collections for year', """
+        SELECT s.current_course, SUM(i.invoice_amount)
+        FROM students s JOIN invoices i ON i.student_id = s.id
+        WHERE s.admission_date >= :year_start AND s.admission_date < :next_year_start
+        GROUP BY s.current_course
+    """),
+    ('Fee record for student', """
+        SELECT * FROM college_fees WHERE student_id = :student_id
+    """),
+    ('Invoices for student by date', """
+        SELECT * FROM invoices WHERE student_id = :student_id ORDER BY date_time
+    """),
+    ('Exams for student', """
+        SELECT * FROM exams WHERE student_id = :student_id
+    """),
+    ('Top 10 exams by percentage', """
+        SELECT * FROM exams WHERE percentage IS NOT NULL
+        ORDER BY percentage DESC LIMIT 10
+    """),
+]
+
+
+def run_benchmark(label):
+    """EXPLAIN ANALYZE each benchmark query and print the plan root and timing"""
+    year = date.today().year
+    student_id = db.session.execute(text("SELECT COALESCE(MIN(id), 0) FROM students")).scalar()
+    params = {
+        'year': year,
+        'year_start': date(year, 1, 1),
+        'next_year_start': date(year + 1, 1, 1),
+        'student_id': student_id,
+    }
+
+    print(f"\n=== {label} ===")
+    timings = {}
+    for name, sql in BENCHMARK_QUERIES:
+        plan = db.session.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plan = plan[0]
+        scans = sorted(set(_scan_nodes(plan['Plan'])))
+        timings[name] = plan['Execution Time']
+        print(f"  {name:<40} {plan['Execution Time']:>9.3f} ms  {', '.join(scans)}")
+    db.session.rollback()
+    return timings
+
+
+def _scan_nodes(node):
+    """Scan node descriptions (e.g. 'Index Scan on students') in a JSON plan"""
+    if 'Scan' in node['Node Type']:
+        relation = node.get('Relation Name')
+        yield f"{node['Node Type']} on {relation}" if relation else node['Node Type']
+    for child in node.get('Plans', []):
+        yield from _scan_nodes(child)
+
+
+def add_performance_indexes():
+    """Create the stats indexes concurrently (skips any that already exist)"""
+    with app.app_context():
+        try:
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                for index_name, table_name, columns in PERFORMANCE_INDEXES:
+                    # Check if index already exists
+                    result = connection.execute(text("""
+                        SELECT indexname
+                        FROM pg_indexes
+                        WHERE tablename = :table_name
+                        AND indexname = :index_name
+                    """), {'table_name': table_name, 'index_name': index_name})
+
+                    if result.fetchone():
+                        print(f"✓ {index_name} already exists")
+                        continue
+
+                    print(f"Creating {index_name} on {table_name}({columns})...")
+                    connection.execute(text(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table_name} ({columns})"
+                    ))
+                    print(f"✓ Created {index_name}")
+
+                # Fresh statistics so the planner considers the new indexes
+                for table_name in sorted({table_name for _, table_name, _ in PERFORMANCE_INDEXES}):
+                    connection.execute(text(f"ANALYZE {table_name}"))
+                print("✓ Analyzed tables")
+
+        except Exception as e:
+            print(f"✗ Error adding performance indexes: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    with app.app_context():
+        before = run_benchmark("Before")
+
+    if '--explain' in sys.argv:
+        sys.exit(0)
+
+    add_performance_indexes()
+
+    with app.app_context():
+        after = run_benchmark("After")
+
+    print("\n=== Speedup ===")
+    for name, _ in BENCHMARK_QUERIES:
+        ratio = before[name] / after[name] if after[name] else float('inf')
+        print(f"  {name:<40} {before[name]:>9.3f} ms -> {after[name]:>9.3f} ms  ({ratio:.1f}x)")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+"""
+Migration script for indexed student search (see student_search.py):
+
+    - pg_trgm extension
+    - students.search_text generated column (ID, name and current course)
+    - ix_students_search_text_trgm: GiST trigram index on search_text, used by
+      ILIKE '%term%' and for ranking typeahead matches by trigram distance
+    - ix_students_unique_id_pattern: text_pattern_ops btree on
+      student_unique_id, used by LIKE 'PREFIX%'
+    - GIN trigram indexes on college_fees.course_full_name, exams.exam_name
+      and invoices.invoice_number, for the other half of the fees, exams and
+      invoices list searches (student_search.search_ids)
+
+Indexes are created CONCURRENTLY, so the tables stay writable.
+"""
+
+from app import app, db
+from models import STUDENT_SEARCH_TEXT_SQL
+from sqlalchemy import text
+
+SEARCH_INDEXES = [
+    ('students', 'ix_students_search_text_trgm', 'USING gist (search_text gist_trgm_ops)'),
+    ('students', 'ix_students_unique_id_pattern', '(student_unique_id text_pattern_ops)'),
+    ('college_fees', 'ix_college_fees_course_full_name_trgm', 'USING gin (course_full_name gin_trgm_ops)'),
+    ('exams', 'ix_exams_exam_name_trgm', 'USING gin (exam_name gin_trgm_ops)'),
+    ('invoices', 'ix_invoices_invoice_number_trgm', 'USING gin (invoice_number gin_trgm_ops)'),
+]
+
+def add_student_search_indexes():
+    """Add the search_text column and the student search indexes"""
+    with app.app_context():
+        try:
+            db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+            # Check if column already exists
+            result = db.session.execute(text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_name = 'students'
+                AND column_name = 'search_text'
+            """))
+
+            if result.fetchone():
+                print("✓ search_text column already exists")
+            else:
+                print("Adding search_text column to students table...")
+                db.session.execute(text(f"""
+                    ALTER TABLE students
+                    ADD COLUMN search_text TEXT GENERATED ALWAYS AS ({STUDENT_SEARCH_TEXT_SQL}) STORED
+                """))
+                print("✓ Successfully added search_text column")
+
+            db.session.commit()
+
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                for table, index_name, definition in SEARCH_INDEXES:
+                    # Check if index already exists
+                    result = connection.execute(text("""
+                        SELECT indexname
+                        FROM pg_indexes
+                        WHERE tablename = :table
+                        AND indexname = :index_name
+                    """), {'table': table, 'index_name': index_name})
+
+                    if result.fetchone():
+                        print(f"✓ {index_name} already exists")
+                        continue
+
+                    print(f"Creating {index_name}...")
+                    connection.execute(text(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table} {definition}"
+                    ))
+                    print(f"✓ Created {index_name}")
+
+                for table in dict.fromkeys(table for table, _, _ in SEARCH_INDEXES):
+                    connection.execute(text(f"ANALYZE {table}"))
+                print("✓ Analyzed search tables")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Error adding student search indexes: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    add_student_search_indexes()
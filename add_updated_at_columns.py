@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""
+Migration script for changed-since exports and /api/changes (see change_feed.py):
+
+    - updated_at column on students, courses, course_details, subjects,
+      college_fees, fee_payments, exams and user_profiles, backfilled from
+      created_at where there is one
+    - set_updated_at() trigger on each of them, so raw SQL writes move
+      updated_at too
+    - ix_<table>_updated_at index on each, created CONCURRENTLY
+"""
+
+from app import app, db
+from change_feed import SET_UPDATED_AT_FUNCTION_SQL, UPDATED_AT_TABLES, UPDATED_AT_TRIGGER_SQL
+from sqlalchemy import text
+
+def column_exists(table, column):
+    result = db.session.execute(text("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name = :table
+        AND column_name = :column
+    """), {'table': table, 'column': column})
+    return result.fetchone() is not None
+
+def add_updated_at_columns():
+    """Add updated_at, its trigger and its index to every synced table"""
+    with app.app_context():
+        try:
+            for table in UPDATED_AT_TABLES:
+                if column_exists(table, 'updated_at'):
+                    print(f"✓ {table}.updated_at already exists")
+                else:
+                    print(f"Adding updated_at column to {table} table...")
+                    db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP"))
+                    backfill = "created_at" if column_exists(table, 'created_at') else "NULL"
+                    result = db.session.execute(text(f"""
+                        UPDATE {table}
+                        SET updated_at = COALESCE({backfill}, timezone('utc', now()))
+                    """))
+                    print(f"✓ Added {table}.updated_at ({result.rowcount} rows backfilled)")
+
+                db.session.execute(text(f"""
+                    ALTER TABLE {table} ALTER COLUMN updated_at SET DEFAULT timezone('utc', now())
+                """))
+
+            db.session.execute(text(SET_UPDATED_AT_FUNCTION_SQL))
+            for table in UPDATED_AT_TABLES:
+                db.session.execute(text(UPDATED_AT_TRIGGER_SQL.format(table=table)))
+            db.session.commit()
+            print(f"✓ Installed set_updated_at() trigger on {len(UPDATED_AT_TABLES)} tables")
+
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                for table in UPDATED_AT_TABLES:
+                    index_name = f"ix_{table}_updated_at"
+
+                    # Check if index already exists
+                    result = connection.execute(text("""
+                        SELECT indexname
+                        FROM pg_indexes
+                        WHERE tablename = :table
+                        AND indexname = :index_name
+                    """), {'table': table, 'index_name': index_name})
+
+                    if result.fetchone():
+                        print(f"✓ {index_name} already exists")
+                        continue
+
+                    print(f"Creating {index_name}...")
+                    connection.execute(text(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table} (updated_at)"
+                    ))
+                    print(f"✓ Created {index_name}")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Error adding updated_at columns: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    add_updated_at_columns()
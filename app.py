@@ -60,7 +60,39 @@ def create_app():
     
     with app.app_context():
         # Import models to ensure tables are created
-        from models import UserProfile, UserRole, Student, Course, CourseDetails, Subject, CollegeFees, Invoice, Exam
+        from models import UserProfile, UserRole, Student, Course, CourseDetails, Subject, CollegeFees, FeePayment, Invoice, InvoiceSequence, StudentIdSequence, CacheVersion, Exam
+
+        # Recalculate fee totals for touched rows on every flush
+        import fee_calculations
+        fee_calculations.init_app(app)
+
+        # Rebuild a student's concatenated address when their address fields change
+        import student_address
+        student_address.init_app(app)
+
+        # Set-based repair commands (flask reconcile ...)
+        import reconcile
+        reconcile.init_app(app)
+
+        # Bulk payment posting command (flask post-payments ...)
+        import bulk_payments
+        bulk_payments.init_app(app)
+
+        # Course progression report (flask course-progression)
+        import promotion
+        promotion.init_app(app)
+
+        # Bump the filter facet cache when students, exams or fee records change
+        import facet_cache
+        facet_cache.init_app(app)
+
+        # Bump the exam dashboard cache when a student's course or admission date changes
+        import exam_analytics
+        exam_analytics.init_app(app)
+
+        # Install the updated_at trigger on newly created tables (changed-since exports, /api/changes)
+        import change_feed
+        change_feed.init_app(app)
         
         try:
             # Create database tables
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for invoice number allocation.
+
+Default mode hammers utils.allocate_invoice_numbers() from parallel threads and
+checks that every number handed out is unique.
+
+With --payments it fires parallel POSTs at the payment() view (one Flask test
+client per thread, logged in as admin) and then checks today's invoices for
+duplicate numbers. Payments are real writes, so only run this mode against a
+test database.
+
+Usage:
+    python benchmark_invoice_allocation.py [--workers 8] [--per-worker 50]
+    python benchmark_invoice_allocation.py --payments [--workers 8] [--amount 1]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app import app, db
+from models import CollegeFees, Invoice, Student, UserProfile
+from utils import allocate_invoice_numbers
+
+
+def benchmark_allocator(workers, per_worker):
+    """Allocate numbers from parallel threads and verify there are no duplicates"""
+
+    def allocate_batch(_):
+        with app.app_context():
+            started = time.perf_counter()
+            numbers = [allocate_invoice_numbers(1)[0] for _ in range(per_worker)]
+            return numbers, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(allocate_batch, range(workers)))
+    elapsed = time.perf_counter() - started
+
+    numbers = [number for batch, _ in results for number in batch]
+    worst_worker = max(seconds for _, seconds in results)
+
+    print("=== Allocator Benchmark ===")
+    print(f"Workers:              {workers}")
+    print(f"Numbers allocated:    {len(numbers)}")
+    print(f"Unique numbers:       {len(set(numbers))}")
+    print(f"Total time:           {elapsed:.3f}s")
+    print(f"Per allocation:       {elapsed / max(len(numbers), 1) * 1000:.2f}ms")
+    print(f"Slowest worker:       {worst_worker:.3f}s")
+
+    if len(numbers) == len(set(numbers)):
+        print("✓ No duplicate invoice numbers")
+        return True
+    print("✗ Duplicate invoice numbers were allocated")
+    return False
+
+
+def benchmark_payments(workers, amount):
+    """Fire parallel payment() POSTs and verify every invoice number is unique"""
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        import routes  # noqa: F401  (registers the payment view)
+
+        admin = UserProfile.query.filter_by(username='admin').first()
+        if not admin:
+            print("✗ Admin user not found")
+            return False
+
+        # One payment per student, each with a fee record to post against
+        student_ids = [
+            student_id for (student_id,) in db.session.query(Student.id)
+            .join(CollegeFees, CollegeFees.student_id == Student.id)
+            .filter(Student.student_status != 'Graduated')
+            .distinct().limit(workers).all()
+        ]
+        admin_id = admin.id
+
+    if not student_ids:
+        print("✗ No students with fee records found")
+        return False
+
+    def post_payment(student_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+        started = time.perf_counter()
+        response = client.post('/fees/payment', data={
+            'student_id': student_id,
+            'amount': amount,
+            'payment_mode': 'Cash',
+        })
+        succeeded = response.status_code == 302 and '/fees/view/' in response.headers.get('Location', '')
+        return succeeded, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(student_ids)) as executor:
+        results = list(executor.map(post_payment, student_ids))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        pattern = f"INV{datetime.now().strftime('%Y%m%d')}%"
+        duplicates = db.session.query(Invoice.invoice_number, func.count(Invoice.id)) \
+            .filter(Invoice.invoice_number.like(pattern)) \
+            .group_by(Invoice.invoice_number) \
+            .having(func.count(Invoice.id) > 1).all()
+
+    succeeded = sum(1 for ok, _ in results if ok)
+    print("=== Payment Benchmark ===")
+    print(f"Parallel payments:    {len(results)}")
+    print(f"Succeeded:            {succeeded}")
+    print(f"Failed:               {len(results) - succeeded}")
+    print(f"Total time:           {elapsed:.3f}s")
+    print(f"Slowest payment:      {max(seconds for _, seconds in results):.3f}s")
+
+    if succeeded == len(results) and not duplicates:
+        print("✓ All payments succeeded with unique invoice numbers")
+        return True
+    if duplicates:
+        print(f"✗ Duplicate invoice numbers today: {[number for number, _ in duplicates]}")
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Invoice number allocation benchmark")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--per-worker', type=int, default=50)
+    parser.add_argument('--payments', action='store_true', help='Benchmark parallel payment() POSTs (writes data)')
+    parser.add_argument('--amount', type=float, default=1)
+    args = parser.parse_args()
+
+    if args.payments:
+        benchmark_payments(args.workers, args.amount)
+    else:
+        benchmark_allocator(args.workers, args.per_worker)
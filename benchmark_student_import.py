@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Timing benchmark for the student import (import_students_data).
+
+Builds an admission sheet of N synthetic students (unique IDs 'BIMP-nnnnnn',
+a share of them repeating a name so the duplicate warnings are exercised),
+imports it the way /import/students does, and reports the time per stage
+against a target of 10 seconds for 10k rows. The imported students are
+deleted again afterwards unless --keep is given.
+
+Usage:
+    python benchmark_student_import.py [--rows 10000] [--keep]
+    python benchmark_student_import.py --cleanup
+"""
+
+import argparse
+import time
+
+from sqlalchemy import text
+
+from app import app, db
+from bulk_operations import _student_import_frame, import_students_data
+
+TARGET_SECONDS = 10
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Ayaan', 'Krishna', 'Ishaan',
+               'Ananya', 'Diya', 'Priya', 'Kavya', 'Aanya', 'Saanvi', 'Meera', 'Pooja', 'Neha', 'Riya']
+LAST_NAMES = ['Sharma', 'Verma', 'Gupta', 'Singh', 'Kumar', 'Soni', 'Jain', 'Agarwal', 'Mehta', 'Choudhary']
+COURSES = ['B.A. - 1st Year', 'B.Sc. - 1st Year', 'B.Com. - 1st Year']
+
+
+def build_records(count):
+    """Admission sheet rows, shaped like process_import_file's df.to_dict('records')"""
+    records = []
+    for n in range(1, count + 1):
+        records.append({
+            'Student ID': f'BIMP-{n:06d}',
+            'First Name': FIRST_NAMES[n % len(FIRST_NAMES)],
+            'Last Name': LAST_NAMES[(n // 7) % len(LAST_NAMES)],
+            'Father Name': f'Father {n % (count // 2 or 1)}',
+            'Gender': 'Male' if n % 2 else 'Female',
+            'Category': 'General',
+            'Current Course': COURSES[n % len(COURSES)],
+            'Percentage': 40 + n % 60,
+            'Street': f'{n} Station Road',
+            'Area/Village': 'Ward 4',
+            'City/Tehsil': 'Bikaner',
+            'State': 'Rajasthan',
+            'Phone': float(9000000000 + n),
+            'Admission Date': '2025-07-01',
+        })
+    return records
+
+
+def cleanup_students():
+    """Delete the synthetic BIMP- students"""
+    result = db.session.execute(text("DELETE FROM students WHERE student_unique_id LIKE 'BIMP-%'"))
+    db.session.commit()
+    print(f"✓ Deleted {result.rowcount} benchmark students")
+
+
+def benchmark_import(count, keep=False):
+    """Time the import of count rows and check it against TARGET_SECONDS"""
+    records = build_records(count)
+    print("=== Student Import Benchmark ===")
+    print(f"Rows:                 {count}")
+
+    started = time.perf_counter()
+    _student_import_frame(records)
+    print(f"Normalise + validate: {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    success, message = import_students_data(records)
+    elapsed = time.perf_counter() - started
+    print(f"Full import:          {elapsed:.2f}s")
+    print(message.splitlines()[0])
+
+    if not keep:
+        cleanup_students()
+
+    if success and elapsed < TARGET_SECONDS:
+        print(f"✓ Imported {count} rows in under {TARGET_SECONDS}s")
+        return True
+    print(f"✗ Import took {elapsed:.2f}s (target {TARGET_SECONDS}s)" if success else f"✗ {message}")
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Student import timing benchmark")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--keep', action='store_true', help='Keep the imported students')
+    parser.add_argument('--cleanup', action='store_true', help='Delete the synthetic students and exit')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.cleanup:
+            cleanup_students()
+        else:
+            benchmark_import(args.rows, keep=args.keep)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the student typeahead (/api/search-students).
+
+Runs student_search.search_students() for a set of typeahead terms (ID
+prefixes, partial first/last names, full names, courses and terms with no
+match), reports p50/p95/max per term and prints the EXPLAIN ANALYZE plan of
+the slowest one. The target is under 10ms per keystroke at 100k students.
+
+--seed N first inserts N synthetic students (unique IDs 'BENCH-nnnnnn') with
+one INSERT ... SELECT generate_series so the benchmark can run at scale on a
+test database; --cleanup deletes them again. Run add_student_search_indexes.py
+before benchmarking.
+
+Usage:
+    python benchmark_student_search.py [--repeat 50]
+    python benchmark_student_search.py --seed 100000 [--repeat 50]
+    python benchmark_student_search.py --cleanup
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app import app, db
+from student_search import TYPEAHEAD_SQL, TYPEAHEAD_LIMIT, search_students
+
+TARGET_MS = 10
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Ayaan', 'Krishna', 'Ishaan',
+               'Ananya', 'Diya', 'Priya', 'Kavya', 'Aanya', 'Saanvi', 'Meera', 'Pooja', 'Neha', 'Riya']
+LAST_NAMES = ['Sharma', 'Verma', 'Gupta', 'Singh', 'Kumar', 'Soni', 'Jain', 'Agarwal', 'Mehta', 'Choudhary',
+              'Rathore', 'Shekhawat', 'Joshi', 'Mathur', 'Saxena']
+COURSES = ['B.A. - 1st Year', 'B.A. - 2nd Year', 'B.Sc. - 1st Year', 'B.Com. - 3rd Year', 'M.A. - 1st Sem']
+
+TERMS = ['BE', 'BENCH-0', 'BENCH-05', 'BENCH-0500', 'ar', 'arj', 'Arjun', 'Arjun Sha', 'sharma',
+         'meera soni', 'kum', 'B.Sc', 'zzqx', 'Xyzzy Nobody']
+
+SEED_SQL = """
+    INSERT INTO students (student_unique_id, first_name, last_name, gender, current_course,
+                          student_status, admission_date, created_at)
+    SELECT 'BENCH-' || lpad(n::text, 6, '0'),
+           (:first_names)[1 + n % cardinality(:first_names)],
+           (:last_names)[1 + (n / 7) % cardinality(:last_names)],
+           CASE WHEN n % 2 = 0 THEN 'Male' ELSE 'Female' END,
+           (:courses)[1 + (n / 3) % cardinality(:courses)],
+           CASE WHEN n % 10 = 0 THEN 'Graduated' ELSE 'Active' END,
+           CURRENT_DATE, NOW()
+    FROM generate_series(1, :count) AS n
+    ON CONFLICT (student_unique_id) DO NOTHING
+"""
+
+
+def seed_students(count):
+    """Insert count synthetic BENCH- students in one statement"""
+    started = time.perf_counter()
+    result = db.session.execute(text(SEED_SQL), {
+        'first_names': FIRST_NAMES, 'last_names': LAST_NAMES, 'courses': COURSES, 'count': count,
+    })
+    db.session.commit()
+    db.session.execute(text("ANALYZE students"))
+    db.session.commit()
+    print(f"✓ Seeded {result.rowcount} students in {time.perf_counter() - started:.1f}s")
+
+
+def cleanup_students():
+    """Delete the synthetic BENCH- students"""
+    result = db.session.execute(text("DELETE FROM students WHERE student_unique_id LIKE 'BENCH-%'"))
+    db.session.commit()
+    print(f"✓ Deleted {result.rowcount} benchmark students")
+
+
+def explain(term):
+    """EXPLAIN ANALYZE of the typeahead query for one term"""
+    params = {'prefix': f'{term.upper()}%', 'pattern': f'%{term}%', 'term': term, 'limit': TYPEAHEAD_LIMIT}
+    plan = db.session.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {TYPEAHEAD_SQL}"), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def benchmark_search(repeat):
+    """Time search_students() for every term and check the p95 against TARGET_MS"""
+    student_count = db.session.execute(text("SELECT COUNT(*) FROM students")).scalar()
+    print("=== Student Typeahead Benchmark ===")
+    print(f"Students:             {student_count}")
+    print(f"Runs per term:        {repeat}")
+    print(f"\n  {'Term':<16}{'Hits':>6}{'p50':>10}{'p95':>10}{'max':>10}")
+
+    worst_term, worst_p95 = None, 0
+    for term in TERMS:
+        search_students(term)  # warm up
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            hits = search_students(term)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        if p95 > worst_p95:
+            worst_term, worst_p95 = term, p95
+        print(f"  {term:<16}{len(hits):>6}{p50:>8.2f}ms{p95:>8.2f}ms{timings[-1]:>8.2f}ms")
+
+    plan = explain(worst_term)
+    print(f"\nSlowest term '{worst_term}': planning {plan['Planning Time']:.2f}ms, "
+          f"execution {plan['Execution Time']:.2f}ms")
+    db.session.rollback()
+
+    if worst_p95 < TARGET_MS:
+        print(f"✓ Every term's p95 is under {TARGET_MS}ms")
+        return True
+    print(f"✗ p95 of '{worst_term}' is {worst_p95:.2f}ms (target {TARGET_MS}ms)")
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Student typeahead latency benchmark")
+    parser.add_argument('--seed', type=int, default=0, help='Insert this many synthetic students first')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--cleanup', action='store_true', help='Delete the synthetic students and exit')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.cleanup:
+            cleanup_students()
+        else:
+            if args.seed:
+                seed_students(args.seed)
+            benchmark_search(args.repeat)
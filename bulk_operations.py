@@ -1,71 +1,237 @@
 import csv
 import json
 import io
+import itertools
+import tempfile
+import textwrap
 import pandas as pd
-from flask import make_response, request, flash
+from flask import Response, request, flash, send_file, stream_with_context
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 from werkzeug.utils import secure_filename
-from models import Student, Course, CourseDetails, Subject, UserProfile, CollegeFees, Exam, Invoice
+from models import Student, Course, CourseDetails, Subject, UserProfile, CollegeFees, FeePayment, Exam, Invoice
+from models import build_concatenated_address
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from app import db
+from utils import allocate_student_ids
+import catalog_cache
+from fee_ledger import record_payment, pad_payment_slots
+from exam_analytics import invalidate_exam_dashboard
+from change_feed import since_filter
+from facet_cache import invalidate_facets
+from student_address import ADDRESS_FIELDS
 from datetime import datetime, date
 import uuid
+from decimal import Decimal
 
-def export_to_csv(data, headers, filename):
-    """Export data to CSV format"""
-    output = io.StringIO()
-    writer = csv.writer(output)
+EXPORT_BATCH_SIZE = 1000  # rows fetched per round trip from the server-side cursor
+EXPORT_ROWS_PER_CHUNK = 500  # rows written per chunk of a streamed response
 
-    # Write headers
-    writer.writerow(headers)
+_END = object()
 
-    # Write data
-    for row in data:
-        writer.writerow(row)
+def _start_rows(data):
+    """Start an export's row iterator, so query errors surface before the response starts streaming"""
+    rows = iter(data)
+    first = next(rows, _END)
+    if first is _END:
+        return iter(())
+    return itertools.chain([first], rows)
 
-    output.seek(0)
-    response = make_response(output.getvalue())
+def _streaming_response(chunks, filename, content_type):
+    """Stream chunks as a file download, keeping the request (and its DB session) open until the end"""
+    response = Response(stream_with_context(chunks), mimetype=content_type)
     response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-    response.headers['Content-Type'] = 'text/csv'
-
     return response
 
-def export_to_excel(data, headers, filename):
-    """Export data to Excel format"""
-    df = pd.DataFrame(data, columns=headers)
-
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Data')
+def _row_dict(headers, row):
+    return {header: row[i] if i < len(row) else None for i, header in enumerate(headers)}
 
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+def export_to_csv(data, headers, filename):
+    """Export data to CSV format, streamed a chunk of rows at a time"""
+    rows = _start_rows(data)
+
+    def generate():
+        output = io.StringIO()
+        writer = csv.writer(output)
+
+        # Headers go out straight away
+        writer.writerow(headers)
+
+        for i, row in enumerate(rows):
+            if i % EXPORT_ROWS_PER_CHUNK == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+            writer.writerow(row)
+
+        yield output.getvalue()
+
+    return _streaming_response(generate(), filename, 'text/csv')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+XLSX_DATE_FORMAT = 'yyyy-mm-dd'
+XLSX_DATETIME_FORMAT = 'yyyy-mm-dd hh:mm'
+
+def _xlsx_cell(sheet, value):
+    """Typed cell for a write-only sheet: numbers and dates stay numbers and dates"""
+    if isinstance(value, (date, datetime)):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.number_format = XLSX_DATETIME_FORMAT if isinstance(value, datetime) else XLSX_DATE_FORMAT
+        return cell
+    if value == '':
+        return None  # Blank rather than an empty string cell
+    return value
+
+def write_xlsx_sheets(sheets, output):
+    """Write [(title, rows, headers)] to output as an XLSX workbook, one row at a time.
+
+    openpyxl's write-only mode spools each sheet's rows to a temporary file as
+    they are appended, so memory stays flat however many rows the generators yield.
+    """
+    workbook = Workbook(write_only=True)
+    for title, rows, headers in sheets:
+        sheet = workbook.create_sheet(title=title[:31])  # Excel's sheet name limit
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(sheet, value=header)
+            cell.font = Font(bold=True)
+            header_cells.append(cell)
+        sheet.append(header_cells)
+        for row in rows:
+            sheet.append([_xlsx_cell(sheet, value) for value in row])
+    workbook.save(output)
+
+def export_workbook(sheets, filename):
+    """Export several datasets as one XLSX download, one sheet each: [(title, rows, headers)]"""
+    output = tempfile.TemporaryFile()
+    try:
+        write_xlsx_sheets(sheets, output)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+    # send_file streams the finished workbook from disk and closes the file afterwards
+    return send_file(output, mimetype=XLSX_CONTENT_TYPE, as_attachment=True, download_name=filename)
 
-    return response
+def export_to_excel(data, headers, filename):
+    """Export data to Excel format"""
+    return export_workbook([('Data', data, headers)], filename)
 
 def export_to_json(data, headers, filename):
-    """Export data to JSON format"""
-    json_data = []
-    for row in data:
-        row_dict = {}
-        for i, header in enumerate(headers):
-            if i < len(row):
-                row_dict[header] = row[i]
-            else:
-                row_dict[header] = None
-        json_data.append(row_dict)
-
-    json_string = json.dumps(json_data, indent=2, default=str)
-
-    response = make_response(json_string)
-    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-    response.headers['Content-Type'] = 'application/json'
-
-    return response
-
-def get_students_export_data():
-    """Get students data for export"""
-    students = Student.query.all()
+    """Export data to JSON format (one array, laid out as json.dumps(indent=2) would), streamed"""
+    rows = _start_rows(data)
+
+    def generate():
+        chunk = ['[']
+        row_count = 0
+        for row in rows:
+            item = textwrap.indent(json.dumps(_row_dict(headers, row), indent=2, default=str), '  ')
+            chunk.append((',\n' if row_count else '\n') + item)
+            row_count += 1
+            if row_count % EXPORT_ROWS_PER_CHUNK == 1:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append('\n]' if row_count else ']')
+        yield ''.join(chunk)
+
+    return _streaming_response(generate(), filename, 'application/json')
+
+def export_to_ndjson(data, headers, filename):
+    """Export data as newline-delimited JSON (one object per line), streamed"""
+    rows = _start_rows(data)
+
+    def generate():
+        chunk = []
+        for row in rows:
+            chunk.append(json.dumps(_row_dict(headers, row), default=str) + '\n')
+            if len(chunk) == EXPORT_ROWS_PER_CHUNK:
+                yield ''.join(chunk)
+                chunk = []
+        yield ''.join(chunk)
+
+    return _streaming_response(generate(), filename, 'application/x-ndjson')
+
+# Arrow types for the exported columns, by header; anything not listed is a string column
+ARROW_DECIMAL_COLUMNS = {
+    'Percentage', 'Total Fee', 'Paid Amount', 'Due Amount', 'Amount', 'Course Tuition Fee',
+    'Total Course Fees', *(f'Installment {i}' for i in range(1, 7)), *(f'Misc Fee {i}' for i in range(1, 7)),
+}
+ARROW_INTEGER_COLUMNS = {
+    'Course ID', 'ID', 'User ID', 'Duration (Years)', 'Total Max Marks', 'Total Obtained',
+    *(f'Subject {i} Max' for i in range(1, 7)), *(f'Subject {i} Obtained' for i in range(1, 7)),
+}
+ARROW_DATE_COLUMNS = {'Admission Date', 'Invoice Date', 'Exam Date', 'Created Date'}
+ARROW_DECIMAL_PRECISION, ARROW_DECIMAL_SCALE = 12, 2
+
+def _import_pyarrow():
+    """pyarrow is optional (pip install '.[analytics]'); only the columnar formats need it"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet and Arrow exports need pyarrow: pip install '.[analytics]'")
+    return pyarrow
+
+def _arrow_column(pa, header):
+    """(field, value converter) for one exported column"""
+    if header in ARROW_DECIMAL_COLUMNS:
+        cent = Decimal(1).scaleb(-ARROW_DECIMAL_SCALE)
+        return (pa.field(header, pa.decimal128(ARROW_DECIMAL_PRECISION, ARROW_DECIMAL_SCALE)),
+                lambda value: Decimal(str(value)).quantize(cent))
+    if header in ARROW_INTEGER_COLUMNS:
+        return pa.field(header, pa.int64()), int
+    if header in ARROW_DATE_COLUMNS:
+        return pa.field(header, pa.date32()), lambda value: value.date() if isinstance(value, datetime) else value
+    return pa.field(header, pa.string()), str
+
+def _arrow_batches(pa, rows, schema, converters):
+    """RecordBatches of EXPORT_BATCH_SIZE rows; blanks become nulls"""
+    for batch in iter(lambda: list(itertools.islice(rows, EXPORT_BATCH_SIZE)), []):
+        columns = [
+            [None if value is None or value == '' else convert(value) for value in column]
+            for column, convert in zip(zip(*batch), converters)
+        ]
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        )
+
+def _export_columnar(data, headers, filename, format):
+    """Write rows as Parquet or Arrow IPC, one record batch at a time, then send the file"""
+    pa = _import_pyarrow()
+    fields, converters = zip(*(_arrow_column(pa, header) for header in headers))
+    schema = pa.schema(fields)
+    rows = iter(data)
+
+    output = tempfile.TemporaryFile()
+    try:
+        if format == 'parquet':
+            writer = pa.parquet.ParquetWriter(output, schema, compression='zstd')
+            content_type = 'application/vnd.apache.parquet'
+        else:
+            writer = pa.ipc.new_file(output, schema)
+            content_type = 'application/vnd.apache.arrow.file'
+        with writer:
+            for batch in _arrow_batches(pa, rows, schema, converters):
+                writer.write_batch(batch)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+    return send_file(output, mimetype=content_type, as_attachment=True, download_name=filename)
+
+def export_to_parquet(data, headers, filename):
+    """Export data as a typed Parquet file (decimal, integer and date columns kept as such)"""
+    return _export_columnar(data, headers, filename, 'parquet')
+
+def export_to_arrow(data, headers, filename):
+    """Export data as a typed Arrow IPC file"""
+    return _export_columnar(data, headers, filename, 'arrow')
+
+def get_students_export_data(since=None):
+    """Get students data for export, streamed from a server-side cursor"""
     headers = [
         'Student ID', 'External ID', 'First Name', 'Last Name', 'Father Name', 'Mother Name',
         'Gender', 'Category', 'Email', 'Current Course', 'Subject 1', 'Subject 2', 'Subject 3',
@@ -74,47 +240,59 @@ def get_students_export_data():
         'Meera Rebate Status', 'Student Status', 'Admission Date'
     ]
 
-    data = []
-    for student in students:
-        # Always update concatenated_address before export to ensure it's current
-        student.update_concatenated_address()
-        db.session.commit()  # Save the updated concatenated address
-        
-        data.append([
-            student.student_unique_id,
-            student.external_id or '',
-            student.first_name,
-            student.last_name,
-            student.father_name or '',
-            student.mother_name or '',
-            student.gender,
-            student.category or '',
-            student.email or '',
-            student.current_course or '',
-            student.subject_1_name or '',
-            student.subject_2_name or '',
-            student.subject_3_name or '',
-            float(student.percentage) if student.percentage else '',
-            student.street or '',
-            student.area_village or '',
-            student.city_tehsil or '',
-            student.state or '',
-            student.concatenated_address or '',
-            student.phone or '',
-            student.aadhaar_card_number or '',
-            student.apaar_id or '',
-            student.school_name or '',
-            student.scholarship_status or '',
-            student.rebate_meera_scholarship_status or '',
-            student.student_status or 'Active',
-            student.admission_date.strftime('%Y-%m-%d') if student.admission_date else ''
-        ])
+    students = db.session.query(
+        Student.student_unique_id, Student.external_id, Student.first_name, Student.last_name,
+        Student.father_name, Student.mother_name, Student.gender, Student.category, Student.email,
+        Student.current_course, Student.subject_1_name, Student.subject_2_name, Student.subject_3_name,
+        Student.percentage, Student.street, Student.area_village, Student.city_tehsil, Student.state,
+        Student.concatenated_address, Student.phone, Student.aadhaar_card_number, Student.apaar_id, Student.school_name,
+        Student.scholarship_status, Student.rebate_meera_scholarship_status, Student.student_status,
+        Student.admission_date
+    )
+    if since:
+        students = students.filter(since_filter(Student, since))
+    students = students.order_by(Student.id).yield_per(EXPORT_BATCH_SIZE)
+
+    def rows():
+        for student in students:
+            yield [
+                student.student_unique_id,
+                student.external_id or '',
+                student.first_name,
+                student.last_name,
+                student.father_name or '',
+                student.mother_name or '',
+                student.gender,
+                student.category or '',
+                student.email or '',
+                student.current_course or '',
+                student.subject_1_name or '',
+                student.subject_2_name or '',
+                student.subject_3_name or '',
+                float(student.percentage) if student.percentage else '',
+                student.street or '',
+                student.area_village or '',
+                student.city_tehsil or '',
+                student.state or '',
+                student.concatenated_address or '',  # Maintained on write by student_address
+                student.phone or '',
+                student.aadhaar_card_number or '',
+                student.apaar_id or '',
+                student.school_name or '',
+                student.scholarship_status or '',
+                student.rebate_meera_scholarship_status or '',
+                student.student_status or 'Active',
+                student.admission_date or ''
+            ]
 
-    return data, headers
+    return rows(), headers
 
-def get_courses_export_data():
+def get_courses_export_data(since=None):
     """Get courses data for export"""
-    courses = Course.query.all()
+    query = Course.query
+    if since:
+        query = query.filter(since_filter(Course, since))
+    courses = query.all()
     headers = ['Course ID', 'Short Name', 'Full Name', 'Category', 'Duration (Years)']
 
     data = []
@@ -129,9 +307,12 @@ def get_courses_export_data():
 
     return data, headers
 
-def get_course_details_export_data():
+def get_course_details_export_data(since=None):
     """Get course details data for export"""
-    course_details = CourseDetails.query.all()
+    query = CourseDetails.query
+    if since:
+        query = query.filter(since_filter(CourseDetails, since))
+    course_details = query.all()
     headers = [
         'ID', 'Course Full Name', 'Course Short Name', 'Year/Semester', 
         'Course Tuition Fee', 'Course Type', 'Misc Fee 1', 'Misc Fee 2', 
@@ -158,81 +339,102 @@ def get_course_details_export_data():
 
     return data, headers
 
-def get_fees_export_data():
-    """Get fees data for export"""
-    fees = db.session.query(CollegeFees, Student).join(Student).all()
+def get_fees_export_data(since=None):
+    """Get fees data for export, streamed from a server-side cursor"""
+    # First payments of each fee record, in installment order, as one array column
+    payment_amounts = select(
+        func.array_agg(aggregate_order_by(FeePayment.amount, FeePayment.installment_number))
+    ).where(FeePayment.fee_id == CollegeFees.id).correlate(CollegeFees).scalar_subquery()
+
+    fees = db.session.query(
+        Student.student_unique_id, Student.first_name, Student.last_name, Student.current_course,
+        CollegeFees.total_fee, CollegeFees.total_fees_paid, CollegeFees.total_amount_due,
+        payment_amounts.label('payment_amounts')
+    ).select_from(CollegeFees).join(Student, CollegeFees.student_id == Student.id)
+    if since:
+        fees = fees.filter(since_filter(CollegeFees, since))
+    fees = fees.order_by(CollegeFees.id).yield_per(EXPORT_BATCH_SIZE)
     headers = [
         'Student ID', 'Student Name', 'Course', 'Total Fee', 'Paid Amount', 'Due Amount',
         'Installment 1', 'Installment 2', 'Installment 3', 'Installment 4', 
         'Installment 5', 'Installment 6', 'Payment Status'
     ]
 
-    data = []
-    for fee, student in fees:
-        # Use database-calculated values directly
-        paid_amount = float(fee.total_fees_paid or 0)
-        total_fee = float(fee.total_fee or 0)
-        due_amount = total_fee - paid_amount
-
-        payment_status = 'Paid' if due_amount <= 0 else ('Partial' if paid_amount > 0 else 'Pending')
-
-        data.append([
-            student.student_unique_id,
-            f"{student.first_name} {student.last_name}",
-            student.current_course or '',
-            total_fee,
-            paid_amount,
-            due_amount,
-            float(fee.installment_1 or 0),
-            float(fee.installment_2 or 0),
-            float(fee.installment_3 or 0),
-            float(fee.installment_4 or 0),
-            float(fee.installment_5 or 0),
-            float(fee.installment_6 or 0),
-            payment_status
-        ])
-
-    return data, headers
+    def rows():
+        for fee in fees:
+            # Use database-calculated values directly; total_amount_due includes
+            # previous dues and is zero once they are carried forward
+            paid_amount = float(fee.total_fees_paid or 0)
+            total_fee = float(fee.total_fee or 0)
+            due_amount = float(fee.total_amount_due or 0)
+
+            payment_status = 'Paid' if due_amount <= 0 else ('Partial' if paid_amount > 0 else 'Pending')
+
+            yield [
+                fee.student_unique_id,
+                f"{fee.first_name} {fee.last_name}",
+                fee.current_course or '',
+                total_fee,
+                paid_amount,
+                due_amount,
+                *pad_payment_slots(fee.payment_amounts),  # First six ledger payments
+                payment_status
+            ]
 
-def get_invoices_export_data():
-    """Get invoices data for export"""
-    fees = db.session.query(CollegeFees, Student).join(Student).all()
+    return rows(), headers
+
+def get_invoices_export_data(since=None):
+    """Get invoices data for export, streamed from a server-side cursor"""
+    # One row per payment in the ledger
+    payments = db.session.query(
+        FeePayment.invoice_number, FeePayment.installment_number, FeePayment.paid_at,
+        FeePayment.amount, FeePayment.payment_mode,
+        Student.student_unique_id, Student.first_name, Student.last_name, Student.current_course
+    ).select_from(FeePayment) \
+        .join(CollegeFees, FeePayment.fee_id == CollegeFees.id) \
+        .join(Student, CollegeFees.student_id == Student.id) \
+        .filter(FeePayment.amount > 0)
+    if since:
+        payments = payments.filter(since_filter(FeePayment, since))
+    payments = payments.order_by(FeePayment.fee_id, FeePayment.installment_number).yield_per(EXPORT_BATCH_SIZE)
     headers = [
         'Invoice Number', 'Student ID', 'Student Name', 'Course', 'Invoice Date',
         'Amount', 'Payment Mode', 'Status', 'Academic Year'
     ]
 
-    data = []
-    for fee, student in fees:
-        # Create invoice records for each installment
-        installments = [
-            (fee.installment_1, fee.invoice1_number, 'Installment 1'),
-            (fee.installment_2, fee.invoice2_number, 'Installment 2'),
-            (fee.installment_3, fee.invoice3_number, 'Installment 3'),
-            (fee.installment_4, fee.invoice4_number, 'Installment 4'),
-            (fee.installment_5, fee.invoice5_number, 'Installment 5'),
-            (fee.installment_6, fee.invoice6_number, 'Installment 6')
-        ]
-
-        for amount, invoice_num, installment_type in installments:
-            if amount and amount > 0:
-                data.append([
-                    invoice_num or f"INV-{student.student_unique_id}-{installment_type.replace(' ', '').lower()}",
-                    student.student_unique_id,
-                    f"{student.first_name} {student.last_name}",
-                    student.current_course or '',
-                    fee.created_at.strftime('%Y-%m-%d') if fee.created_at else '',
-                    float(amount),
-                    'Cash',  # Default payment mode
-                    'Paid',
-                    '2024-25'  # Default academic year
-                ])
-
-    return data, headers
+    def rows():
+        for payment in payments:
+            installment_type = f"Installment {payment.installment_number}"
+            yield [
+                payment.invoice_number or f"INV-{payment.student_unique_id}-{installment_type.replace(' ', '').lower()}",
+                payment.student_unique_id,
+                f"{payment.first_name} {payment.last_name}",
+                payment.current_course or '',
+                payment.paid_at.date() if payment.paid_at else '',
+                float(payment.amount),
+                payment.payment_mode or 'Cash',
+                'Paid',
+                '2024-25'  # Default academic year
+            ]
 
-def get_exams_export_data():
-    """Get exam data for export"""
-    exams = db.session.query(Exam, Student).join(Student).all()
+    return rows(), headers
+
+def get_exams_export_data(since=None):
+    """Get exam data for export, streamed from a server-side cursor"""
+    subject_columns = []
+    for i in range(1, 7):
+        subject_columns += [getattr(Exam, f'subject{i}_name'), getattr(Exam, f'subject{i}_max_marks'),
+                            getattr(Exam, f'subject{i}_obtained_marks')]
+
+    exams = db.session.query(
+        Student.student_unique_id, Student.first_name, Student.last_name, Student.current_course,
+        Exam.course_full_name, Exam.exam_name, Exam.semester, Exam.exam_date,
+        *subject_columns,
+        Exam.total_max_marks, Exam.total_obtained_marks, Exam.percentage, Exam.grade, Exam.overall_status
+    ).select_from(Exam).join(Student, Exam.student_id == Student.id)
+    if since:
+        exams = exams.filter(since_filter(Exam, since))
+    exams = exams.order_by(Exam.id).yield_per(EXPORT_BATCH_SIZE)
 
     headers = [
         'Student ID', 'Student Name', 'Course', 'Exam Name', 'Semester', 'Exam Date',
@@ -245,46 +447,39 @@ def get_exams_export_data():
         'Total Max Marks', 'Total Obtained', 'Percentage', 'Grade', 'Status'
     ]
 
-    data = []
-    for exam, student in exams:
-        row = [
-            student.student_unique_id,
-            f"{student.first_name} {student.last_name}",
-            exam.course_full_name or student.current_course,
-            exam.exam_name,
-            exam.semester or '',
-            exam.exam_date.strftime('%Y-%m-%d') if exam.exam_date else '',
-            exam.subject1_name or '',
-            exam.subject1_max_marks or 0,
-            exam.subject1_obtained_marks or 0,
-            exam.subject2_name or '',
-            exam.subject2_max_marks or 0,
-            exam.subject2_obtained_marks or 0,
-            exam.subject3_name or '',
-            exam.subject3_max_marks or 0,
-            exam.subject3_obtained_marks or 0,
-            exam.subject4_name or '',
-            exam.subject4_max_marks or 0,
-            exam.subject4_obtained_marks or 0,
-            exam.subject5_name or '',
-            exam.subject5_max_marks or 0,
-            exam.subject5_obtained_marks or 0,
-            exam.subject6_name or '',
-            exam.subject6_max_marks or 0,
-            exam.subject6_obtained_marks or 0,
-            exam.total_max_marks or 0,
-            exam.total_obtained_marks or 0,
-            float(exam.percentage) if exam.percentage else 0,
-            exam.grade or '',
-            exam.overall_status or ''
-        ]
-        data.append(row)
+    def rows():
+        for exam in exams:
+            row = [
+                exam.student_unique_id,
+                f"{exam.first_name} {exam.last_name}",
+                exam.course_full_name or exam.current_course,
+                exam.exam_name,
+                exam.semester or '',
+                exam.exam_date or '',
+            ]
+            for i in range(1, 7):
+                row += [
+                    getattr(exam, f'subject{i}_name') or '',
+                    getattr(exam, f'subject{i}_max_marks') or 0,
+                    getattr(exam, f'subject{i}_obtained_marks') or 0,
+                ]
+            row += [
+                exam.total_max_marks or 0,
+                exam.total_obtained_marks or 0,
+                float(exam.percentage) if exam.percentage else 0,
+                exam.grade or '',
+                exam.overall_status or ''
+            ]
+            yield row
 
-    return data, headers
+    return rows(), headers
 
-def get_users_export_data():
+def get_users_export_data(since=None):
     """Get users data for export"""
-    users = db.session.query(UserProfile).join(UserProfile.role).all()
+    query = db.session.query(UserProfile).join(UserProfile.role)
+    if since:
+        query = query.filter(since_filter(UserProfile, since))
+    users = query.all()
     headers = [
         'User ID', 'Username', 'First Name', 'Last Name', 'Email', 'Phone', 
         'Gender', 'Role', 'Status', 'Created Date'
@@ -302,7 +497,7 @@ def get_users_export_data():
             user.gender or '',
             user.role.role_name if user.role else '',
             user.status,
-            user.created_at.strftime('%Y-%m-%d') if user.created_at else ''
+            user.created_at.date() if user.created_at else ''
         ])
 
     return data, headers
@@ -395,108 +590,222 @@ def _parse_admission_date(date_value):
     # Default fallback
     return date.today()
 
+def _is_blank(value):
+    """True for None, empty strings and pandas NaN cells"""
+    if value is None:
+        return True
+    if isinstance(value, float) and pd.isna(value):
+        return True
+    return str(value).strip() == ''
+
+def _assign_missing_student_ids(records):
+    """Fill in Student ID for rows that don't have one, reserving one batch per course and year"""
+    course_short_names = dict(
+        db.session.query(CourseDetails.course_full_name, CourseDetails.course_short_name).all()
+    )
+
+    pending = {}
+    for record in records:
+        if not _is_blank(record.get('Student ID')):
+            continue
+        course_short = course_short_names.get(record.get('Current Course'))
+        if not course_short:
+            continue
+        year = _parse_admission_date(record.get('Admission Date')).year
+        pending.setdefault((course_short, year), []).append(record)
+
+    for (course_short, year), course_records in pending.items():
+        student_ids = allocate_student_ids(course_short, year, len(course_records))
+        for record, student_id in zip(course_records, student_ids):
+            record['Student ID'] = student_id
+
+IMPORT_CHUNK_SIZE = 1000  # rows per executemany INSERT
+
+# Import sheet header -> Student column, for the text columns
+STUDENT_IMPORT_COLUMNS = [
+    ('Student ID', 'student_unique_id'), ('External ID', 'external_id'),
+    ('First Name', 'first_name'), ('Last Name', 'last_name'),
+    ('Father Name', 'father_name'), ('Mother Name', 'mother_name'),
+    ('Gender', 'gender'), ('Category', 'category'), ('Email', 'email'),
+    ('Current Course', 'current_course'),
+    ('Subject 1', 'subject_1_name'), ('Subject 2', 'subject_2_name'), ('Subject 3', 'subject_3_name'),
+    ('Street', 'street'), ('Area/Village', 'area_village'), ('City/Tehsil', 'city_tehsil'), ('State', 'state'),
+    ('Phone', 'phone'), ('Aadhaar Number', 'aadhaar_card_number'), ('APAAR ID', 'apaar_id'),
+    ('School Name', 'school_name'), ('Scholarship Status', 'scholarship_status'),
+    ('Meera Rebate Status', 'rebate_meera_scholarship_status'), ('Student Status', 'student_status'),
+]
+
+# Used when the cell is blank
+STUDENT_IMPORT_DEFAULTS = {
+    'gender': 'Male',
+    'category': 'General',
+    'scholarship_status': 'Not Applied',
+    'rebate_meera_scholarship_status': 'Not Applied',
+    'student_status': 'Active',
+}
+
+def _text_column(series):
+    """Column as stripped strings; NaN, None and 'nan' become '' and whole floats lose their '.0'"""
+    if pd.api.types.is_float_dtype(series):
+        # Numeric cells (phone, Aadhaar numbers) are read as floats when the column has blanks
+        whole = series.notna() & (series % 1 == 0)
+        text = series.astype(str)
+        text[whole] = series[whole].astype('int64').astype(str)
+        series = text.where(series.notna(), '')
+    text = series.fillna('').astype(str).str.strip()
+    return text.mask(text.str.lower() == 'nan', '')
+
+def _sheet_column(raw, header):
+    """Text column for header, or blanks when the sheet doesn't have it"""
+    if header in raw:
+        return _text_column(raw[header])
+    return pd.Series('', index=raw.index, dtype=object)
+
+def _admission_dates(raw):
+    """Admission Date column parsed once per distinct value (today when blank or unparseable)"""
+    if 'Admission Date' not in raw:
+        return pd.Series(date.today(), index=raw.index, dtype=object)
+    column = raw['Admission Date']
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return pd.Series([date.today() if pd.isna(value) else value.date() for value in column],
+                         index=raw.index, dtype=object)
+    parsed = {value: _parse_admission_date(value) for value in column.dropna().unique()}
+    return column.map(lambda value: date.today() if pd.isna(value) else parsed[value])
+
+def _student_import_frame(records):
+    """Normalise import rows into Student column values, plus the first validation problem of each row"""
+    raw = pd.DataFrame.from_records(records)
+    frame = pd.DataFrame(index=raw.index)
+    for header, attribute in STUDENT_IMPORT_COLUMNS:
+        frame[attribute] = _sheet_column(raw, header)
+    for attribute, default in STUDENT_IMPORT_DEFAULTS.items():
+        frame[attribute] = frame[attribute].mask(frame[attribute] == '', default)
+
+    # If individual address fields are empty but concatenated address exists, split it
+    concatenated = _sheet_column(raw, 'Concatenated Address')
+    split = (frame[list(ADDRESS_FIELDS)] == '').all(axis=1) & (concatenated != '')
+    if split.any():
+        parts = concatenated[split].str.split(', ').map(
+            lambda values: [value.strip() for value in values if value.strip() and value.strip().lower() != 'nan']
+        )
+        for position, field in enumerate(ADDRESS_FIELDS):
+            frame.loc[split, field] = parts.str[position].fillna('')
+    # Inserted without the ORM, so build the column student_address would have set
+    frame['concatenated_address'] = [
+        build_concatenated_address(*parts) for parts in zip(*(frame[field] for field in ADDRESS_FIELDS))
+    ]
+
+    percentage_text = _sheet_column(raw, 'Percentage')
+    percentage = pd.to_numeric(percentage_text, errors='coerce')
+    frame['percentage'] = pd.Series([None if pd.isna(value) else float(value) for value in percentage],
+                                    index=frame.index, dtype=object)
+    frame['admission_date'] = _admission_dates(raw)
+
+    problems = pd.Series('', index=frame.index, dtype=object)
+    for header, attribute in STUDENT_IMPORT_COLUMNS:
+        length = Student.__table__.columns[attribute].type.length
+        too_long = (problems == '') & (frame[attribute].str.len() > length)
+        problems = problems.mask(too_long, f"{header} is longer than {length} characters")
+    problems = problems.mask((problems == '') & (percentage_text != '') & percentage.isna(),
+                             "Percentage must be a number")
+
+    return frame, problems
+
+def _existing_student_ids(student_ids):
+    """The given student IDs that are already taken, in one query"""
+    if not student_ids:
+        return set()
+    return set(db.session.scalars(
+        select(Student.student_unique_id).where(Student.student_unique_id.in_(student_ids))
+    ))
+
+def _existing_name_keys(first_names):
+    """({(first, last, father): student ID}, {(first, last): student ID}) in lower case for
+    existing students with one of the given first names, in one query"""
+    full_names, names = {}, {}
+    if not first_names:
+        return full_names, names
+    rows = db.session.execute(
+        select(func.lower(Student.first_name), func.lower(Student.last_name),
+               func.lower(Student.father_name), Student.student_unique_id)
+        .where(func.lower(Student.first_name).in_(first_names))
+        .order_by(Student.id)
+    )
+    for first_name, last_name, father_name, student_id in rows:
+        if father_name:
+            full_names.setdefault((first_name, last_name, father_name), student_id)
+        names.setdefault((first_name, last_name), student_id)
+    return full_names, names
+
 def import_students_data(records):
-    """Import students data from records"""
+    """Import students data from records.
+
+    The sheet is normalised and validated column-wise with pandas, existing IDs
+    and names are preloaded in one query each, duplicates are found in memory,
+    and the accepted rows go in with executemany INSERTs of IMPORT_CHUNK_SIZE.
+    """
     try:
-        imported_count = 0
         errors = []
         warnings = []
 
-        for i, record in enumerate(records, 1):
-            try:
-                # Check if student already exists by Student ID
-                existing_student = Student.query.filter_by(
-                    student_unique_id=record.get('Student ID', '')
-                ).first()
-
-                if existing_student:
-                    errors.append(f"Row {i}: Student with ID {record.get('Student ID')} already exists")
-                    continue
+        # Generate IDs for rows without one in a single allocation per course and year
+        _assign_missing_student_ids(records)
+        if not records:
+            return True, "Successfully imported 0 students."
+        frame, problems = _student_import_frame(records)
+
+        lower_first = frame['first_name'].str.lower()
+        lower_last = frame['last_name'].str.lower()
+        lower_father = frame['father_name'].str.lower()
+        existing_ids = _existing_student_ids(set(frame['student_unique_id']) - {''})
+        full_name_matches, name_matches = _existing_name_keys(set(lower_first) - {''})
+
+        # Rows are checked in order against the database and the rows accepted before them
+        accepted = []
+        rows = zip(frame.index, frame['student_unique_id'], frame['first_name'], frame['last_name'],
+                   frame['father_name'], lower_first, lower_last, lower_father, problems)
+        for i, (index, student_id, first_name, last_name, father_name, first, last, father, problem) in enumerate(rows, 1):
+            if not student_id:
+                errors.append(f"Row {i}: Student ID is missing and no valid Current Course was given to generate one")
+                continue
 
-                # Check for duplicate entries based on first_name, last_name, and father_name
-                first_name = record.get('First Name', '').strip()
-                last_name = record.get('Last Name', '').strip()
-                father_name = record.get('Father Name', '').strip()
-
-                if first_name and last_name and father_name:
-                    duplicate_student = Student.query.filter(
-                        db.func.lower(Student.first_name) == first_name.lower(),
-                        db.func.lower(Student.last_name) == last_name.lower(),
-                        db.func.lower(Student.father_name) == father_name.lower()
-                    ).first()
-
-                    if duplicate_student:
-                        warnings.append(f"Row {i}: Potential duplicate detected - {first_name} {last_name} (S/o {father_name}) matches existing student ID: {duplicate_student.student_unique_id}")
-                elif first_name and last_name:
-                    # Check for name match even without father's name
-                    duplicate_student = Student.query.filter(
-                        db.func.lower(Student.first_name) == first_name.lower(),
-                        db.func.lower(Student.last_name) == last_name.lower()
-                    ).first()
-
-                    if duplicate_student:
-                        warnings.append(f"Row {i}: Potential duplicate name detected - {first_name} {last_name} matches existing student ID: {duplicate_student.student_unique_id}")
-                elif not first_name or not last_name:
-                    errors.append(f"Row {i}: First Name and Last Name are required fields")
-                    continue
+            if student_id in existing_ids:
+                errors.append(f"Row {i}: Student with ID {student_id} already exists")
+                continue
 
-                # Get address fields - prioritize individual fields, fallback to concatenated
-                street = record.get('Street', '')
-                area_village = record.get('Area/Village', '')
-                city_tehsil = record.get('City/Tehsil', '')
-                state = record.get('State', '')
-                concatenated_address = record.get('Concatenated Address', '')
-
-                # If individual address fields are empty but concatenated address exists, split it
-                if not any([street, area_village, city_tehsil, state]) and concatenated_address:
-                    # Split concatenated address by comma
-                    address_parts = [part.strip() for part in concatenated_address.split(', ') if part.strip() and part.strip().lower() != 'nan']
-                    street = address_parts[0] if len(address_parts) > 0 else ''
-                    area_village = address_parts[1] if len(address_parts) > 1 else ''
-                    city_tehsil = address_parts[2] if len(address_parts) > 2 else ''
-                    state = address_parts[3] if len(address_parts) > 3 else ''
-
-                # Create new student
-                student = Student(
-                    student_unique_id=record.get('Student ID', ''),
-                    external_id=record.get('External ID', ''),
-                    first_name=record.get('First Name', ''),
-                    last_name=record.get('Last Name', ''),
-                    father_name=record.get('Father Name', ''),
-                    mother_name=record.get('Mother Name', ''),
-                    gender=record.get('Gender', 'Male'),
-                    category=record.get('Category', 'General'),
-                    email=record.get('Email', ''),
-                    current_course=record.get('Current Course', ''),
-                    subject_1_name=record.get('Subject 1', ''),
-                    subject_2_name=record.get('Subject 2', ''),
-                    subject_3_name=record.get('Subject 3', ''),
-                    percentage=float(record.get('Percentage', 0)) if record.get('Percentage') else None,
-                    street=street,
-                    area_village=area_village,
-                    city_tehsil=city_tehsil,
-                    state=state,
-                    phone=record.get('Phone', ''),
-                    aadhaar_card_number=record.get('Aadhaar Number', ''),
-                    apaar_id=record.get('APAAR ID', ''),
-                    school_name=record.get('School Name', ''),
-                    scholarship_status=record.get('Scholarship Status', 'Not Applied'),
-                    rebate_meera_scholarship_status=record.get('Meera Rebate Status', 'Not Applied'),
-                    student_status=record.get('Student Status', 'Active'),
-                    admission_date=_parse_admission_date(record.get('Admission Date')),
-                    concatenated_address=concatenated_address  # Set the concatenated address from import
-                )
+            # Check for duplicate entries based on first_name, last_name, and father_name
+            if first_name and last_name and father_name:
+                duplicate_id = full_name_matches.get((first, last, father))
+                if duplicate_id:
+                    warnings.append(f"Row {i}: Potential duplicate detected - {first_name} {last_name} (S/o {father_name}) matches existing student ID: {duplicate_id}")
+            elif first_name and last_name:
+                # Check for name match even without father's name
+                duplicate_id = name_matches.get((first, last))
+                if duplicate_id:
+                    warnings.append(f"Row {i}: Potential duplicate name detected - {first_name} {last_name} matches existing student ID: {duplicate_id}")
+            else:
+                errors.append(f"Row {i}: First Name and Last Name are required fields")
+                continue
 
-                # Update concatenated address after setting individual fields
-                student.update_concatenated_address()
+            if problem:
+                errors.append(f"Row {i}: {problem}")
+                continue
 
-                db.session.add(student)
-                imported_count += 1
+            accepted.append(index)
+            existing_ids.add(student_id)
+            if father:
+                full_name_matches.setdefault((first, last, father), student_id)
+            name_matches.setdefault((first, last), student_id)
 
-            except Exception as e:
-                errors.append(f"Row {i}: {str(e)}")
+        student_rows = frame.loc[accepted].to_dict('records')
+        for start in range(0, len(student_rows), IMPORT_CHUNK_SIZE):
+            db.session.execute(insert(Student), student_rows[start:start + IMPORT_CHUNK_SIZE])
 
+        if student_rows:
+            # Core INSERTs skip the ORM events that bump the filter facets
+            invalidate_facets()
         db.session.commit()
+        imported_count = len(student_rows)
 
         message = f"Successfully imported {imported_count} students."
         if warnings:
@@ -541,6 +850,8 @@ def import_courses_data(records):
             except Exception as e:
                 errors.append(f"Row {i}: {str(e)}")
 
+        if imported_count:
+            catalog_cache.invalidate_catalog()
         db.session.commit()
 
         message = f"Successfully imported {imported_count} courses."
@@ -583,6 +894,8 @@ def import_course_details_data(records):
             except Exception as e:
                 errors.append(f"Row {i}: {str(e)}")
 
+        if imported_count:
+            catalog_cache.invalidate_catalog()
         db.session.commit()
 
         message = f"Successfully imported {imported_count} course details."
@@ -824,26 +1137,26 @@ def import_fees_data(records):
                     continue
 
                 # Get course information
-                course = None
-                if student.current_course:
-                    course_detail = CourseDetails.query.filter_by(course_full_name=student.current_course).first()
-                    if course_detail:
-                        course = Course.query.filter_by(course_short_name=course_detail.course_short_name).first()
+                course_entry = catalog_cache.get_course_entry(student.current_course)
+                course = course_entry.course if course_entry else None
 
                 # Create new fee record
                 fee_record = CollegeFees(
                     student_id=student.id,
                     course_id=course.course_id if course else None,
                     total_course_fees=float(record.get('Total Fee', 0) or 0),
-                    installment_1=float(record.get('Installment 1', 0) or 0),
-                    installment_2=float(record.get('Installment 2', 0) or 0),
-                    installment_3=float(record.get('Installment 3', 0) or 0),
-                    installment_4=float(record.get('Installment 4', 0) or 0),
-                    installment_5=float(record.get('Installment 5', 0) or 0),
-                    installment_6=float(record.get('Installment 6', 0) or 0)
+                    total_fees_paid=0
                 )
 
                 db.session.add(fee_record)
+
+                # Installment columns from the file become payment ledger rows
+                installment_number = 0
+                for slot in range(1, 7):
+                    amount = float(record.get(f'Installment {slot}', 0) or 0)
+                    if amount > 0:
+                        installment_number += 1
+                        record_payment(fee_record, amount, installment_number=installment_number)
                 imported_count += 1
 
             except Exception as e:
@@ -892,11 +1205,8 @@ def import_exams_data(records):
                     continue
 
                 # Get course information
-                course = None
-                if student.current_course:
-                    course_detail = CourseDetails.query.filter_by(course_full_name=student.current_course).first()
-                    if course_detail:
-                        course = Course.query.filter_by(course_short_name=course_detail.course_short_name).first()
+                course_entry = catalog_cache.get_course_entry(student.current_course)
+                course = course_entry.course if course_entry else None
 
                 # Parse exam date
                 exam_date = None
@@ -1026,6 +1336,7 @@ def import_exams_data(records):
 
         # Commit all exam records at once
         if imported_count > 0:
+            invalidate_exam_dashboard()
             db.session.commit()
 
         message = f"Successfully imported {imported_count} exam records."
@@ -1157,9 +1468,12 @@ def import_users_data(records):
         return False, f"Import failed: {str(e)}"
 
 
-def get_subjects_export_data():
+def get_subjects_export_data(since=None):
     """Export subjects data"""
-    subjects = Subject.query.all()
+    query = Subject.query
+    if since:
+        query = query.filter(since_filter(Subject, since))
+    subjects = query.all()
 
     data = []
     for subject in subjects:
@@ -1213,6 +1527,8 @@ def import_subjects_data(records):
             except Exception as e:
                 errors.append(f"Row {i}: {str(e)}")
 
+        if imported_count:
+            catalog_cache.invalidate_catalog()
         db.session.commit()
 
         message = f"Successfully imported {imported_count} subjects."
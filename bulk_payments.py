@@ -0,0 +1,262 @@
+"""
+Bulk posting of payments from bank / UPI statement files.
+
+A statement (CSV or Excel) with one row per payment is posted in a single
+transaction: students and fee records are resolved with one IN query each,
+references already on file are skipped, invoice numbers are reserved as one
+block, all invoices are inserted with a single executemany and each payment
+is appended to the fee_payments ledger. The result is a per-row report.
+
+Expected columns (header case and spacing are ignored):
+    Student ID (or student_unique_id), Amount, Date, Reference, [Payment Mode]
+
+Used by the /fees/payments/bulk upload and by:
+    flask post-payments <file> [--payment-mode Online]
+"""
+
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import click
+import pandas as pd
+from sqlalchemy import insert
+
+from app import db
+from models import Student, CollegeFees, Invoice
+from utils import allocate_invoice_numbers
+from fee_ledger import next_installment_numbers, record_payment
+
+# Normalised header -> field name
+PAYMENT_FILE_COLUMNS = {
+    'student id': 'student_unique_id',
+    'student unique id': 'student_unique_id',
+    'amount': 'amount',
+    'date': 'date',
+    'payment date': 'date',
+    'reference': 'reference',
+    'payment reference': 'reference',
+    'utr': 'reference',
+    'payment mode': 'payment_mode',
+}
+
+REQUIRED_PAYMENT_FIELDS = ['student_unique_id', 'amount', 'reference']
+
+PAYMENT_MODES = ['Cash', 'Online', 'Cheque', 'DD']
+
+
+def _normalise_header(header):
+    return ' '.join(str(header).replace('_', ' ').split()).lower()
+
+
+def read_payment_file(file):
+    """Read a CSV/XLSX statement (upload or path) into a list of payment dicts"""
+    filename = getattr(file, 'filename', None) or str(file)
+    file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+    if file_ext == 'csv':
+        df = pd.read_csv(file, dtype=str)
+    elif file_ext in ['xlsx', 'xls']:
+        df = pd.read_excel(file, dtype=str)
+    else:
+        raise ValueError("Unsupported file format. Please use CSV or Excel files.")
+
+    df = df.rename(columns=lambda header: PAYMENT_FILE_COLUMNS.get(_normalise_header(header), header))
+    missing = [field for field in REQUIRED_PAYMENT_FIELDS if field not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    return df.fillna('').to_dict('records')
+
+
+def _parse_amount(value):
+    try:
+        amount = Decimal(str(value).replace(',', '').replace('₹', '').strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'")
+    if amount <= 0:
+        raise ValueError("Amount must be greater than zero")
+    return amount.quantize(Decimal('0.01'))
+
+
+def _parse_payment_date(value):
+    if not str(value).strip():
+        return datetime.utcnow()
+    try:
+        # Bank statements here are day-first (DD/MM/YYYY)
+        return pd.to_datetime(value, dayfirst=True).to_pydatetime()
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid date '{value}'")
+
+
+def post_bulk_payments(records, payment_mode='Online'):
+    """Post all payments in one transaction and return (success, report)"""
+    report = []
+    candidates = []
+    seen_references = set()
+
+    # 1. Validate rows
+    for i, record in enumerate(records, 1):
+        row = {
+            'row': i,
+            'student_unique_id': str(record.get('student_unique_id', '')).strip(),
+            'amount': str(record.get('amount', '')).strip(),
+            'reference': str(record.get('reference', '')).strip(),
+            'status': 'error',
+            'message': '',
+            'invoice_number': None,
+            'installment_number': None,
+        }
+        report.append(row)
+        try:
+            if not row['student_unique_id']:
+                raise ValueError("Student ID is required")
+            if not row['reference']:
+                raise ValueError("Reference is required")
+            if row['reference'] in seen_references:
+                row['status'] = 'skipped'
+                raise ValueError("Duplicate reference in file")
+            seen_references.add(row['reference'])
+
+            mode = str(record.get('payment_mode', '')).strip() or payment_mode
+            if mode not in PAYMENT_MODES:
+                raise ValueError(f"Invalid payment mode '{mode}'")
+
+            candidates.append({
+                'report': row,
+                'amount': _parse_amount(record.get('amount')),
+                'paid_at': _parse_payment_date(record.get('date', '')),
+                'payment_mode': mode,
+            })
+        except ValueError as e:
+            row['message'] = str(e)
+
+    if not candidates:
+        return False, _summarise(report)
+
+    # 2. Resolve students, fee records and already-posted references in one query each
+    student_ids = {c['report']['student_unique_id'] for c in candidates}
+    students = {
+        unique_id: (student_id, status) for unique_id, student_id, status in db.session.query(
+            Student.student_unique_id, Student.id, Student.student_status
+        ).filter(Student.student_unique_id.in_(student_ids))
+    }
+
+    # Locked so payments posted at the same time from the payment form wait for this batch;
+    # newest first so each student's payments go to their current (latest) fee record
+    fee_records = {}
+    for fee_record in CollegeFees.query.filter(
+        CollegeFees.student_id.in_([student_id for student_id, _ in students.values()])
+    ).order_by(CollegeFees.id.desc()).with_for_update():
+        fee_records.setdefault(fee_record.student_id, fee_record)
+
+    posted_references = {
+        reference for (reference,) in db.session.query(Invoice.payment_reference).filter(
+            Invoice.payment_reference.in_([c['report']['reference'] for c in candidates])
+        )
+    }
+
+    # 3. Number the payments per fee record in file order
+    postable = []
+    next_numbers = next_installment_numbers([fee_record.id for fee_record in fee_records.values()])
+    for candidate in candidates:
+        row = candidate['report']
+        if row['reference'] in posted_references:
+            row['status'] = 'skipped'
+            row['message'] = "Reference already posted"
+            continue
+        if row['student_unique_id'] not in students:
+            row['message'] = "Student not found"
+            continue
+        student_id, student_status = students[row['student_unique_id']]
+        if student_status == 'Graduated':
+            row['message'] = "Student has graduated"
+            continue
+        fee_record = fee_records.get(student_id)
+        if not fee_record:
+            row['message'] = "No fee record found for this student"
+            continue
+
+        installment_number = next_numbers[fee_record.id]
+        next_numbers[fee_record.id] = installment_number + 1
+
+        candidate.update(student_id=student_id, fee_record=fee_record, installment_number=installment_number)
+        postable.append(candidate)
+
+    if not postable:
+        db.session.rollback()  # release the fee record locks
+        return False, _summarise(report)
+
+    # 4. Reserve invoice numbers as one block, then write everything in one transaction
+    invoice_numbers = allocate_invoice_numbers(len(postable))
+    invoices = []
+    try:
+        for candidate, invoice_number in zip(postable, invoice_numbers):
+            fee_record = candidate['fee_record']
+            installment_number = candidate['installment_number']
+
+            record_payment(fee_record, candidate['amount'], invoice_number=invoice_number,
+                           payment_mode=candidate['payment_mode'], paid_at=candidate['paid_at'],
+                           installment_number=installment_number)
+            fee_record.payment_mode = candidate['payment_mode']
+
+            invoices.append({
+                'student_id': candidate['student_id'],
+                'course_id': fee_record.course_id,
+                'invoice_number': invoice_number,
+                'date_time': candidate['paid_at'],
+                'invoice_amount': candidate['amount'],
+                'installment_number': installment_number,
+                'original_invoice_printed': False,
+                'payment_reference': candidate['report']['reference'],
+            })
+            candidate['report'].update(invoice_number=invoice_number, installment_number=installment_number)
+
+        db.session.execute(insert(Invoice), invoices)
+        # Commit flushes the ledger rows and fee records (which recalculates their totals)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for candidate in postable:
+            candidate['report'].update(status='error', message=f"Not posted: {str(e)}",
+                                       invoice_number=None, installment_number=None)
+        return False, _summarise(report)
+
+    for candidate in postable:
+        candidate['report'].update(status='posted', message='Payment posted')
+    return True, _summarise(report)
+
+
+def _summarise(report):
+    return {
+        'rows': report,
+        'posted': sum(1 for row in report if row['status'] == 'posted'),
+        'skipped': sum(1 for row in report if row['status'] == 'skipped'),
+        'errors': sum(1 for row in report if row['status'] == 'error'),
+    }
+
+
+def init_app(app):
+    """Register the post-payments command"""
+
+    @app.cli.command('post-payments')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--payment-mode', default='Online', type=click.Choice(PAYMENT_MODES),
+                  help='Mode used for rows without a Payment Mode column.')
+    def post_payments_command(path, payment_mode):
+        """Post payments from a bank/UPI statement (CSV or Excel)."""
+        started = datetime.now()
+        try:
+            records = read_payment_file(path)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        success, summary = post_bulk_payments(records, payment_mode=payment_mode)
+        for row in summary['rows']:
+            if row['status'] != 'posted':
+                click.echo(f"  Row {row['row']} ({row['student_unique_id']}, {row['reference']}): "
+                           f"{row['status']} - {row['message']}")
+
+        elapsed = (datetime.now() - started).total_seconds()
+        mark = '✓' if success else '✗'
+        click.echo(f"{mark} Posted {summary['posted']} payments, skipped {summary['skipped']}, "
+                   f"{summary['errors']} errors in {elapsed:.2f}s")
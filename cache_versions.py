@@ -0,0 +1,111 @@
+"""
+Database-backed version counters for in-process caches.
+
+Every gunicorn worker keeps its own copy of slow-changing data (the course
+catalog, filter facets, dashboards). Writers bump a named counter in the same
+transaction as their change; readers compare the counter with the version
+their cached copy was built from and rebuild when it moved. All counters are
+read with one query per request and memoised on flask.g.
+
+Caches over ORM-managed tables register with bump_on_commit() instead of
+bumping by hand: mapper events mark the session with the names of the caches
+a flush touched, and one before_commit listener bumps them all with the commit.
+"""
+
+from flask import g
+from sqlalchemy import event, inspect, text
+
+from app import db
+
+
+def _load_versions():
+    if '_cache_versions' not in g:
+        rows = db.session.execute(text("SELECT name, version FROM cache_versions")).all()
+        g._cache_versions = {name: version for name, version in rows}
+    return g._cache_versions
+
+
+def get_version(name):
+    """Current version of the named cache (0 if it has never been bumped).
+
+    Returns None once the cache has been bumped in this request: the new version
+    is not committed yet, so callers should rebuild without storing the result.
+    """
+    return _load_versions().get(name, 0)
+
+
+def bump_version(name):
+    """Invalidate the named cache in every worker once the current transaction commits"""
+    db.session.execute(text("""
+        INSERT INTO cache_versions (name, version)
+        VALUES (:name, 1)
+        ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1
+    """), {'name': name})
+
+    # Until the write commits, reads in this request must bypass the cache
+    _load_versions()[name] = None
+
+
+_SESSION_KEY = 'cache_versions_changed'
+
+# Registered through bump_on_commit(): model -> set of cache names, and model -> {cache name: columns}
+_insert_watches = {}
+_delete_watches = {}
+_column_watches = {}
+
+
+def _mark_session(target, names):
+    session = inspect(target).session
+    if session is not None and names:
+        session.info.setdefault(_SESSION_KEY, set()).update(names)
+
+
+def _on_insert(mapper, connection, target):
+    _mark_session(target, _insert_watches.get(mapper.class_))
+
+
+def _on_delete(mapper, connection, target):
+    _mark_session(target, _delete_watches.get(mapper.class_))
+
+
+def _on_update(mapper, connection, target):
+    state = inspect(target)
+    _mark_session(target, {
+        name for name, columns in _column_watches.get(mapper.class_, {}).items()
+        if any(state.attrs[column].history.has_changes() for column in columns)
+    })
+
+
+def _bump_before_commit(session):
+    # Flush first so the mapper events for pending changes have fired
+    session.flush()
+    for name in sorted(session.info.pop(_SESSION_KEY, ())):
+        bump_version(name)
+
+
+def _clear_after_rollback(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def bump_on_commit(name, model, columns=(), on_insert=True, on_delete=True):
+    """Bump the named cache with the commit of any write to model that inserts or
+    deletes a row, or changes one of columns. Call from the cache's init_app().
+
+    Writers that bypass the ORM unit of work (bulk UPDATEs, raw SQL) still have
+    to call bump_version() themselves.
+    """
+    if on_insert:
+        _insert_watches.setdefault(model, set()).add(name)
+    if on_delete:
+        _delete_watches.setdefault(model, set()).add(name)
+    if columns:
+        _column_watches.setdefault(model, {})[name] = tuple(columns)
+
+    if not event.contains(model, 'after_update', _on_update):
+        event.listen(model, 'after_insert', _on_insert)
+        event.listen(model, 'after_delete', _on_delete)
+        event.listen(model, 'after_update', _on_update)
+
+    if not event.contains(db.session, 'before_commit', _bump_before_commit):
+        event.listen(db.session, 'before_commit', _bump_before_commit)
+        event.listen(db.session, 'after_rollback', _clear_after_rollback)
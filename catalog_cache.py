@@ -0,0 +1,127 @@
+"""
+In-process cache of the course catalog (courses, course details and subjects).
+
+The catalog changes a few times a year but is looked up on every payment,
+exam entry, student edit and imported row. Each worker keeps one snapshot
+keyed by the "catalog" counter in cache_versions; the course, course detail
+and subject write paths call invalidate_catalog() before committing.
+
+Entries are plain read-only copies of the rows (not ORM instances), so they
+can be shared across requests and sessions. Use the ids they carry when a
+relationship needs to be set.
+"""
+
+import threading
+from collections import namedtuple
+from types import SimpleNamespace
+
+from sqlalchemy import inspect
+
+from cache_versions import get_version, bump_version
+from models import Course, CourseDetails, Subject
+
+CATALOG_CACHE = 'catalog'
+
+CatalogEntry = namedtuple('CatalogEntry', ['course_detail', 'course', 'subjects'])
+
+_lock = threading.Lock()
+_catalog = (None, None)  # (version, catalog data), swapped as one tuple
+
+
+def _snapshot(row):
+    """Read-only copy of an ORM row's column values"""
+    return SimpleNamespace(**{attr.key: getattr(row, attr.key) for attr in inspect(row).mapper.column_attrs})
+
+
+def _build_catalog():
+    courses = {course.course_short_name: _snapshot(course) for course in Course.query.all()}
+
+    subjects = {}
+    for subject in Subject.query.order_by(Subject.id).all():
+        subjects.setdefault(subject.course_short_name, []).append(_snapshot(subject))
+
+    entries = {}
+    first_details = {}
+    for detail in CourseDetails.query.order_by(CourseDetails.id).all():
+        snapshot = _snapshot(detail)
+        # Keep the first row for duplicate names, as filter_by(...).first() would
+        entries.setdefault(detail.course_full_name, CatalogEntry(
+            course_detail=snapshot,
+            course=courses.get(detail.course_short_name),
+            subjects=tuple(subjects.get(detail.course_short_name, ())),
+        ))
+        first_details.setdefault(detail.course_short_name, snapshot)
+
+    return {
+        'derived': {},
+        'courses': courses,
+        'entries': entries,
+        'first_details': first_details,
+        'subjects': {short_name: tuple(rows) for short_name, rows in subjects.items()},
+    }
+
+
+def _get_catalog():
+    global _catalog
+
+    version = get_version(CATALOG_CACHE)
+    if version is None:
+        # Catalog changed in this (uncommitted) transaction: don't cache what we read
+        return _build_catalog()
+
+    cached_version, catalog = _catalog
+    if cached_version == version:
+        return catalog
+
+    with _lock:
+        cached_version, catalog = _catalog
+        if cached_version != version:
+            catalog = _build_catalog()
+            _catalog = (version, catalog)
+    return catalog
+
+
+def get_course_entry(course_full_name):
+    """CatalogEntry(course_detail, course, subjects) for a course full name, or None"""
+    if not course_full_name:
+        return None
+    return _get_catalog()['entries'].get(course_full_name)
+
+
+def get_course_detail(course_full_name):
+    """Cached course detail for a course full name, or None"""
+    entry = get_course_entry(course_full_name)
+    return entry.course_detail if entry else None
+
+
+def get_course_details():
+    """All cached course details (first row per full name), in id order"""
+    return [entry.course_detail for entry in _get_catalog()['entries'].values()]
+
+
+def get_course(course_short_name):
+    """Cached course for a course short name, or None"""
+    return _get_catalog()['courses'].get(course_short_name)
+
+
+def get_first_course_detail(course_short_name):
+    """First course detail (lowest id) for a course short name, or None"""
+    return _get_catalog()['first_details'].get(course_short_name)
+
+
+def get_subjects(course_short_name):
+    """Cached subjects for a course short name"""
+    return _get_catalog()['subjects'].get(course_short_name, ())
+
+
+def get_derived(name, build):
+    """Value built from the catalog by build(), cached with the current catalog snapshot"""
+    derived = _get_catalog()['derived']
+    if name not in derived:
+        derived[name] = build()
+    return derived[name]
+
+
+def invalidate_catalog():
+    """Call before committing any change to courses, course details or subjects"""
+    bump_version(CATALOG_CACHE)
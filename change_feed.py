@@ -0,0 +1,162 @@
+"""
+Changed-since exports and the /api/changes delta feed.
+
+Every synced table has an indexed updated_at column (UTC, like created_at).
+The ORM sets it through onupdate, and the set_updated_at() trigger sets it
+for raw SQL writes too (reconcile steps, promotions' bulk UPDATEs, fee
+rollover). The trigger is installed by add_updated_at_columns.py on existing
+databases and on table creation for new ones.
+
+get_changes() walks a table in (updated_at, primary key) order from an
+opaque cursor, so a client that keeps the returned next_cursor picks up each
+changed row once. updated_at is the writing transaction's start time (now()),
+so a row can become visible long after later-stamped rows. The feed therefore
+stops short of the start of the oldest transaction still open in the database
+(and of the last CHANGE_FEED_LAG seconds): nothing that commits later can be
+stamped behind a cursor already handed out, however long it runs. A session
+left idle in transaction holds the feed back until it ends. Deletes are not
+tracked.
+"""
+
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import DDL, event, select, text, tuple_
+
+from app import db
+from models import Student, Course, CourseDetails, Subject, CollegeFees, FeePayment, Exam, UserProfile
+from pagination import encode_cursor, decode_cursor
+
+# data_type (as in /export/<data_type>/...) -> model
+CHANGE_FEEDS = {
+    'students': Student,
+    'courses': Course,
+    'course_details': CourseDetails,
+    'subjects': Subject,
+    'fees': CollegeFees,
+    'invoices': FeePayment,
+    'exams': Exam,
+    'users': UserProfile,
+}
+
+# Never sent in the feed
+EXCLUDED_COLUMNS = {'password_hash', 'search_text'}
+
+CHANGE_FEED_LIMIT = 500
+MAX_CHANGE_FEED_LIMIT = 5000
+CHANGE_FEED_LAG = 30  # seconds
+
+SET_UPDATED_AT_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' OR NEW IS DISTINCT FROM OLD THEN
+            NEW.updated_at := timezone('utc', now());
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+UPDATED_AT_TRIGGER_SQL = """
+    DROP TRIGGER IF EXISTS trg_{table}_updated_at ON {table};
+    CREATE TRIGGER trg_{table}_updated_at
+        BEFORE INSERT OR UPDATE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION set_updated_at()
+"""
+
+# Upper bound (exclusive) for the feed: no open transaction can still commit a row stamped before it
+FEED_HORIZON_SQL = """
+    SELECT LEAST(
+        timezone('utc', now()) - make_interval(secs => :lag),
+        COALESCE((
+            SELECT timezone('utc', MIN(xact_start))
+            FROM pg_stat_activity
+            WHERE datname = current_database()
+              AND backend_type = 'client backend'
+              AND state <> 'idle'
+              AND xact_start IS NOT NULL
+              AND pid <> pg_backend_pid()
+        ), 'infinity'::timestamp)
+    )
+"""
+
+UPDATED_AT_TABLES = [model.__tablename__ for model in CHANGE_FEEDS.values()]
+
+_FUNCTION_DDL = DDL(SET_UPDATED_AT_FUNCTION_SQL).execute_if(dialect='postgresql')
+_TRIGGER_DDL = {
+    table: DDL(UPDATED_AT_TRIGGER_SQL.format(table=table)).execute_if(dialect='postgresql')
+    for table in UPDATED_AT_TABLES
+}
+
+
+def parse_since(value):
+    """Naive UTC datetime from an ISO 8601 date or timestamp; None for a blank value"""
+    if not value or not value.strip():
+        return None
+    since = datetime.fromisoformat(value.strip())
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def _primary_key(model):
+    return model.__mapper__.primary_key[0]
+
+
+def since_filter(model, since):
+    """Predicate for rows of model changed at or after since"""
+    return model.updated_at >= since
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def get_changes(data_type, cursor=None, since=None, limit=CHANGE_FEED_LIMIT):
+    """One page of rows changed after cursor (or since), oldest first.
+
+    Raises KeyError for an unknown data_type and ValueError for a bad cursor.
+    """
+    model = CHANGE_FEEDS[data_type]
+    id_column = _primary_key(model)
+    limit = max(1, min(limit, MAX_CHANGE_FEED_LIMIT))
+
+    position = decode_cursor(cursor) if cursor else None
+    if cursor and (position is None or not isinstance(position[0], datetime)):
+        raise ValueError('Invalid cursor')
+
+    horizon = db.session.execute(text(FEED_HORIZON_SQL), {'lag': CHANGE_FEED_LAG}).scalar()
+
+    columns = [column for column in model.__table__.columns if column.key not in EXCLUDED_COLUMNS]
+    query = select(*columns).where(model.updated_at < horizon)
+    if position:
+        query = query.where(tuple_(model.updated_at, id_column) > tuple_(*position))
+    elif since:
+        query = query.where(since_filter(model, since))
+    rows = db.session.execute(
+        query.order_by(model.updated_at, id_column).limit(limit + 1)
+    ).mappings().all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]['updated_at'], rows[-1][id_column.key]) if rows else cursor
+
+    return {
+        'type': data_type,
+        'changes': [{key: _json_value(value) for key, value in row.items()} for row in rows],
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    }
+
+
+def init_app(app):
+    """Install the updated_at trigger on tables created by db.create_all()"""
+    for model in CHANGE_FEEDS.values():
+        table = model.__table__
+        if not event.contains(table, 'after_create', _TRIGGER_DDL[table.name]):
+            event.listen(table, 'after_create', _FUNCTION_DDL)
+            event.listen(table, 'after_create', _TRIGGER_DDL[table.name])
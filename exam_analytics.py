@@ -0,0 +1,180 @@
+"""
+Exam analytics computed in the database.
+
+The exam summary page and its chart APIs used to load every Exam (and lazily
+its Student) into Python and loop over them. build_exam_dashboard() returns
+the same figures from two grouped queries: one GROUPING SETS scan for the
+overview, grade, course and semester panels, and one for subject averages with
+the six subject columns unpivoted by a LATERAL VALUES join. Top performers are
+read from the exams.percentage index.
+
+Dashboards are cached per worker, keyed by (admission year, "exams" counter in
+cache_versions). Exam writes, exam imports and promotions call
+invalidate_exam_dashboard() before committing. The course panel and the year
+filter read students.current_course and admission_date, so ORM events bump the
+counter too when a student is deleted or one of those columns changes; the bump
+goes out with the commit (cache_versions.bump_on_commit).
+"""
+
+import threading
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
+
+from app import db
+from cache_versions import get_version, bump_version, bump_on_commit
+from models import Exam, Student
+
+EXAM_DASHBOARD_CACHE = 'exams'
+
+# Student columns the dashboard groups or filters exams by
+STUDENT_COLUMNS = ('current_course', 'admission_date')
+
+GRADES = ['A+', 'A', 'B+', 'B', 'C+', 'C', 'F']
+
+# GROUPING(k.grade, k.course, k.semester) for each grouping set below
+OVERALL, BY_GRADE, BY_COURSE, BY_SEMESTER = 7, 3, 5, 6
+
+EXAM_PANELS_SQL = """
+    SELECT GROUPING(k.grade, k.course, k.semester) AS grouping_set,
+           k.grade, k.course, k.semester,
+           COUNT(*) AS exam_count,
+           COUNT(*) FILTER (WHERE e.overall_status = 'Pass') AS passed,
+           COUNT(*) FILTER (WHERE e.overall_status = 'Fail') AS failed,
+           SUM(COALESCE(e.percentage, 0)) AS percentage_sum,
+           AVG(e.percentage) AS average,
+           MIN(e.id) FILTER (WHERE e.percentage IS NOT NULL) AS first_exam_id
+    FROM exams e
+    JOIN students s ON s.id = e.student_id
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(NULLIF(e.grade, ''), 'F') AS grade,
+               NULLIF(s.current_course, '') AS course,
+               NULLIF(e.semester, '') AS semester
+    ) AS k
+    WHERE TRUE {year_filter}
+    GROUP BY GROUPING SETS ((), (k.grade), (k.course), (k.semester))
+"""
+
+SUBJECT_PERFORMANCE_SQL = """
+    SELECT v.subject_name, AVG(v.obtained_marks * 100.0 / v.max_marks) AS average
+    FROM exams e
+    JOIN students s ON s.id = e.student_id
+    CROSS JOIN LATERAL (VALUES
+        (1, e.subject1_name, e.subject1_obtained_marks, e.subject1_max_marks),
+        (2, e.subject2_name, e.subject2_obtained_marks, e.subject2_max_marks),
+        (3, e.subject3_name, e.subject3_obtained_marks, e.subject3_max_marks),
+        (4, e.subject4_name, e.subject4_obtained_marks, e.subject4_max_marks),
+        (5, e.subject5_name, e.subject5_obtained_marks, e.subject5_max_marks),
+        (6, e.subject6_name, e.subject6_obtained_marks, e.subject6_max_marks)
+    ) AS v(slot, subject_name, obtained_marks, max_marks)
+    WHERE NULLIF(v.subject_name, '') IS NOT NULL
+      AND v.obtained_marks IS NOT NULL
+      AND v.max_marks > 0
+      {year_filter}
+    GROUP BY v.subject_name
+    ORDER BY MIN(e.id), MIN(v.slot)
+"""
+
+_lock = threading.Lock()
+_dashboards = (None, {})  # (version, {year: dashboard}), swapped as one tuple
+
+
+def _year_filter(year):
+    """SQL fragment and params restricting to students admitted in a year (None = all)"""
+    if year is None:
+        return '', {}
+    return ("AND s.admission_date >= :year_start AND s.admission_date < :next_year_start",
+            {'year_start': date(year, 1, 1), 'next_year_start': date(year + 1, 1, 1)})
+
+
+def _semester_sort_key(semester):
+    # Sort by year/number, then by semester name
+    parts = semester.split()
+    return (parts[1] if len(parts) > 1 else semester, parts[0] if len(parts) > 1 else semester)
+
+
+def build_exam_dashboard(year=None):
+    """All five exam panels for an admission year (None = all exams), uncached"""
+    year_filter, params = _year_filter(year)
+    rows = db.session.execute(text(EXAM_PANELS_SQL.format(year_filter=year_filter)), params).mappings().all()
+
+    overall = next(row for row in rows if row['grouping_set'] == OVERALL)
+    total_exams = overall['exam_count']
+    grades = {row['grade']: row['exam_count'] for row in rows if row['grouping_set'] == BY_GRADE}
+
+    courses = sorted(
+        (row for row in rows if row['grouping_set'] == BY_COURSE
+         and row['course'] is not None and row['average'] is not None),
+        key=lambda row: row['first_exam_id']
+    )
+    semesters = sorted(
+        (row for row in rows if row['grouping_set'] == BY_SEMESTER
+         and row['semester'] is not None and row['average'] is not None),
+        key=lambda row: _semester_sort_key(row['semester'])
+    )
+
+    subjects = db.session.execute(text(SUBJECT_PERFORMANCE_SQL.format(year_filter=year_filter)), params).all()
+
+    return {
+        'stats': {
+            'total_exams': total_exams,
+            'pass_rate': (overall['passed'] / total_exams * 100) if total_exams > 0 else 0,
+            'average_score': float(overall['percentage_sum']) / total_exams if total_exams > 0 else 0,
+            'failed_students': overall['failed'],
+        },
+        'grade_distribution': [grades.get(grade, 0) for grade in GRADES],
+        'subject_names': [name for name, _ in subjects],
+        'subject_averages': [float(average or 0) for _, average in subjects],
+        'course_names': [row['course'] for row in courses],
+        'course_averages': [round(float(row['average']), 1) for row in courses],
+        'semester_labels': [row['semester'] for row in semesters],
+        'semester_averages': [round(float(row['average']), 1) for row in semesters],
+    }
+
+
+def exam_dashboard(year=None):
+    """Cached build_exam_dashboard(year); treat the result as read-only"""
+    global _dashboards
+
+    version = get_version(EXAM_DASHBOARD_CACHE)
+    if version is None:
+        # Exams changed in this (uncommitted) transaction: don't cache what we read
+        return build_exam_dashboard(year)
+
+    cached_version, dashboards = _dashboards
+    if cached_version == version and year in dashboards:
+        return dashboards[year]
+
+    dashboard = build_exam_dashboard(year)
+    with _lock:
+        cached_version, dashboards = _dashboards
+        if cached_version != version:
+            dashboards = {}
+        _dashboards = (version, {**dashboards, year: dashboard})
+    return dashboard
+
+
+def invalidate_exam_dashboard():
+    """Call before committing any change to exams or to a student's course (promotions)"""
+    bump_version(EXAM_DASHBOARD_CACHE)
+
+
+def top_performers(limit=10):
+    """Highest-percentage exams with their students, read from the percentage index"""
+    return Exam.query.options(joinedload(Exam.student)) \
+        .filter(Exam.percentage.isnot(None)) \
+        .order_by(Exam.percentage.desc()) \
+        .limit(limit).all()
+
+
+def recent_exams(limit=20):
+    """Most recently entered exams with their students"""
+    return Exam.query.options(joinedload(Exam.student)) \
+        .order_by(Exam.created_at.desc()) \
+        .limit(limit).all()
+
+
+def init_app(app):
+    """Bump the dashboard version with commits that delete a student or change their course or admission date"""
+    bump_on_commit(EXAM_DASHBOARD_CACHE, Student, STUDENT_COLUMNS, on_insert=False)
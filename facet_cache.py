@@ -0,0 +1,138 @@
+"""
+Cached filter facets for the students, fees and exams list pages.
+
+The dropdowns on those pages used to run two to four SELECT DISTINCT scans per
+render. build_facets() reads every facet with counts in three grouped queries
+(one GROUPING SETS pass over students, one over exams, one over college_fees),
+and each worker reuses the result until the "facets" counter in
+cache_versions moves or FACET_TTL seconds pass.
+
+The counter is bumped by ORM events: inserting or deleting a student, exam
+or fee record, or changing a student's course, category or status, an exam's
+semester or a fee record's course marks the session, and the bump goes out
+with its commit (cache_versions.bump_on_commit). Writers that bypass the ORM
+unit of work (promotions' bulk UPDATEs) call invalidate_facets() themselves;
+the TTL covers raw SQL repairs such as 'flask reconcile'.
+"""
+
+import threading
+import time
+
+from sqlalchemy import func, text
+
+from app import db
+from cache_versions import get_version, bump_version, bump_on_commit
+from models import Student, Exam, CollegeFees
+import catalog_cache
+
+FACET_CACHE = 'facets'
+FACET_TTL = 300  # seconds
+
+# Columns whose values appear in a facet, per model
+FACET_COLUMNS = {
+    Student: ('current_course', 'category', 'student_status'),
+    Exam: ('semester',),
+    CollegeFees: ('course_full_name',),
+}
+
+STUDENT_FACETS_SQL = """
+    SELECT GROUPING(current_course, category, student_status) AS grouping_set,
+           current_course, category, student_status, COUNT(*) AS count
+    FROM students
+    GROUP BY GROUPING SETS ((current_course), (category), (student_status))
+"""
+
+# GROUPING(current_course, category, student_status) for each grouping set above
+BY_COURSE, BY_CATEGORY, BY_STATUS = 3, 5, 6
+
+_lock = threading.Lock()
+_facets = (None, 0, None)  # (version, expires_at, facets), swapped as one tuple
+
+
+def _counts(rows):
+    """[(value, count)] sorted by value, without NULL/blank values"""
+    return sorted((value, count) for value, count in rows if value)
+
+
+def build_facets():
+    """Every facet as [(value, count)], uncached"""
+    rows = db.session.execute(text(STUDENT_FACETS_SQL)).mappings().all()
+    student_courses = _counts((row['current_course'], row['count']) for row in rows
+                              if row['grouping_set'] == BY_COURSE)
+    categories = _counts((row['category'], row['count']) for row in rows
+                         if row['grouping_set'] == BY_CATEGORY)
+    statuses = _counts((row['student_status'], row['count']) for row in rows
+                       if row['grouping_set'] == BY_STATUS)
+
+    semesters = _counts(db.session.query(Exam.semester, func.count(Exam.id))
+                        .group_by(Exam.semester).all())
+    fee_courses = _counts(db.session.query(CollegeFees.course_full_name, func.count(CollegeFees.id))
+                          .group_by(CollegeFees.course_full_name).all())
+
+    return {
+        'student_courses': student_courses,
+        'fee_courses': fee_courses,
+        'semesters': semesters,
+        'categories': categories,
+        'statuses': statuses,
+    }
+
+
+def get_facets():
+    """Cached build_facets(); treat the result as read-only"""
+    global _facets
+
+    version = get_version(FACET_CACHE)
+    if version is None:
+        # Facet values changed in this (uncommitted) transaction: don't cache what we read
+        return build_facets()
+
+    now = time.monotonic()
+    cached_version, expires_at, facets = _facets
+    if cached_version == version and expires_at > now:
+        return facets
+
+    with _lock:
+        cached_version, expires_at, facets = _facets
+        if cached_version != version or expires_at <= now:
+            facets = build_facets()
+            _facets = (version, now + FACET_TTL, facets)
+    return facets
+
+
+def _names(counts):
+    return [value for value, _ in counts]
+
+
+def course_options():
+    """Students page: every catalog course plus any course a student is on"""
+    courses = {detail.course_full_name for detail in catalog_cache.get_course_details() if detail.course_full_name}
+    courses.update(_names(get_facets()['student_courses']))
+    return sorted(courses)
+
+
+def fee_course_options():
+    """Fees page: students' current courses plus the courses fee records were raised for"""
+    facets = get_facets()
+    return sorted(set(_names(facets['student_courses'])) | set(_names(facets['fee_courses'])))
+
+
+def student_course_options():
+    """Courses that at least one student is currently on"""
+    return _names(get_facets()['student_courses'])
+
+
+def semester_options():
+    """Semesters that appear on at least one exam"""
+    return _names(get_facets()['semesters'])
+
+
+def invalidate_facets():
+    """Call before committing a change the ORM events can't see (bulk UPDATEs)"""
+    bump_version(FACET_CACHE)
+
+
+def init_app(app):
+    """Bump the facet version with commits that change a facet column"""
+    for model, columns in FACET_COLUMNS.items():
+        bump_on_commit(FACET_CACHE, model, columns)
@@ -0,0 +1,115 @@
+"""
+Fee recalculation engine for CollegeFees records.
+
+Derived totals (total_fee, total_amount_after_rebate and total_amount_due)
+are recomputed from the component columns whenever a fee record is flushed,
+so only the rows touched by a request are rewritten. total_fees_paid is the
+rollup of the fee_payments ledger, maintained by fee_ledger.record_payment.
+The full-table sweep is kept for offline reconciliation only.
+"""
+
+from decimal import Decimal
+
+import click
+from sqlalchemy import event, text
+
+from app import db
+from models import CollegeFees
+
+# Component fees that make up total_fee
+FEE_COMPONENT_FIELDS = [
+    'total_course_fees', 'enrollment_fee', 'eligibility_certificate_fee',
+    'university_affiliation_fee', 'university_sports_fee', 'university_development_fee',
+    'tc_cc_fee', 'miscellaneous_fee_1', 'miscellaneous_fee_2', 'miscellaneous_fee_3',
+]
+
+
+def _to_decimal(value):
+    """Convert a numeric column value (Decimal, float, str or None) to Decimal"""
+    if value is None or value == '':
+        return Decimal('0')
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def compute_fee_totals(fee_record):
+    """Compute the derived fee totals for a single fee record"""
+    total_fee = sum((_to_decimal(getattr(fee_record, field)) for field in FEE_COMPONENT_FIELDS), Decimal('0'))
+    # Rollup of the payment ledger, kept current by fee_ledger.record_payment
+    total_fees_paid = _to_decimal(fee_record.total_fees_paid)
+
+    # Meera rebate is only deducted once it has been granted (same rule as the student form)
+    meera_rebate_amount = _to_decimal(fee_record.meera_rebate_amount)
+    total_amount_after_rebate = total_fee
+    if fee_record.meera_rebate_granted and meera_rebate_amount > 0:
+        total_amount_after_rebate = total_fee - meera_rebate_amount
+
+    # Dues brought forward by a fee rollover are owed on this record; a record whose
+    # dues were carried forward to the next level owes nothing itself
+    if fee_record.dues_carried_forward:
+        total_amount_due = Decimal('0')
+    else:
+        previous_dues = _to_decimal(fee_record.previous_dues)
+        total_amount_due = max(Decimal('0'), total_amount_after_rebate + previous_dues - total_fees_paid)
+
+    return {
+        'total_fee': total_fee,
+        'total_fees_paid': total_fees_paid,
+        'total_amount_after_rebate': total_amount_after_rebate,
+        'total_amount_due': total_amount_due,
+    }
+
+
+def apply_fee_totals(fee_record):
+    """Write the derived totals onto a fee record in place"""
+    for field, value in compute_fee_totals(fee_record).items():
+        setattr(fee_record, field, value)
+
+
+def _recalculate_on_flush(mapper, connection, fee_record):
+    """Mapper hook: recompute totals for every fee record being inserted or updated"""
+    apply_fee_totals(fee_record)
+
+
+def _coalesce_sum(fields):
+    return ' + '.join(f'COALESCE({field}, 0)' for field in fields)
+
+
+# SQL equivalents of compute_fee_totals, used by the set-based full sweep
+TOTAL_FEE_SQL = _coalesce_sum(FEE_COMPONENT_FIELDS)
+TOTAL_FEES_PAID_SQL = "COALESCE((SELECT SUM(amount) FROM fee_payments WHERE fee_payments.fee_id = college_fees.id), 0)"
+TOTAL_AMOUNT_AFTER_REBATE_SQL = (
+    f"({TOTAL_FEE_SQL}) - CASE WHEN meera_rebate_granted AND COALESCE(meera_rebate_amount, 0) > 0 "
+    f"THEN meera_rebate_amount ELSE 0 END"
+)
+TOTAL_AMOUNT_DUE_SQL = (
+    f"CASE WHEN COALESCE(dues_carried_forward, FALSE) THEN 0 "
+    f"ELSE GREATEST(({TOTAL_AMOUNT_AFTER_REBATE_SQL}) + COALESCE(previous_dues, 0) - ({TOTAL_FEES_PAID_SQL}), 0) END"
+)
+
+
+def recalculate_all_fee_totals():
+    """Recompute derived totals for every fee record in one UPDATE (offline reconciliation)"""
+    result = db.session.execute(text(f"""
+        UPDATE college_fees
+        SET total_fee = {TOTAL_FEE_SQL},
+            total_fees_paid = {TOTAL_FEES_PAID_SQL},
+            total_amount_after_rebate = {TOTAL_AMOUNT_AFTER_REBATE_SQL},
+            total_amount_due = {TOTAL_AMOUNT_DUE_SQL}
+    """))
+    db.session.commit()
+    return result.rowcount
+
+
+def init_app(app):
+    """Register the flush hooks and the offline recalculation command"""
+    if not event.contains(CollegeFees, 'before_insert', _recalculate_on_flush):
+        event.listen(CollegeFees, 'before_insert', _recalculate_on_flush)
+        event.listen(CollegeFees, 'before_update', _recalculate_on_flush)
+
+    @app.cli.command('recalculate-fees')
+    def recalculate_fees_command():
+        """Recalculate derived totals for all fee records."""
+        updated_count = recalculate_all_fee_totals()
+        click.echo(f"✓ Recalculated totals for {updated_count} fee records")
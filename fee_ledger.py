@@ -0,0 +1,107 @@
+"""
+Payment ledger for fee records.
+
+Every payment is one fee_payments row (fee_id, installment_number, amount,
+invoice_number, paid_at). CollegeFees.total_fees_paid is the rollup of those
+rows: record_payment() bumps it in the same transaction, and
+'flask reconcile fee-totals' rebuilds it from the ledger with one SUM.
+
+The old installment_1..6 / invoice1..6_number columns are no longer written;
+migrate_fee_payments_ledger.py copies them into the ledger and creates the
+college_fees_installments compatibility view for reports that still expect
+six columns. New payments are numbered after the highest non-zero legacy slot
+as well as the ledger, so the backfill can run while payments are being taken
+without a new payment taking a legacy payment's installment number.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import case, func, select
+
+from app import db
+from models import CollegeFees, FeePayment
+
+# Legacy slot columns, used by the backfill and the compatibility view
+LEGACY_INSTALLMENT_SLOTS = [(i, f'installment_{i}', f'invoice{i}_number') for i in range(1, 7)]
+
+# Highest legacy slot holding a payment (0 if none); these numbers belong to the backfill
+LAST_LEGACY_SLOT = case(
+    *[(getattr(CollegeFees, column) > 0, number) for number, column, _ in reversed(LEGACY_INSTALLMENT_SLOTS)],
+    else_=0,
+)
+
+
+def current_fee_record(student_id):
+    """A student's current fee record: the latest one (fee rollover adds one per course level)"""
+    return CollegeFees.query.filter_by(student_id=student_id) \
+        .order_by(CollegeFees.id.desc()).first()
+
+
+def lock_fee_record(student_id):
+    """Current fee record for a student, locked FOR UPDATE so concurrent payments serialise"""
+    return CollegeFees.query.filter_by(student_id=student_id) \
+        .order_by(CollegeFees.id.desc()).with_for_update().first()
+
+
+def _last_legacy_slot(fee_record):
+    return max((number for number, column, _ in LEGACY_INSTALLMENT_SLOTS
+                if (getattr(fee_record, column) or 0) > 0), default=0)
+
+
+def next_installment_number(fee_record):
+    """Next payment number for a fee record (1 for the first payment), after any legacy slot"""
+    if fee_record.id is None:
+        return _last_legacy_slot(fee_record) + 1
+    last_number = db.session.query(func.max(FeePayment.installment_number)) \
+        .filter(FeePayment.fee_id == fee_record.id).scalar()
+    return max(last_number or 0, _last_legacy_slot(fee_record)) + 1
+
+
+def next_installment_numbers(fee_ids):
+    """Next payment number for each fee id (after the ledger and any legacy slot), in one query"""
+    last_ledger_number = select(func.max(FeePayment.installment_number)) \
+        .where(FeePayment.fee_id == CollegeFees.id).correlate(CollegeFees).scalar_subquery()
+    last_numbers = dict(
+        db.session.query(CollegeFees.id, func.greatest(func.coalesce(last_ledger_number, 0), LAST_LEGACY_SLOT))
+        .filter(CollegeFees.id.in_(list(fee_ids)))
+        .all()
+    )
+    return {fee_id: (last_numbers.get(fee_id) or 0) + 1 for fee_id in fee_ids}
+
+
+def record_payment(fee_record, amount, invoice_number=None, payment_mode=None, paid_at=None,
+                   installment_number=None):
+    """Append a payment to the ledger and bump the fee record's total_fees_paid rollup.
+
+    The caller should hold the fee record's row lock (see lock_fee_record) so two
+    payments for the same student can't both read the old rollup.
+    """
+    amount = Decimal(str(amount))
+    if installment_number is None:
+        installment_number = next_installment_number(fee_record)
+
+    payment = FeePayment(
+        fee_record=fee_record,
+        installment_number=installment_number,
+        amount=amount,
+        invoice_number=invoice_number,
+        payment_mode=payment_mode,
+        paid_at=paid_at or datetime.utcnow(),
+    )
+    db.session.add(payment)
+
+    # The flush hook in fee_calculations recalculates total_amount_due from the new rollup
+    fee_record.total_fees_paid = Decimal(str(fee_record.total_fees_paid or 0)) + amount
+    return payment
+
+
+def payment_slots(fee_record, slots=len(LEGACY_INSTALLMENT_SLOTS)):
+    """Amounts of the first payments padded to a fixed width, for six-column exports"""
+    return pad_payment_slots([payment.amount for payment in fee_record.payments], slots)
+
+
+def pad_payment_slots(amounts, slots=len(LEGACY_INSTALLMENT_SLOTS)):
+    """First payment amounts (in installment order) padded to a fixed width"""
+    amounts = [float(amount or 0) for amount in (amounts or [])[:slots]]
+    return amounts + [0.0] * (slots - len(amounts))
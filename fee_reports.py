@@ -0,0 +1,141 @@
+"""
+Aggregates behind the fee summary page and its chart APIs.
+
+Each function answers with one grouped query (COUNT(*) FILTER (WHERE ...) /
+SUM ... GROUP BY) instead of one COUNT or SUM per figure, so the summary page
+costs three round trips however many statuses, months or courses it shows.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import func, and_, distinct, select
+
+from app import db
+from models import Student, CollegeFees, Invoice
+from utils import year_range_filter
+
+SCHOLARSHIP_STATUSES = ['Applied', 'Approved', 'Granted']
+
+
+def _scholarship_columns():
+    """Count columns in (status, [government, meera, merit, need]) order"""
+    columns = []
+    for status in SCHOLARSHIP_STATUSES:
+        flag = status.lower()
+        columns += [
+            # Government and Meera counts are per student ...
+            func.count(distinct(Student.id)).filter(Student.scholarship_status == status),
+            func.count(distinct(Student.id)).filter(Student.rebate_meera_scholarship_status == status),
+            # ... merit and need-based counts are per fee record
+            func.count(CollegeFees.id).filter(and_(
+                getattr(CollegeFees, f'scholarship_{flag}') == True,
+                CollegeFees.government_scholarship_amount > 0
+            )),
+            func.count(CollegeFees.id).filter(and_(
+                getattr(CollegeFees, f'meera_rebate_{flag}') == True,
+                CollegeFees.meera_rebate_amount > 0
+            )),
+        ]
+    return columns
+
+
+def _split_scholarship_counts(values):
+    """[applied], [approved], [granted] lists from the flat _scholarship_columns() values"""
+    values = [int(value or 0) for value in values]
+    return tuple(values[i:i + 4] for i in range(0, len(values), 4))
+
+
+def _fee_total_columns():
+    return [
+        func.sum(CollegeFees.total_fee),
+        func.sum(CollegeFees.total_fees_paid),
+        # Records rolled over to a new level carry no dues of their own (see fee_rollover)
+        func.count(CollegeFees.id).filter(CollegeFees.total_amount_due > 0),
+    ]
+
+
+def _fee_totals(values):
+    total_fees_due, total_fees_collected, students_with_dues = values
+    total_fees_due = total_fees_due or 0
+    total_fees_collected = total_fees_collected or 0
+    return {
+        'total_fees_due': total_fees_due,
+        'total_fees_collected': total_fees_collected,
+        'total_pending_dues': max(0, total_fees_due - total_fees_collected),
+        'students_with_dues': students_with_dues or 0,
+    }
+
+
+def _query_students_with_fees(*columns):
+    return db.session.query(*columns).select_from(Student) \
+        .outerjoin(CollegeFees, CollegeFees.student_id == Student.id)
+
+
+def fee_totals(year=None):
+    """Fees due, collected, pending and students with dues, in one query"""
+    query = _query_students_with_fees(*_fee_total_columns())
+    if year is not None:
+        query = query.filter(year_range_filter(Student.admission_date, year))
+    return _fee_totals(query.one())
+
+
+def scholarship_counts(year=None):
+    """(applied, approved, granted) lists for [government, meera, merit, need] in one query"""
+    query = _query_students_with_fees(*_scholarship_columns())
+    if year is not None:
+        query = query.filter(year_range_filter(Student.admission_date, year))
+    return _split_scholarship_counts(query.one())
+
+
+def monthly_collections(year):
+    """Invoice totals for January..December of a year, in one grouped query"""
+    month = func.extract('month', Invoice.date_time)
+    totals = {
+        int(month_number): total for month_number, total in
+        db.session.query(month, func.sum(Invoice.invoice_amount))
+        .filter(year_range_filter(Invoice.date_time, year))
+        .group_by(month)
+    }
+    return [float(totals.get(month_number) or 0) for month_number in range(1, 13)]
+
+
+def course_collections(year=None):
+    """[(current_course, total invoiced)] grouped by the student's current course"""
+    query = db.session.query(
+        Student.current_course,
+        func.sum(Invoice.invoice_amount)
+    ).join(Invoice).filter(Student.current_course.isnot(None))
+    if year is not None:
+        query = query.filter(year_range_filter(Student.admission_date, year))
+    return query.group_by(Student.current_course).all()
+
+
+def fee_summary_data(year=None):
+    """Everything the fee summary page shows, in three queries"""
+    year = year or datetime.now().year
+
+    # 1. Fee totals, invoice count and scholarship counts
+    fee_columns = _fee_total_columns()
+    row = _query_students_with_fees(
+        *fee_columns,
+        select(func.count(Invoice.id)).scalar_subquery(),
+        *_scholarship_columns()
+    ).one()
+    summary = _fee_totals(row[:len(fee_columns)])
+    total_invoices = row[len(fee_columns)] or 0
+    scholarship_applied, scholarship_approved, scholarship_granted = \
+        _split_scholarship_counts(row[len(fee_columns) + 1:])
+
+    # 2. Monthly collections, 3. course-wise collections
+    course_rows = course_collections()
+
+    return {
+        **summary,
+        'total_invoices': total_invoices,
+        'monthly_collections': monthly_collections(year),
+        'course_names': [course for course, total in course_rows if course],
+        'course_collections': [float(total) for course, total in course_rows if total],
+        'scholarship_applied': scholarship_applied,
+        'scholarship_approved': scholarship_approved,
+        'scholarship_granted': scholarship_granted,
+    }
@@ -0,0 +1,127 @@
+"""
+Fee-record rollover for promoted students.
+
+When a student moves to the next course level they need a new CollegeFees
+record for it. rollover_fee_records() creates them with one INSERT ... SELECT:
+for every student whose current course has no fee record yet, a record is
+created from course_details.total_course_fees, the outstanding
+total_amount_due of the student's latest record is brought forward into
+previous_dues, and that record is marked dues_carried_forward (so its own
+amount due drops to zero and the dues are never counted twice).
+
+The statement is idempotent: a student who already has a record for their
+current course detail is skipped, so re-running it (or running it after a
+partial promotion) only creates what is missing.
+
+promotion._apply_changes runs it for each committed chunk of promoted
+students; 'flask reconcile fee-rollover' runs it for everyone in a single
+transaction with the usual timing report.
+"""
+
+import time
+
+from sqlalchemy import text
+
+from app import db
+
+# Students whose current course has no fee record yet, with their latest record's dues
+ROLLOVER_SOURCE_TEMPLATE = """
+    SELECT s.id AS student_id, s.student_unique_id AS label,
+           prev.course_full_name AS old_value, cd.course_full_name AS new_value,
+           cd.id AS coursedetail_id, c.course_id,
+           COALESCE(cd.total_course_fees, 0) AS total_course_fees,
+           prev.id AS previous_fee_id,
+           COALESCE(prev.total_amount_due, 0) AS previous_dues,
+           COALESCE(s.rebate_meera_scholarship_status = 'Applied', FALSE) AS meera_rebate_applied,
+           COALESCE(s.rebate_meera_scholarship_status = 'Approved', FALSE) AS meera_rebate_approved,
+           COALESCE(s.rebate_meera_scholarship_status = 'Granted', FALSE) AS meera_rebate_granted,
+           COALESCE(s.scholarship_status = 'Applied', FALSE) AS scholarship_applied,
+           COALESCE(s.scholarship_status = 'Approved', FALSE) AS scholarship_approved,
+           COALESCE(s.scholarship_status = 'Granted', FALSE) AS scholarship_granted
+    FROM students s
+    JOIN LATERAL (
+        SELECT id, course_short_name, course_full_name, total_course_fees
+        FROM course_details
+        WHERE course_full_name = s.current_course
+        ORDER BY id
+        LIMIT 1
+    ) cd ON TRUE
+    LEFT JOIN courses c ON c.course_short_name = cd.course_short_name
+    LEFT JOIN LATERAL (
+        SELECT f.id, f.course_full_name, f.total_amount_due
+        FROM college_fees f
+        WHERE f.student_id = s.id
+        ORDER BY f.id DESC
+        LIMIT 1
+    ) prev ON TRUE
+    WHERE COALESCE(s.student_status, '') <> 'Dropout'
+      AND NOT EXISTS (
+          SELECT 1 FROM college_fees f
+          WHERE f.student_id = s.id
+            AND (f.coursedetail_id = cd.id OR f.course_full_name = cd.course_full_name)
+      )
+      {student_filter}
+"""
+
+# Close the previous records and insert the new ones in one statement; both parts
+# read the same snapshot, and the statement's row count is the number of records created
+ROLLOVER_APPLY_TEMPLATE = """
+    WITH src AS ({source}),
+    closed AS (
+        UPDATE college_fees AS f
+        SET dues_carried_forward = TRUE, total_amount_due = 0
+        FROM src
+        WHERE f.id = src.previous_fee_id AND src.previous_dues > 0
+    )
+    INSERT INTO college_fees (
+        student_id, course_id, coursedetail_id, course_full_name, total_course_fees,
+        enrollment_fee, eligibility_certificate_fee, university_affiliation_fee,
+        university_sports_fee, university_development_fee, tc_cc_fee,
+        miscellaneous_fee_1, miscellaneous_fee_2, miscellaneous_fee_3, total_fee,
+        installment_1, installment_2, installment_3, installment_4, installment_5, installment_6,
+        total_fees_paid, meera_rebate_applied, meera_rebate_approved, meera_rebate_granted,
+        meera_rebate_amount, scholarship_applied, scholarship_approved, scholarship_granted,
+        government_scholarship_amount, previous_dues, dues_carried_forward,
+        total_amount_due, total_amount_after_rebate,
+        pending_dues_for_libraries, pending_dues_for_hostel, exam_admit_card_issued, created_at
+    )
+    SELECT
+        src.student_id, src.course_id, src.coursedetail_id, src.new_value, src.total_course_fees,
+        0, 0, 0,
+        0, 0, 0,
+        0, 0, 0, src.total_course_fees,
+        0, 0, 0, 0, 0, 0,
+        0, src.meera_rebate_applied, src.meera_rebate_approved, src.meera_rebate_granted,
+        0, src.scholarship_applied, src.scholarship_approved, src.scholarship_granted,
+        0, src.previous_dues, FALSE,
+        src.total_course_fees + src.previous_dues, src.total_course_fees,
+        FALSE, FALSE, FALSE, NOW()
+    FROM src
+"""
+
+ROLLOVER_SOURCE = ROLLOVER_SOURCE_TEMPLATE.format(student_filter='')
+ROLLOVER_APPLY = ROLLOVER_APPLY_TEMPLATE.format(source=ROLLOVER_SOURCE)
+
+_STUDENT_FILTER = "AND s.id = ANY(:student_ids)"
+
+
+def rollover_fee_records(student_ids=None):
+    """Create next-level fee records for the given students (None = all students).
+
+    Runs in the caller's transaction and does not commit. Returns
+    (records created, seconds taken).
+    """
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        if not student_ids:
+            return 0, 0.0
+        sql = ROLLOVER_APPLY_TEMPLATE.format(
+            source=ROLLOVER_SOURCE_TEMPLATE.format(student_filter=_STUDENT_FILTER)
+        )
+        params = {'student_ids': student_ids}
+    else:
+        sql, params = ROLLOVER_APPLY, {}
+
+    started = time.perf_counter()
+    result = db.session.execute(text(sql), params)
+    return result.rowcount, time.perf_counter() - started
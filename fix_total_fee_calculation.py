@@ -23,44 +23,10 @@ def _fix_total_fee_calculation_logic(db, CollegeFees):
     """Internal logic for fixing fee calculations"""
     try:
         print("Syncing total_fee calculation for all college_fees records...")
-        
-        # Get all fee records
-        fee_records = CollegeFees.query.all()
-        updated_count = 0
-        
-        for fee_record in fee_records:
-            # Calculate total_fee manually using the same formula as frontend
-            old_total = float(fee_record.total_fee or 0)
-            
-            # Calculate new total using all fee components including eligibility_certificate_fee
-            new_total = (
-                float(fee_record.total_course_fees or 0) +
-                float(fee_record.enrollment_fee or 0) +
-                float(fee_record.eligibility_certificate_fee or 0) +
-                float(fee_record.university_affiliation_fee or 0) +
-                float(fee_record.university_sports_fee or 0) +
-                float(fee_record.university_development_fee or 0) +
-                float(fee_record.tc_cc_fee or 0) +
-                float(fee_record.miscellaneous_fee_1 or 0) +
-                float(fee_record.miscellaneous_fee_2 or 0) +
-                float(fee_record.miscellaneous_fee_3 or 0)
-            )
-            
-            # Update the total_fee field and ensure total_fees_paid is current
-            fee_record.total_fee = new_total
-            
-            # Also update total_fees_paid using the calculated property
-            current_paid = fee_record.calculated_total_fees_paid
-            if fee_record.total_fees_paid != current_paid:
-                fee_record.total_fees_paid = current_paid
-            
-            if old_total != new_total:
-                updated_count += 1
-                print(f"Updated student ID {fee_record.student_id}: total_fee {old_total} -> {new_total}")
-        
-        db.session.commit()
-        print(f"✓ Successfully synced {updated_count} fee records")
-        print(f"✓ Total records processed: {len(fee_records)}")
+
+        # Set-based equivalent: flask reconcile fee-totals (same formula used on flush)
+        from reconcile import run_and_report
+        run_and_report(['fee-totals'])
         
     except Exception as e:
         db.session.rollback()
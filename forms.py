@@ -1,7 +1,29 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SelectField, TextAreaField, DateField, IntegerField, DecimalField, BooleanField, SubmitField
 from wtforms.validators import DataRequired, Email, Length, NumberRange, Optional, ValidationError
-from wtforms.widgets import TextArea
+from wtforms.widgets import TextArea, HiddenInput
+
+class StudentLookupField(IntegerField):
+    """Hidden student id filled in by the /api/search-students typeahead.
+
+    Unlike a SelectField it never loads a choices list; validation is a single
+    primary-key lookup and the matched student is kept on ``field.student``.
+    """
+    widget = HiddenInput()
+
+    def __init__(self, label=None, validators=None, exclude_graduated=True, **kwargs):
+        super().__init__(label, validators, **kwargs)
+        self.exclude_graduated = exclude_graduated
+        self.student = None
+
+    def pre_validate(self, form):
+        if self.data is None:
+            return
+        from models import Student
+        self.student = Student.query.get(self.data)
+        if not self.student or (self.exclude_graduated and self.student.student_status == 'Graduated'):
+            self.student = None
+            raise ValidationError('Please select a valid student.')
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=64)])
@@ -98,7 +120,7 @@ class SubjectForm(FlaskForm):
     submit = SubmitField('Save Subject')
 
 class PaymentForm(FlaskForm):
-    student_id = SelectField('Student', coerce=int, validators=[DataRequired()])
+    student_id = StudentLookupField('Student', validators=[DataRequired()])
     amount = DecimalField('Payment Amount', validators=[DataRequired(), NumberRange(min=0)])
     payment_mode = SelectField('Payment Mode', choices=[('Cash', 'Cash'), ('Online', 'Online'), ('Cheque', 'Cheque'), ('DD', 'DD')])
     submit = SubmitField('Process Payment')
@@ -144,7 +166,7 @@ class FeeManagementForm(FlaskForm):
     submit = SubmitField('Save Fee Details')
 
 class ExamForm(FlaskForm):
-    student_id = SelectField('Student', coerce=int, validators=[DataRequired()])
+    student_id = StudentLookupField('Student', validators=[DataRequired()])
     course_id = SelectField('Course', coerce=int, validators=[Optional()])
     exam_name = StringField('Exam Name', validators=[DataRequired(), Length(max=100)])
     exam_date = DateField('Exam Date', validators=[DataRequired()])
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+Migration script to move fee payments from the six installment columns on
+college_fees into the fee_payments ledger.
+
+- Creates fee_payments if it does not exist yet (db.create_all)
+- Backfills the ledger from installment_1..6 / invoice1..6_number in batches of
+  fee ids, committing after each batch so the app can keep running
+- Recomputes total_fees_paid from the ledger for each batch
+- Creates the college_fees_installments view, which still exposes the first six
+  payments as installment_N / invoiceN_number columns for old reports
+
+Safe to re-run: rows already in the ledger are skipped (fee_id, installment_number
+is unique). Safe to run while payments are being taken: fee_ledger numbers new
+payments after the highest non-zero legacy slot, so they never take a legacy
+payment's installment number, and each batch's rollup then counts both. A legacy
+slot whose number is held by a different ledger payment (posted by an older
+release before the backfill) is reported, not skipped silently. Run it before
+'flask reconcile fee-totals', which rebuilds total_fees_paid from the ledger and
+would otherwise zero unmigrated records.
+"""
+
+import sys
+
+from app import app, db
+from sqlalchemy import text
+
+BATCH_SIZE = 1000
+
+BACKFILL_SQL = """
+    INSERT INTO fee_payments (fee_id, installment_number, amount, invoice_number,
+                              payment_mode, paid_at, created_at)
+    SELECT f.id, v.installment_number, v.amount, NULLIF(trim(v.invoice_number), ''),
+           f.payment_mode, COALESCE(i.date_time, f.created_at, NOW()), NOW()
+    FROM college_fees f
+    CROSS JOIN LATERAL (VALUES
+        (1, f.installment_1, f.invoice1_number),
+        (2, f.installment_2, f.invoice2_number),
+        (3, f.installment_3, f.invoice3_number),
+        (4, f.installment_4, f.invoice4_number),
+        (5, f.installment_5, f.invoice5_number),
+        (6, f.installment_6, f.invoice6_number)
+    ) AS v(installment_number, amount, invoice_number)
+    LEFT JOIN invoices i ON i.invoice_number = v.invoice_number
+    WHERE f.id > :start_id AND f.id <= :end_id
+      AND v.amount > 0
+    ON CONFLICT (fee_id, installment_number) DO NOTHING
+"""
+
+# Legacy payments whose installment number is already used by a different ledger payment
+COLLISIONS_SQL = """
+    SELECT f.id AS fee_id, v.installment_number, v.amount
+    FROM college_fees f
+    CROSS JOIN LATERAL (VALUES
+        (1, f.installment_1, f.invoice1_number),
+        (2, f.installment_2, f.invoice2_number),
+        (3, f.installment_3, f.invoice3_number),
+        (4, f.installment_4, f.invoice4_number),
+        (5, f.installment_5, f.invoice5_number),
+        (6, f.installment_6, f.invoice6_number)
+    ) AS v(installment_number, amount, invoice_number)
+    JOIN fee_payments p ON p.fee_id = f.id AND p.installment_number = v.installment_number
+    WHERE f.id > :start_id AND f.id <= :end_id
+      AND v.amount > 0
+      AND (p.amount <> v.amount
+           OR p.invoice_number IS DISTINCT FROM NULLIF(trim(v.invoice_number), ''))
+"""
+
+ROLLUP_SQL = """
+    UPDATE college_fees f
+    SET total_fees_paid = COALESCE(p.total_paid, 0)
+    FROM (
+        SELECT f2.id AS fee_id, SUM(fp.amount) AS total_paid
+        FROM college_fees f2
+        LEFT JOIN fee_payments fp ON fp.fee_id = f2.id
+        WHERE f2.id > :start_id AND f2.id <= :end_id
+        GROUP BY f2.id
+    ) p
+    WHERE f.id = p.fee_id
+      AND f.total_fees_paid IS DISTINCT FROM COALESCE(p.total_paid, 0)
+"""
+
+INSTALLMENTS_VIEW_SQL = """
+    CREATE OR REPLACE VIEW college_fees_installments AS
+    SELECT f.id AS fee_id,
+           f.student_id,
+           COALESCE(SUM(p.amount) FILTER (WHERE p.installment_number = 1), 0) AS installment_1,
+           MAX(p.invoice_number) FILTER (WHERE p.installment_number = 1) AS invoice1_number,
+           COALESCE(SUM(p.amount) FILTER (WHERE p.installment_number = 2), 0) AS installment_2,
+           MAX(p.invoice_number) FILTER (WHERE p.installment_number = 2) AS invoice2_number,
+           COALESCE(SUM(p.amount) FILTER (WHERE p.installment_number = 3), 0) AS installment_3,
+           MAX(p.invoice_number) FILTER (WHERE p.installment_number = 3) AS invoice3_number,
+           COALESCE(SUM(p.amount) FILTER (WHERE p.installment_number = 4), 0) AS installment_4,
+           MAX(p.invoice_number) FILTER (WHERE p.installment_number = 4) AS invoice4_number,
+           COALESCE(SUM(p.amount) FILTER (WHERE p.installment_number = 5), 0) AS installment_5,
+           MAX(p.invoice_number) FILTER (WHERE p.installment_number = 5) AS invoice5_number,
+           COALESCE(SUM(p.amount) FILTER (WHERE p.installment_number = 6), 0) AS installment_6,
+           MAX(p.invoice_number) FILTER (WHERE p.installment_number = 6) AS invoice6_number,
+           COUNT(p.id) AS payment_count,
+           COALESCE(SUM(p.amount), 0) AS total_paid
+    FROM college_fees f
+    LEFT JOIN fee_payments p ON p.fee_id = f.id
+    GROUP BY f.id, f.student_id
+"""
+
+
+def migrate_fee_payments_ledger(batch_size=BATCH_SIZE):
+    """Backfill fee_payments from the installment columns and create the compatibility view"""
+    with app.app_context():
+        try:
+            # Check that the legacy columns are there to copy from
+            result = db.session.execute(text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_name = 'college_fees'
+                AND column_name = 'installment_1'
+            """))
+
+            if not result.fetchone():
+                print("✓ college_fees has no installment columns, nothing to backfill")
+                return
+
+            db.create_all()  # Creates fee_payments if needed
+
+            max_id = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM college_fees")).scalar()
+            print(f"Backfilling fee_payments for fee ids up to {max_id} in batches of {batch_size}...")
+
+            inserted = 0
+            updated = 0
+            collisions = []
+            for start_id in range(0, max_id, batch_size):
+                params = {'start_id': start_id, 'end_id': start_id + batch_size}
+                collisions += db.session.execute(text(COLLISIONS_SQL), params).all()
+                inserted += db.session.execute(text(BACKFILL_SQL), params).rowcount
+                updated += db.session.execute(text(ROLLUP_SQL), params).rowcount
+                # Commit per batch so row locks are held only briefly
+                db.session.commit()
+                print(f"  ✓ fee ids {start_id + 1}-{min(start_id + batch_size, max_id)}")
+
+            print(f"✓ Copied {inserted} payments into the ledger")
+            print(f"✓ Recomputed total_fees_paid on {updated} fee records")
+            if collisions:
+                print(f"✗ {len(collisions)} legacy payments were not copied: their installment number "
+                      f"is held by a different ledger payment. Post them again by hand:")
+                for fee_id, installment_number, amount in collisions:
+                    print(f"  fee #{fee_id}: installment_{installment_number} = {amount}")
+
+            db.session.execute(text(INSTALLMENTS_VIEW_SQL))
+            db.session.commit()
+            print("✓ Created college_fees_installments view")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Error migrating fee payments: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else BATCH_SIZE
+    migrate_fee_payments_ledger(batch_size)
@@ -34,7 +34,7 @@ class UserProfile(UserMixin, db.Model):
     password_hash = db.Column(db.String(256), nullable=False)
     status = db.Column(db.String(20), default='Active')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Also set by trigger (change_feed.py)
 
 class Course(db.Model):
     __tablename__ = 'courses'
@@ -44,6 +44,7 @@ class Course(db.Model):
     course_full_name = db.Column(db.String(200), nullable=False)
     course_category = db.Column(db.String(100))
     duration = db.Column(db.Integer)  # in years
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Also set by trigger (change_feed.py)
 
     # Relationships
     course_details = db.relationship('CourseDetails', backref='course', lazy=True)
@@ -65,6 +66,7 @@ class CourseDetails(db.Model):
     misc_course_fees_5 = db.Column(db.Numeric(10, 2), default=0)
     misc_course_fees_6 = db.Column(db.Numeric(10, 2), default=0)
     total_course_fees = db.Column(db.Numeric(10, 2), default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Also set by trigger (change_feed.py)
 
 class Subject(db.Model):
     __tablename__ = 'subjects'
@@ -73,6 +75,23 @@ class Subject(db.Model):
     course_short_name = db.Column(db.String(10), db.ForeignKey('courses.course_short_name'), nullable=False)
     subject_name = db.Column(db.String(200), nullable=False)
     subject_type = db.Column(db.String(20), nullable=False)  # 'Compulsory' or 'Elective'
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Also set by trigger (change_feed.py)
+
+def build_concatenated_address(street, area_village, city_tehsil, state):
+    """'street, area/village, city/tehsil, state' from the address fields, skipping blank and NaN parts"""
+    address_parts = []
+
+    # Only add non-empty, non-NaN values
+    for part in (street, area_village, city_tehsil, state):
+        if part and str(part).strip() and str(part).strip().lower() != 'nan':
+            address_parts.append(str(part).strip())
+
+    return ', '.join(address_parts)
+
+# Everything the student search matches on, as one string (immutable, so it can be a generated column)
+STUDENT_SEARCH_TEXT_SQL = (
+    "student_unique_id || ' ' || first_name || ' ' || last_name || ' ' || COALESCE(current_course, '')"
+)
 
 class Student(db.Model):
     __tablename__ = 'students'
@@ -87,7 +106,7 @@ class Student(db.Model):
     gender = db.Column(db.String(10), nullable=False)
     category = db.Column(db.String(20))  # General, SC, ST, OBC
     email = db.Column(db.String(120))
-    current_course = db.Column(db.String(200))
+    current_course = db.Column(db.String(200), index=True)
     subject_1_name = db.Column(db.String(200))
     subject_2_name = db.Column(db.String(200))
     subject_3_name = db.Column(db.String(200))
@@ -102,10 +121,13 @@ class Student(db.Model):
     school_name = db.Column(db.String(200))
     scholarship_status = db.Column(db.String(20), default='Not Applied')  # Not Applied, Applied, Approved, Rejected, Granted
     rebate_meera_scholarship_status = db.Column(db.String(20), default='Not Applied')
-    student_status = db.Column(db.String(20), default='Active')  # Active, Dropout, Graduated
-    admission_date = db.Column(db.Date, default=datetime.utcnow().date())
+    student_status = db.Column(db.String(20), default='Active', index=True)  # Active, Dropout, Graduated
+    admission_date = db.Column(db.Date, default=datetime.utcnow().date(), index=True)
     concatenated_address = db.Column(db.Text)  # For bulk export/import operations
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Also set by trigger (change_feed.py)
+    # Generated by the database; trigram-indexed for search (see student_search.py)
+    search_text = db.deferred(db.Column(db.Text, db.Computed(STUDENT_SEARCH_TEXT_SQL, persisted=True)))
 
     # Relationships
     fees = db.relationship('CollegeFees', backref='student', lazy=True)
@@ -114,19 +136,9 @@ class Student(db.Model):
 
     def update_concatenated_address(self):
         """Update concatenated address from individual address fields"""
-        address_parts = []
-        
-        # Only add non-empty, non-NaN values
-        if self.street and str(self.street).strip() and str(self.street).strip().lower() != 'nan':
-            address_parts.append(str(self.street).strip())
-        if self.area_village and str(self.area_village).strip() and str(self.area_village).strip().lower() != 'nan':
-            address_parts.append(str(self.area_village).strip())
-        if self.city_tehsil and str(self.city_tehsil).strip() and str(self.city_tehsil).strip().lower() != 'nan':
-            address_parts.append(str(self.city_tehsil).strip())
-        if self.state and str(self.state).strip() and str(self.state).strip().lower() != 'nan':
-            address_parts.append(str(self.state).strip())
-        
-        self.concatenated_address = ', '.join(address_parts)
+        self.concatenated_address = build_concatenated_address(
+            self.street, self.area_village, self.city_tehsil, self.state
+        )
 
     def split_concatenated_address(self, concatenated_address):
         """Split concatenated address into individual address fields"""
@@ -148,7 +160,7 @@ class CollegeFees(db.Model):
     __tablename__ = 'college_fees'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False, index=True)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id'))
     coursedetail_id = db.Column(db.Integer, db.ForeignKey('course_details.id'))
     course_full_name = db.Column(db.String(200))  # Snapshot of course name at time of fee record creation
@@ -191,18 +203,25 @@ class CollegeFees(db.Model):
     government_scholarship_amount = db.Column(db.Numeric(10, 2), default=0)
     total_amount_due = db.Column(db.Numeric(10, 2), default=0)
     total_amount_after_rebate = db.Column(db.Numeric(10, 2), default=0)
+    # Fee rollover: dues brought forward from the previous level's record, which is then closed
+    previous_dues = db.Column(db.Numeric(10, 2), default=0)
+    dues_carried_forward = db.Column(db.Boolean, default=False)
     pending_dues_for_libraries = db.Column(db.Boolean, default=False)
     pending_dues_for_hostel = db.Column(db.Boolean, default=False)
     exam_admit_card_issued = db.Column(db.Boolean, default=False)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Also set by trigger (change_feed.py)
+
+    # Payment ledger (replaces the fixed installment_1..6 slots, which are kept read-only for history)
+    payments = db.relationship('FeePayment', backref='fee_record', lazy=True,
+                               order_by='FeePayment.installment_number',
+                               cascade='all, delete-orphan', passive_deletes=True)
 
     @property
     def calculated_total_fees_paid(self):
-        """Calculate total fees paid from sum of all installments"""
-        return float((self.installment_1 or 0) + (self.installment_2 or 0) + 
-                    (self.installment_3 or 0) + (self.installment_4 or 0) + 
-                    (self.installment_5 or 0) + (self.installment_6 or 0))
+        """Total fees paid - the total_fees_paid rollup maintained from the fee_payments ledger"""
+        return float(self.total_fees_paid or 0)
 
     @property
     def calculated_total_fee(self):
@@ -215,29 +234,32 @@ class CollegeFees(db.Model):
 
     @property
     def calculated_total_amount_due(self):
-        """Calculate total amount due using the formula: total_amount_after_rebate - (sum of all installments)"""
+        """Calculate total amount due using the formula: total_amount_after_rebate + previous_dues - (sum of all installments)"""
+        if self.dues_carried_forward:
+            return 0.0
         total_paid = self.calculated_total_fees_paid
-        total_after_rebate = float(self.total_amount_after_rebate or 0)
+        total_after_rebate = float(self.total_amount_after_rebate or 0) + float(self.previous_dues or 0)
         return total_after_rebate - total_paid
 
     def update_total_fees_paid(self):
-        """Update total_fees_paid field - now handled by database formula"""
-        # The total_fees_paid is now calculated by the database formula:
-        # installment_1 + installment_2 + installment_3 + installment_4 + installment_5 + installment_6
-        # No need to manually calculate as the database handles this automatically
+        """Update total_fees_paid field - now maintained by fee_ledger.record_payment"""
+        # total_fees_paid is the rollup of this record's fee_payments rows:
+        # it is incremented whenever a payment is recorded and rebuilt by 'flask reconcile fee-totals'
         pass
 
     def update_total_fee(self):
-        """Update total_fee field to match sum of component fees - now handled by database formula"""
-        # The total_fee is now calculated by the database formula:
+        """Update total_fee field to match sum of component fees - now handled on flush"""
+        # total_fee is recalculated by fee_calculations whenever this record is flushed:
         # total_course_fees + enrollment_fee + eligibility_certificate_fee + university_affiliation_fee + 
         # university_sports_fee + university_development_fee + tc_cc_fee + 
         # miscellaneous_fee_1 + miscellaneous_fee_2 + miscellaneous_fee_3
-        # No need to manually calculate as the database handles this automatically
         pass
 
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_student_id_date_time', 'student_id', 'date_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
@@ -247,12 +269,52 @@ class Invoice(db.Model):
     invoice_amount = db.Column(db.Numeric(10, 2), nullable=False)
     original_invoice_printed = db.Column(db.Boolean, default=False)
     installment_number = db.Column(db.Integer)
+    payment_reference = db.Column(db.String(100), unique=True)  # Bank/UPI reference for statement postings
+
+class FeePayment(db.Model):
+    __tablename__ = 'fee_payments'
+    __table_args__ = (
+        db.Index('ix_fee_payments_fee_id_paid_at', 'fee_id', 'paid_at'),
+        db.UniqueConstraint('fee_id', 'installment_number', name='uq_fee_payments_fee_installment'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    fee_id = db.Column(db.Integer, db.ForeignKey('college_fees.id', ondelete='CASCADE'), nullable=False)
+    installment_number = db.Column(db.Integer, nullable=False)  # 1, 2, 3 ... per fee record, no upper limit
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    invoice_number = db.Column(db.String(50), index=True)
+    payment_mode = db.Column(db.String(50))
+    paid_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Also set by trigger (change_feed.py)
+
+class InvoiceSequence(db.Model):
+    __tablename__ = 'invoice_sequences'
+
+    # One counter row per invoice day; utils.allocate_invoice_numbers increments it atomically
+    sequence_date = db.Column(db.Date, primary_key=True)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+
+class StudentIdSequence(db.Model):
+    __tablename__ = 'student_id_sequences'
+
+    # Last number handed out per (course, admission year); see utils.allocate_student_ids
+    course_short = db.Column(db.String(10), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+
+    # Bumped in the same transaction as the write it describes; see cache_versions.py
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
 class Exam(db.Model):
     __tablename__ = 'exams'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False, index=True)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id'))
     coursedetail_id = db.Column(db.Integer, db.ForeignKey('course_details.id'))
     course_full_name = db.Column(db.String(200))  # Snapshot of course name at time of exam
@@ -286,9 +348,10 @@ class Exam(db.Model):
 
     total_max_marks = db.Column(db.Integer, default=0)
     total_obtained_marks = db.Column(db.Integer, default=0)
-    percentage = db.Column(db.Numeric(5, 2), default=0)
+    percentage = db.Column(db.Numeric(5, 2), default=0, index=True)  # Indexed for top performers
     grade = db.Column(db.String(5))
     overall_status = db.Column(db.String(20))  # Pass/Fail
     exam_date = db.Column(db.Date)
     promotion_processed = db.Column(db.Boolean, default=False)  # Track if promotion has been processed for this exam
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Also set by trigger (change_feed.py)
\ No newline at end of file
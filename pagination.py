@@ -0,0 +1,205 @@
+"""
+Keyset (cursor) pagination for the students, fees, invoices and exams lists.
+
+paginate() ran an OFFSET query, which reads and discards every row before the
+page, plus a COUNT(*) over the whole filtered join on every page view.
+keyset_paginate() orders by (sort column, id) and seeks past the last row of
+the previous page instead, so a deep page costs the same as page 1. The total
+in the page header comes from cached_count(): counted once per filter set and
+worker, then reused for COUNT_TTL seconds.
+
+Pages link to each other with opaque ?after=<cursor> / ?before=<cursor>
+tokens; the templates render Previous / Next from KeysetPage.prev_url and
+next_url. NULL sort values sort after all others, as PostgreSQL does for
+ascending order.
+"""
+
+import base64
+import json
+import math
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request, url_for
+from sqlalchemy import and_, or_, tuple_
+
+PER_PAGE = 20
+COUNT_TTL = 60  # seconds
+MAX_CACHED_COUNTS = 512
+
+# Query string arguments that only move between pages
+NAV_ARGS = ('page', 'after', 'before')
+
+_lock = threading.Lock()
+_counts = {}  # {(endpoint, filter args): (expires_at, count)}
+
+
+class KeysetPage:
+    """One page of a keyset-paginated list (the parts of Pagination the templates use)"""
+
+    def __init__(self, items, page, per_page, total, has_prev, has_next, prev_url, next_url):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.pages = max(1, math.ceil(total / per_page))
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_url = prev_url
+        self.next_url = next_url
+
+
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return {'$decimal': str(value)}
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if '$decimal' in value:
+            return Decimal(value['$decimal'])
+        if '$datetime' in value:
+            return datetime.fromisoformat(value['$datetime'])
+        if '$date' in value:
+            return date.fromisoformat(value['$date'])
+        raise ValueError('Unknown cursor value')
+    return value
+
+
+def encode_cursor(sort_value, row_id):
+    """URL-safe token for a (sort value, id) position"""
+    payload = json.dumps([_encode_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(sort value, id) from a cursor token, or None if it is missing or malformed"""
+    if not token:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        sort_value, row_id = json.loads(payload)
+        return _decode_value(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def sort_column(sort_by, *models):
+    """The first mapped column named sort_by on the given models, or None"""
+    for model in models:
+        if sort_by in model.__table__.columns:
+            return getattr(model, sort_by, None)
+    return None
+
+
+def _is_nullable(column):
+    try:
+        return column.property.columns[0].nullable
+    except (AttributeError, IndexError):
+        return True
+
+
+def _seek(column, id_column, cursor, forward):
+    """Rows after (forward) or before the cursor in ascending (column, id) order, NULLs last"""
+    value, row_id = cursor
+    if column is id_column:
+        return id_column > row_id if forward else id_column < row_id
+
+    if not _is_nullable(column):
+        # Row comparison, which PostgreSQL can answer from an index on (column, id)
+        return tuple_(column, id_column) > tuple_(value, row_id) if forward \
+            else tuple_(column, id_column) < tuple_(value, row_id)
+
+    if value is None:
+        if forward:
+            return and_(column.is_(None), id_column > row_id)
+        return or_(column.isnot(None), and_(column.is_(None), id_column < row_id))
+    if forward:
+        return or_(column > value, and_(column == value, id_column > row_id), column.is_(None))
+    return or_(column < value, and_(column == value, id_column < row_id))
+
+
+def _order_by(column, id_column, descending):
+    if column is id_column:
+        return [id_column.desc() if descending else id_column.asc()]
+    if descending:
+        return [column.desc(), id_column.desc()]
+    return [column.asc(), id_column.asc()]
+
+
+def _page_url(**nav_args):
+    args = {key: value for key, value in request.args.items() if key not in NAV_ARGS}
+    return url_for(request.endpoint, **(request.view_args or {}), **args, **nav_args)
+
+
+def cached_count(query):
+    """COUNT(*) of a list query, cached per endpoint and filter arguments for COUNT_TTL seconds"""
+    key = (request.endpoint, tuple(sorted(
+        (name, value) for name, value in request.args.items()
+        if name not in NAV_ARGS and name not in ('sort', 'order')
+    )))
+    now = time.monotonic()
+    entry = _counts.get(key)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    total = query.order_by(None).count()
+    with _lock:
+        if len(_counts) >= MAX_CACHED_COUNTS:
+            _counts.clear()
+        _counts[key] = (now + COUNT_TTL, total)
+    return total
+
+
+def keyset_paginate(query, column, id_column, descending=False, per_page=PER_PAGE):
+    """Page of query ordered by (column, id_column), positioned by the request's cursor.
+
+    column may be None to order by id_column alone. Items are shaped like the
+    query's own rows (an entity, or a tuple for multi-entity queries).
+    """
+    if column is None:
+        column = id_column
+
+    after = decode_cursor(request.args.get('after'))
+    before = None if after else decode_cursor(request.args.get('before'))
+    backwards = before is not None
+    page = max(request.args.get('page', 1, type=int), 1) if (after or before) else 1
+
+    total = cached_count(query)
+    entity_count = len(query.column_descriptions)
+    query = query.add_columns(column.label('_keyset_sort'), id_column.label('_keyset_id')).order_by(None)
+
+    # A Previous page is read in reverse order from the first row of the current page
+    reverse = descending != backwards
+    if after or before:
+        query = query.filter(_seek(column, id_column, after or before, forward=not reverse))
+    rows = query.order_by(*_order_by(column, id_column, reverse)).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+        if not has_prev:
+            page = 1
+    else:
+        has_prev, has_next = after is not None, has_more
+
+    items = [row[0] if entity_count == 1 else tuple(row[:entity_count]) for row in rows]
+    prev_url = next_url = None
+    if has_prev:
+        prev_url = _page_url(before=encode_cursor(rows[0][-2], rows[0][-1]), page=page - 1) \
+            if rows else _page_url()
+    if has_next and rows:
+        next_url = _page_url(after=encode_cursor(rows[-1][-2], rows[-1][-1]), page=page + 1)
+    else:
+        has_next = False
+
+    return KeysetPage(items, page, per_page, total, has_prev, has_next, prev_url, next_url)
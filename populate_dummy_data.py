@@ -18,6 +18,7 @@ from models import (UserRole, UserProfile, Course, CourseDetails, Subject,
                     Student, CollegeFees, Invoice, Exam)
 from werkzeug.security import generate_password_hash
 from utils import generate_student_id, generate_invoice_number, calculate_grade
+from fee_ledger import record_payment
 
 
 def clear_existing_data():
@@ -546,17 +547,7 @@ def create_fees_and_invoices():
             total_fee,
             'payment_mode':
             random.choice(payment_modes),
-            'installment_1':
-            round(installments[0], 2) if len(installments) > 0 else 0,
-            'installment_2':
-            round(installments[1], 2) if len(installments) > 1 else 0,
-            'installment_3':
-            round(installments[2], 2) if len(installments) > 2 else 0,
-            'installment_4':
-            round(installments[3], 2) if len(installments) > 3 else 0,
-            'installment_5':
-            0,
-            'installment_6':
+            'total_fees_paid':
             0
         }
 
@@ -574,8 +565,7 @@ def create_fees_and_invoices():
                         invoice_number=invoice_number).first():
                     invoice_number = generate_invoice_number()
 
-                installment_amount = getattr(college_fee,
-                                             f'installment_{installment_num}')
+                installment_amount = round(installments[installment_num - 1], 2)
 
                 if installment_amount > 0:
                     invoice_data = {
@@ -599,9 +589,12 @@ def create_fees_and_invoices():
                     invoice = Invoice(**invoice_data)
                     db.session.add(invoice)
 
-                    # Update fee record with invoice number
-                    setattr(college_fee, f'invoice{installment_num}_number',
-                            invoice_number)
+                    # Add the payment to the fee record's ledger
+                    record_payment(college_fee, installment_amount,
+                                   invoice_number=invoice_number,
+                                   payment_mode=college_fee.payment_mode,
+                                   paid_at=invoice_data['date_time'],
+                                   installment_number=installment_num)
 
     db.session.commit()
     print("✓ Fees and invoices created")
@@ -0,0 +1,374 @@
+"""
+Set-based student promotion.
+
+promote_students() handles a whole batch with a fixed number of queries: the
+students and their eligible (passed, unprocessed) exams are loaded with one
+IN query each, next levels come from the cached progression graph, and the
+course/status changes and promotion_processed flags are written with
+executemany UPDATEs, committed in chunks. Each chunk also rolls its promoted
+students' fee records over to the new level (fee_rollover) before it commits,
+so a promotion and its fee record are saved together.
+
+The progression graph (course -> next course, or graduation) is built once
+per catalog version, so each lookup is a dict access. 'flask
+course-progression' prints it with a report of sequences that have gaps.
+
+Used by /students/bulk-promote, /students/bulk-promote/preview (read-only,
+see preview_promotions) and /students/promote/<id>.
+"""
+
+import re
+from collections import namedtuple
+
+import click
+from sqlalchemy import text, update
+
+from app import db
+from models import Student, Exam
+import catalog_cache
+from exam_analytics import invalidate_exam_dashboard
+from facet_cache import invalidate_facets
+from fee_rollover import rollover_fee_records
+
+PROMOTION_CHUNK_SIZE = 200
+
+_SEM_PATTERN = re.compile(r'(\d+)(?:st|nd|rd|th)?\s*sem')
+_YEAR_PATTERN = re.compile(r'(\d+)(?:st|nd|rd|th)?\s*year')
+
+
+ProgressionGraph = namedtuple('ProgressionGraph', ['next_course', 'progressions', 'issues'])
+
+
+class PromotionError(Exception):
+    """A student cannot be promoted; the message is shown to the user"""
+
+
+def parse_year_semester(year_semester):
+    """Parse year_semester string to extract numeric order for progression"""
+    if not year_semester:
+        return None
+
+    year_semester = year_semester.strip().lower()
+
+    # Handle semester patterns (1st sem, 2nd sem, etc.)
+    sem_match = _SEM_PATTERN.search(year_semester)
+    if sem_match:
+        return int(sem_match.group(1))
+
+    # Handle year patterns (1st year, 2nd year, etc.)
+    year_match = _YEAR_PATTERN.search(year_semester)
+    if year_match:
+        return int(year_match.group(1))
+
+    # Handle direct numbers
+    if year_semester.isdigit():
+        return int(year_semester)
+
+    # Handle special cases
+    special_cases = {
+        'fy': 1, 'sy': 2, 'ty': 3,
+        'final': 99, 'final year': 99
+    }
+    if year_semester in special_cases:
+        return special_cases[year_semester]
+
+    return None
+
+
+def _base_name(course_full_name):
+    return course_full_name.split(' - ')[0] if ' - ' in course_full_name else course_full_name
+
+
+def build_progression_graph():
+    """Course progression graph built once from the cached catalog.
+
+    Course details are grouped by base name (the part before ' - ') and ordered
+    by year_semester. Each level points to the next one; the last level points
+    to the next semester/year named like it (e.g. '4th Sem' -> '5th Sem') if
+    that course exists, else to None (graduation). Sequences with gaps,
+    duplicate positions or unparseable year_semester values are listed in
+    issues.
+    """
+    levels_by_base = {}
+    issues = []
+    for detail in catalog_cache.get_course_details():
+        if not detail.course_full_name:
+            continue
+        order = parse_year_semester(detail.year_semester)
+        if order is None:
+            issues.append((detail.course_full_name,
+                           f"year_semester '{detail.year_semester or ''}' cannot be ordered"))
+            continue
+        levels_by_base.setdefault(_base_name(detail.course_full_name), []).append((order, detail.course_full_name))
+
+    progressions = {}
+    next_course = {}
+    for base_name, levels in levels_by_base.items():
+        levels.sort(key=lambda level: level[0])
+        names = [name for _, name in levels]
+        progressions[base_name] = names
+
+        for i, (order, name) in enumerate(levels):
+            next_course[name] = names[i + 1] if i + 1 < len(names) else _next_by_name(name)
+
+        if levels[0][0] != 1 and levels[0][0] != 99:
+            issues.append((levels[0][1], f"{base_name} starts at level {levels[0][0]}"))
+        for (order, name), (next_order, following) in zip(levels, levels[1:]):
+            if next_order == order:
+                issues.append((following, f"{name} and {following} are both level {order}"))
+            elif next_order - order > 1 and next_order != 99:
+                issues.append((following, f"no level {order + 1} between {name} and {following}"))
+
+    return ProgressionGraph(next_course=next_course, progressions=progressions, issues=issues)
+
+
+def get_progression_graph():
+    """Cached progression graph, rebuilt whenever the course catalog changes"""
+    return catalog_cache.get_derived('progression_graph', build_progression_graph)
+
+
+def _next_by_name(current_course):
+    """Next semester/year built from the course name (e.g. '4th Sem' -> '5th Sem') if it exists"""
+    level = current_course.split(' - ')[1].lower() if ' - ' in current_course else ''
+    for pattern, suffix in ((_SEM_PATTERN, 'Sem'), (_YEAR_PATTERN, 'Year')):
+        match = pattern.search(level)
+        if match:
+            next_num = int(match.group(1)) + 1
+            ordinal = {1: '1st', 2: '2nd', 3: '3rd'}.get(next_num, f'{next_num}th')
+            potential_next = f"{_base_name(current_course)} - {ordinal} {suffix}"
+            return potential_next if catalog_cache.get_course_detail(potential_next) else None
+    return None
+
+
+def resolve_next_course(current_course, graph):
+    """Next course for a student, or None if they graduate. Raises PromotionError."""
+    if not current_course:
+        raise PromotionError('No current course assigned')
+    if not graph.progressions.get(_base_name(current_course)):
+        raise PromotionError('No course progression found')
+    if current_course not in graph.next_course:
+        raise PromotionError('Current course not in progression')
+    return graph.next_course[current_course]
+
+
+def plan_promotion(student_status, current_course, graph):
+    """('promoted', next_course) or ('graduated', None) for an eligible student. Raises PromotionError."""
+    # Dropped-out students are never promoted (graduated students may be)
+    if student_status == 'Dropout':
+        raise PromotionError('Student status is Dropout')
+    next_course = resolve_next_course(current_course, graph)
+    return ('promoted', next_course) if next_course else ('graduated', None)
+
+
+def _load_eligible_exams(student_ids):
+    """{student_id: [passed, unprocessed exams, newest first]} in one query"""
+    exams = {}
+    for exam in Exam.query.filter(
+        Exam.student_id.in_(student_ids),
+        Exam.overall_status == 'Pass',
+        Exam.promotion_processed == False
+    ).order_by(Exam.created_at.desc()):
+        exams.setdefault(exam.student_id, []).append(exam)
+    return exams
+
+
+def promote_students(requests, chunk_size=PROMOTION_CHUNK_SIZE, rollover_report=None):
+    """Promote or graduate a batch of students.
+
+    requests is a list of {'student_id', 'exam_id', 'student_name'} dicts; a
+    missing exam_id uses the student's latest passed, unprocessed exam.
+    Returns one result per request in the bulk-promote shape. If rollover_report
+    is a list, (chunk number, fee records created, seconds) is appended to it
+    for every committed chunk.
+    """
+    student_ids = {request['student_id'] for request in requests}
+    students = {student.id: student for student in Student.query.filter(Student.id.in_(student_ids))}
+    exams = _load_eligible_exams(student_ids)
+    graph = get_progression_graph()
+
+    results = []
+    changes = []  # (result, student_values, exam_id)
+    claimed_exams = set()
+    promoted_students = set()
+    for request in requests:
+        student_id = request['student_id']
+        result = {
+            'success': False,
+            'student_id': student_id,
+            'student_name': request.get('student_name', 'Unknown'),
+        }
+        results.append(result)
+
+        try:
+            student = students.get(student_id)
+            if not student:
+                raise PromotionError('Student not found')
+            if student_id in promoted_students:
+                raise PromotionError('Student is already being promoted in this batch')
+
+            if student.student_status == 'Dropout':
+                raise PromotionError('Student status is Dropout')
+
+            candidates = [exam for exam in exams.get(student_id, []) if exam.id not in claimed_exams]
+            if request.get('exam_id'):
+                candidates = [exam for exam in candidates if exam.id == request['exam_id']]
+            if not candidates:
+                raise PromotionError('No eligible exam found for promotion')
+            exam = candidates[0]
+
+            action, next_course = plan_promotion(student.student_status, student.current_course, graph)
+        except PromotionError as e:
+            result['error'] = str(e)
+            continue
+
+        claimed_exams.add(exam.id)
+        promoted_students.add(student_id)
+        old_course = student.current_course
+        if action == 'promoted':
+            # If student was graduated, set them back to Active status when promoting
+            status = 'Active' if student.student_status == 'Graduated' else student.student_status
+            values = {'id': student.id, 'current_course': next_course, 'student_status': status}
+            result.update(action='promoted', previous_course=old_course, current_course=next_course,
+                          message=f'Promoted from {old_course} to {next_course}')
+        else:
+            values = {'id': student.id, 'current_course': old_course, 'student_status': 'Graduated'}
+            result.update(action='graduated', message='Student graduated')
+        changes.append((result, values, exam.id))
+
+    _apply_changes(changes, chunk_size, rollover_report)
+    return results
+
+
+PREVIEW_SQL = """
+    SELECT s.id, s.student_unique_id, s.first_name, s.last_name, s.current_course, s.student_status,
+           e.id AS exam_id, e.exam_name, e.semester, e.percentage
+    FROM students s
+    LEFT JOIN LATERAL (
+        SELECT exams.id, exams.exam_name, exams.semester, exams.percentage
+        FROM exams
+        WHERE exams.student_id = s.id
+          AND exams.overall_status = 'Pass'
+          AND exams.promotion_processed = FALSE
+          {semester_filter}
+        ORDER BY exams.created_at DESC
+        LIMIT 1
+    ) e ON TRUE
+    WHERE TRUE {course_filter}
+    ORDER BY s.current_course, s.student_unique_id
+"""
+
+
+def preview_promotions(course=None, semester=None):
+    """What a bulk promotion would do, without writing anything.
+
+    course is a full course name ('B.A. - 1st Year') or a base name ('B.A.')
+    for all of its levels; semester restricts the exams considered. Students
+    and their latest passed, unprocessed exam come from one joined query and
+    outcomes from the cached progression graph.
+    """
+    course_filter = ''
+    semester_filter = ''
+    params = {}
+    if course:
+        if ' - ' in course:
+            course_filter = "AND s.current_course = :course"
+        else:
+            course_filter = "AND (s.current_course = :course OR s.current_course LIKE :course_levels)"
+            params['course_levels'] = course.replace('%', r'\%').replace('_', r'\_') + ' - %'
+        params['course'] = course
+    if semester:
+        semester_filter = "AND exams.semester = :semester"
+        params['semester'] = semester
+
+    rows = db.session.execute(
+        text(PREVIEW_SQL.format(course_filter=course_filter, semester_filter=semester_filter)), params
+    ).mappings().all()
+    graph = get_progression_graph()
+
+    students = []
+    for row in rows:
+        outcome = {
+            'student_id': row['id'],
+            'student_unique_id': row['student_unique_id'],
+            'student_name': f"{row['first_name']} {row['last_name']}",
+            'current_course': row['current_course'],
+            'student_status': row['student_status'],
+            'exam_id': row['exam_id'],
+            'exam_name': row['exam_name'],
+            'exam_semester': row['semester'],
+            'percentage': float(row['percentage']) if row['percentage'] is not None else None,
+            'action': 'skipped',
+            'next_course': None,
+            'reason': None,
+        }
+        try:
+            if row['student_status'] == 'Dropout':
+                raise PromotionError('Student status is Dropout')
+            if row['exam_id'] is None:
+                raise PromotionError('No eligible exam found for promotion')
+            outcome['action'], outcome['next_course'] = plan_promotion(
+                row['student_status'], row['current_course'], graph
+            )
+        except PromotionError as e:
+            outcome['reason'] = str(e)
+        students.append(outcome)
+
+    return {
+        'total': len(students),
+        'promoted': sum(1 for outcome in students if outcome['action'] == 'promoted'),
+        'graduated': sum(1 for outcome in students if outcome['action'] == 'graduated'),
+        'skipped': sum(1 for outcome in students if outcome['action'] == 'skipped'),
+        'students': students,
+    }
+
+
+def _apply_changes(changes, chunk_size, rollover_report=None):
+    """Write the promotions with one executemany per table, committing every chunk_size students"""
+    for start in range(0, len(changes), chunk_size):
+        chunk = changes[start:start + chunk_size]
+        try:
+            db.session.execute(update(Student), [values for _, values, _ in chunk])
+            db.session.execute(update(Exam), [{'id': exam_id, 'promotion_processed': True}
+                                              for _, _, exam_id in chunk])
+            # Next-level fee records for the students who moved up, in the same transaction
+            created, seconds = rollover_fee_records(
+                [values['id'] for result, values, _ in chunk if result['action'] == 'promoted']
+            )
+            invalidate_exam_dashboard()
+            invalidate_facets()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for result, _, _ in chunk:
+                for key in ('action', 'previous_course', 'current_course', 'message'):
+                    result.pop(key, None)
+                result['error'] = str(e)
+            continue
+
+        for result, _, _ in chunk:
+            result['success'] = True
+        if rollover_report is not None:
+            rollover_report.append((start // chunk_size + 1, created, seconds))
+
+
+def init_app(app):
+    """Register the course-progression command"""
+
+    @app.cli.command('course-progression')
+    @click.option('--issues-only', is_flag=True, help='Only print the consistency report.')
+    def course_progression_command(issues_only):
+        """Print the course progression graph and flag sequences with gaps."""
+        graph = build_progression_graph()
+
+        if not issues_only:
+            for base_name, names in sorted(graph.progressions.items()):
+                click.echo(base_name)
+                for name in names:
+                    click.echo(f"  {name} -> {graph.next_course[name] or 'Graduated'}")
+
+        if graph.issues:
+            click.echo(f"✗ {len(graph.issues)} progression issues:")
+            for course_name, issue in graph.issues:
+                click.echo(f"  {course_name}: {issue}")
+        else:
+            click.echo("✓ No gaps in any course progression")
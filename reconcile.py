@@ -0,0 +1,328 @@
+"""
+Set-based reconciliation of derived fee and student data.
+
+Each repair step is one UPDATE ... FROM or INSERT ... SELECT built on a
+"source" query that yields the rows the step would change, so a dry run can
+stream exactly the diff that a real run applies.
+
+Usage:
+    flask reconcile all [--dry-run]
+    flask reconcile <step> [--dry-run]
+"""
+
+import time
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from app import db
+from fee_calculations import (
+    TOTAL_FEE_SQL, TOTAL_FEES_PAID_SQL, TOTAL_AMOUNT_AFTER_REBATE_SQL, TOTAL_AMOUNT_DUE_SQL
+)
+from fee_rollover import ROLLOVER_SOURCE, ROLLOVER_APPLY
+from student_address import CONCATENATED_ADDRESS_SQL
+
+# Best course_details match for a student's current course: exact full name first,
+# then the first course detail sharing the leading word (e.g. "BA"), as the old scripts did
+COURSE_DETAIL_MATCH_SQL = """
+    LEFT JOIN LATERAL (
+        SELECT cd.id, cd.course_short_name, cd.total_course_fees
+        FROM course_details cd
+        WHERE cd.course_full_name = s.current_course
+           OR cd.course_full_name LIKE split_part(s.current_course, ' ', 1) || '%'
+        ORDER BY (cd.course_full_name = s.current_course) DESC, cd.id
+        LIMIT 1
+    ) cd ON TRUE
+    LEFT JOIN courses c ON c.course_short_name = cd.course_short_name
+"""
+
+# Only a student's latest fee record follows their current course; earlier ones
+# belong to the levels they were rolled over from
+CURRENT_FEE_RECORD_SQL = "f.id = (SELECT MAX(latest.id) FROM college_fees latest WHERE latest.student_id = f.student_id)"
+
+# Fill in course_full_name, coursedetail_id and course_id where they are missing
+COURSE_LINKS_SOURCE = f"""
+    SELECT f.id, s.student_unique_id AS label,
+           concat_ws(' / ', f.course_full_name, f.coursedetail_id, f.course_id) AS old_value,
+           concat_ws(' / ', COALESCE(NULLIF(f.course_full_name, ''), s.current_course),
+                     COALESCE(f.coursedetail_id, cd.id), COALESCE(f.course_id, c.course_id)) AS new_value,
+           COALESCE(NULLIF(f.course_full_name, ''), s.current_course) AS new_course_full_name,
+           COALESCE(f.coursedetail_id, cd.id) AS new_coursedetail_id,
+           COALESCE(f.course_id, c.course_id) AS new_course_id
+    FROM college_fees f
+    JOIN students s ON s.id = f.student_id
+    {COURSE_DETAIL_MATCH_SQL}
+    WHERE NULLIF(s.current_course, '') IS NOT NULL
+      AND {CURRENT_FEE_RECORD_SQL}
+      AND ((NULLIF(f.course_full_name, '') IS NULL)
+           OR (f.coursedetail_id IS NULL AND cd.id IS NOT NULL)
+           OR (f.course_id IS NULL AND c.course_id IS NOT NULL))
+"""
+
+COURSE_LINKS_APPLY = f"""
+    UPDATE college_fees AS f
+    SET course_full_name = src.new_course_full_name,
+        coursedetail_id = src.new_coursedetail_id,
+        course_id = src.new_course_id
+    FROM ({COURSE_LINKS_SOURCE}) AS src
+    WHERE f.id = src.id
+"""
+
+# Copy total_course_fees from the student's current course_details row
+COURSE_FEES_SOURCE = f"""
+    SELECT f.id, s.student_unique_id AS label,
+           f.total_course_fees AS old_value, cd.total_course_fees AS new_value
+    FROM college_fees f
+    JOIN students s ON s.id = f.student_id
+    JOIN (
+        SELECT DISTINCT ON (course_full_name) course_full_name, total_course_fees
+        FROM course_details
+        ORDER BY course_full_name, id
+    ) cd ON cd.course_full_name = s.current_course
+    WHERE cd.total_course_fees IS NOT NULL
+      AND {CURRENT_FEE_RECORD_SQL}
+      AND f.total_course_fees IS DISTINCT FROM cd.total_course_fees
+"""
+
+COURSE_FEES_APPLY = f"""
+    UPDATE college_fees AS f
+    SET total_course_fees = src.new_value
+    FROM ({COURSE_FEES_SOURCE}) AS src
+    WHERE f.id = src.id
+"""
+
+# Create a fee record for every student with a course but no fee record
+MISSING_FEES_SOURCE = f"""
+    SELECT s.id AS student_id, s.student_unique_id AS label,
+           NULL AS old_value, s.current_course AS new_value,
+           cd.id AS coursedetail_id, c.course_id,
+           COALESCE(cd.total_course_fees, 0) AS total_course_fees,
+           COALESCE(s.rebate_meera_scholarship_status = 'Applied', FALSE) AS meera_rebate_applied,
+           COALESCE(s.rebate_meera_scholarship_status = 'Approved', FALSE) AS meera_rebate_approved,
+           COALESCE(s.rebate_meera_scholarship_status = 'Granted', FALSE) AS meera_rebate_granted,
+           COALESCE(s.scholarship_status = 'Applied', FALSE) AS scholarship_applied,
+           COALESCE(s.scholarship_status = 'Approved', FALSE) AS scholarship_approved,
+           COALESCE(s.scholarship_status = 'Granted', FALSE) AS scholarship_granted
+    FROM students s
+    {COURSE_DETAIL_MATCH_SQL}
+    WHERE NULLIF(trim(s.current_course), '') IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM college_fees f WHERE f.student_id = s.id)
+"""
+
+MISSING_FEES_APPLY = f"""
+    INSERT INTO college_fees (
+        student_id, course_id, coursedetail_id, course_full_name, total_course_fees,
+        enrollment_fee, eligibility_certificate_fee, university_affiliation_fee,
+        university_sports_fee, university_development_fee, tc_cc_fee,
+        miscellaneous_fee_1, miscellaneous_fee_2, miscellaneous_fee_3, total_fee,
+        installment_1, installment_2, installment_3, installment_4, installment_5, installment_6,
+        total_fees_paid, meera_rebate_applied, meera_rebate_approved, meera_rebate_granted,
+        meera_rebate_amount, scholarship_applied, scholarship_approved, scholarship_granted,
+        government_scholarship_amount, total_amount_due, total_amount_after_rebate,
+        pending_dues_for_libraries, pending_dues_for_hostel, exam_admit_card_issued, created_at
+    )
+    SELECT
+        src.student_id, src.course_id, src.coursedetail_id, src.new_value, src.total_course_fees,
+        0, 0, 0,
+        0, 0, 0,
+        0, 0, 0, src.total_course_fees,
+        0, 0, 0, 0, 0, 0,
+        0, src.meera_rebate_applied, src.meera_rebate_approved, src.meera_rebate_granted,
+        0, src.scholarship_applied, src.scholarship_approved, src.scholarship_granted,
+        0, src.total_course_fees, src.total_course_fees,
+        FALSE, FALSE, FALSE, NOW()
+    FROM ({MISSING_FEES_SOURCE}) AS src
+"""
+
+# Recompute total_fee, total_fees_paid, total_amount_after_rebate and total_amount_due
+FEE_TOTALS_SOURCE = f"""
+    SELECT t.id, COALESCE(s.student_unique_id, 'fee #' || t.id) AS label,
+           concat_ws(' / ', t.total_fee, t.total_fees_paid, t.total_amount_after_rebate, t.total_amount_due) AS old_value,
+           concat_ws(' / ', t.new_total_fee, t.new_total_fees_paid, t.new_total_amount_after_rebate, t.new_total_amount_due) AS new_value,
+           t.new_total_fee, t.new_total_fees_paid, t.new_total_amount_after_rebate, t.new_total_amount_due
+    FROM (
+        SELECT id, student_id, total_fee, total_fees_paid, total_amount_after_rebate, total_amount_due,
+               {TOTAL_FEE_SQL} AS new_total_fee,
+               {TOTAL_FEES_PAID_SQL} AS new_total_fees_paid,
+               {TOTAL_AMOUNT_AFTER_REBATE_SQL} AS new_total_amount_after_rebate,
+               {TOTAL_AMOUNT_DUE_SQL} AS new_total_amount_due
+        FROM college_fees
+    ) t
+    LEFT JOIN students s ON s.id = t.student_id
+    WHERE t.total_fee IS DISTINCT FROM t.new_total_fee
+       OR t.total_fees_paid IS DISTINCT FROM t.new_total_fees_paid
+       OR t.total_amount_after_rebate IS DISTINCT FROM t.new_total_amount_after_rebate
+       OR t.total_amount_due IS DISTINCT FROM t.new_total_amount_due
+"""
+
+FEE_TOTALS_APPLY = f"""
+    UPDATE college_fees AS f
+    SET total_fee = src.new_total_fee,
+        total_fees_paid = src.new_total_fees_paid,
+        total_amount_after_rebate = src.new_total_amount_after_rebate,
+        total_amount_due = src.new_total_amount_due
+    FROM ({FEE_TOTALS_SOURCE}) AS src
+    WHERE f.id = src.id
+"""
+
+# Rebuild concatenated_address for students written outside the ORM (imports by SQL, old rows)
+STUDENT_ADDRESSES_SOURCE = f"""
+    SELECT t.id, t.student_unique_id AS label, t.concatenated_address AS old_value, t.new_value
+    FROM (
+        SELECT id, student_unique_id, concatenated_address, {CONCATENATED_ADDRESS_SQL} AS new_value
+        FROM students
+    ) t
+    WHERE t.concatenated_address IS DISTINCT FROM t.new_value
+"""
+
+STUDENT_ADDRESSES_APPLY = f"""
+    UPDATE students AS s
+    SET concatenated_address = src.new_value
+    FROM ({STUDENT_ADDRESSES_SOURCE}) AS src
+    WHERE s.id = src.id
+"""
+
+# Steps run in this order by "reconcile all"; fee-rollover runs before course-fees so a
+# promoted student's old record keeps its own level's fees, and fee-totals goes last
+# so it picks up the course fees and fee records written by the earlier steps
+RECONCILE_STEPS = [
+    {
+        'name': 'course-links',
+        'description': 'Fill missing course name, course detail and course links on fee records',
+        'source_sql': COURSE_LINKS_SOURCE,
+        'apply_sql': COURSE_LINKS_APPLY,
+    },
+    {
+        'name': 'missing-fees',
+        'description': 'Create fee records for students with a course but no fee record',
+        'source_sql': MISSING_FEES_SOURCE,
+        'apply_sql': MISSING_FEES_APPLY,
+    },
+    {
+        'name': 'fee-rollover',
+        'description': "Create fee records for students' current course level, carrying forward dues",
+        'source_sql': ROLLOVER_SOURCE,
+        'apply_sql': ROLLOVER_APPLY,
+    },
+    {
+        'name': 'course-fees',
+        'description': "Sync total_course_fees from the student's current course details",
+        'source_sql': COURSE_FEES_SOURCE,
+        'apply_sql': COURSE_FEES_APPLY,
+    },
+    {
+        'name': 'fee-totals',
+        'description': 'Recalculate total fee, fees paid, amount after rebate and amount due',
+        'source_sql': FEE_TOTALS_SOURCE,
+        'apply_sql': FEE_TOTALS_APPLY,
+    },
+    {
+        'name': 'student-addresses',
+        'description': 'Rebuild concatenated addresses from the individual address fields',
+        'source_sql': STUDENT_ADDRESSES_SOURCE,
+        'apply_sql': STUDENT_ADDRESSES_APPLY,
+    },
+]
+
+STEP_NAMES = [step['name'] for step in RECONCILE_STEPS]
+
+
+def get_step(name):
+    """Return the reconcile step definition with the given name"""
+    for step in RECONCILE_STEPS:
+        if step['name'] == name:
+            return step
+    raise ValueError(f"Unknown reconcile step: {name}")
+
+
+def stream_step_diff(step, batch_size=1000):
+    """Yield (label, old_value, new_value) for every row the step would change"""
+    result = db.session.execute(
+        text(step['source_sql']).execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in result:
+        yield row.label, row.old_value, row.new_value
+
+
+def run_step(step, dry_run=False, echo=print):
+    """Run one step (or stream its diff when dry_run is set); returns the affected row count"""
+    if dry_run:
+        row_count = 0
+        for label, old_value, new_value in stream_step_diff(step):
+            echo(f"  {label}: {old_value if old_value is not None else '-'} -> {new_value}")
+            row_count += 1
+        db.session.rollback()
+        return row_count
+
+    try:
+        result = db.session.execute(text(step['apply_sql']))
+        db.session.commit()
+        return result.rowcount
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def run_reconciliation(step_names=None, dry_run=False, echo=print):
+    """Run the given steps in order and return a timing report [(name, rows, seconds)]"""
+    step_names = step_names or STEP_NAMES
+    report = []
+    for name in step_names:
+        step = get_step(name)
+        echo(f"{'[dry-run] ' if dry_run else ''}{step['name']}: {step['description']}")
+        started = time.perf_counter()
+        row_count = run_step(step, dry_run=dry_run, echo=echo)
+        report.append((step['name'], row_count, time.perf_counter() - started))
+    return report
+
+
+def print_timing_report(report, dry_run=False, echo=print):
+    """Print the per-step timing report"""
+    verb = 'would change' if dry_run else 'changed'
+    echo("-" * 60)
+    echo(f"{'Step':<20}{'Rows ' + verb:>22}{'Time':>18}")
+    echo("-" * 60)
+    for name, row_count, seconds in report:
+        echo(f"{name:<20}{row_count:>22}{seconds:>17.3f}s")
+    echo("-" * 60)
+    echo(f"{'Total':<20}{sum(r[1] for r in report):>22}{sum(r[2] for r in report):>17.3f}s")
+
+
+def run_and_report(step_names=None, dry_run=False, echo=print):
+    """Run steps and print the timing report, as used by the CLI and the legacy scripts"""
+    report = run_reconciliation(step_names, dry_run=dry_run, echo=echo)
+    print_timing_report(report, dry_run=dry_run, echo=echo)
+    return report
+
+
+reconcile_cli = AppGroup('reconcile', help='Set-based repair of derived fee data.')
+
+dry_run_option = click.option(
+    '--dry-run', is_flag=True, help='Stream the rows that would change without writing anything.'
+)
+
+
+@reconcile_cli.command('all')
+@dry_run_option
+def reconcile_all_command(dry_run):
+    """Run every reconcile step in order."""
+    run_and_report(dry_run=dry_run, echo=click.echo)
+
+
+def _make_step_command(step):
+    @dry_run_option
+    def command(dry_run):
+        run_and_report([step['name']], dry_run=dry_run, echo=click.echo)
+    command.__doc__ = f"{step['description']}."
+    return reconcile_cli.command(step['name'])(command)
+
+
+for _step in RECONCILE_STEPS:
+    _make_step_command(_step)
+
+
+def init_app(app):
+    """Register the reconcile command group"""
+    if 'reconcile' not in app.cli.commands:
+        app.cli.add_command(reconcile_cli)
@@ -2,6 +2,7 @@ from flask import render_template, request, redirect, url_for, flash, jsonify, m
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
 from sqlalchemy import func, and_, or_, text
+from sqlalchemy.orm import selectinload
 from datetime import datetime, date
 import datetime as dt
 import io
@@ -16,20 +17,31 @@ from forms import *
 @app.template_global()
 def moment():
     return datetime.now()
-from utils import generate_student_id, generate_invoice_number, calculate_grade, can_edit_module, send_email, generate_pdf_invoice, generate_pdf_report_card, generate_pdf_student_report, generate_pdf_fee_statement, generate_pdf_fee_statement_print
+import catalog_cache
+import exam_analytics
+import promotion
+import fee_ledger
+import fee_reports
+from pagination import keyset_paginate, sort_column
+import student_search
+import facet_cache
+import change_feed
+from utils import generate_student_id, generate_invoice_number, calculate_grade, year_range_filter, can_edit_module, send_email, generate_pdf_invoice, generate_pdf_report_card, generate_pdf_student_report, generate_pdf_fee_statement, generate_pdf_fee_statement_print
+from bulk_payments import read_payment_file, post_bulk_payments, PAYMENT_MODES
 from bulk_operations import (
     get_students_export_data, get_courses_export_data, get_course_details_export_data,
     get_exams_export_data, get_fees_export_data, get_invoices_export_data, get_users_export_data,
-    get_subjects_export_data, export_to_csv, export_to_excel, export_to_json, process_import_file
+    get_subjects_export_data, export_to_csv, export_to_excel, export_to_json, export_to_ndjson,
+    export_to_parquet, export_to_arrow, export_workbook, process_import_file
 )
 
-# Import the fee calculation function
+# Full-table fee reconciliation; per-record totals are maintained on flush by fee_calculations
 def run_fee_calculation_sync():
     """Run fee calculation synchronization"""
     try:
-        from fix_total_fee_calculation import fix_total_fee_calculation
-        fix_total_fee_calculation()
-        app.logger.info("Fee calculation sync completed successfully")
+        from fee_calculations import recalculate_all_fee_totals
+        updated_count = recalculate_all_fee_totals()
+        app.logger.info(f"Fee calculation sync completed successfully ({updated_count} records)")
     except Exception as e:
         app.logger.error(f"Fee calculation sync failed: {str(e)}")
         # Don't raise the exception to avoid breaking the main flow
@@ -71,29 +83,12 @@ def dashboard():
     total_students = Student.query.count()
     active_students = Student.query.filter_by(student_status='Active').count()
 
-    # Calculate total collected fees from all installments
-    total_collected_fees = db.session.query(
-        func.sum(
-            func.coalesce(CollegeFees.installment_1, 0) + 
-            func.coalesce(CollegeFees.installment_2, 0) + 
-            func.coalesce(CollegeFees.installment_3, 0) + 
-            func.coalesce(CollegeFees.installment_4, 0) + 
-            func.coalesce(CollegeFees.installment_5, 0) + 
-            func.coalesce(CollegeFees.installment_6, 0)
-        )
-    ).scalar() or 0
+    # Calculate total collected fees from the payment ledger
+    total_collected_fees = db.session.query(func.sum(FeePayment.amount)).scalar() or 0
 
-    # Calculate pending fees (total fees - collected fees)
+    # Calculate pending fees (total fees - collected fees, using the total_fees_paid rollup)
     pending_fees = db.session.query(
-        func.sum(
-            func.coalesce(CollegeFees.total_fee, 0) - 
-            (func.coalesce(CollegeFees.installment_1, 0) + 
-             func.coalesce(CollegeFees.installment_2, 0) + 
-             func.coalesce(CollegeFees.installment_3, 0) + 
-             func.coalesce(CollegeFees.installment_4, 0) + 
-             func.coalesce(CollegeFees.installment_5, 0) + 
-             func.coalesce(CollegeFees.installment_6, 0))
-        )
+        func.sum(func.coalesce(CollegeFees.total_fee, 0) - func.coalesce(CollegeFees.total_fees_paid, 0))
     ).scalar() or 0
 
     # Ensure pending fees is not negative
@@ -268,7 +263,6 @@ def students():
         flash('You do not have permission to access this page.', 'error')
         return redirect(url_for('dashboard'))
 
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     course_filter = request.args.get('course', '')
     status_filter = request.args.get('status', '')
@@ -278,16 +272,9 @@ def students():
 
     query = Student.query
 
-    # Search functionality
+    # Search functionality (ID, name and course, on the trigram-indexed search_text)
     if search:
-        search_filter = or_(
-            Student.student_unique_id.ilike(f'%{search}%'),
-            Student.first_name.ilike(f'%{search}%'),
-            Student.last_name.ilike(f'%{search}%'),
-            Student.current_course.ilike(f'%{search}%'),
-            func.concat(Student.first_name, ' ', Student.last_name).ilike(f'%{search}%')
-        )
-        query = query.filter(search_filter)
+        query = query.filter(student_search.search_filter(search))
 
     # Filters
     if course_filter:
@@ -297,26 +284,12 @@ def students():
     if meera_rebate_filter:
         query = query.filter_by(rebate_meera_scholarship_status=meera_rebate_filter)
 
-    # Sorting
-    if hasattr(Student, sort_by):
-        if sort_order == 'desc':
-            query = query.order_by(getattr(Student, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Student, sort_by))
-
-    students = query.paginate(page=page, per_page=20, error_out=False)
+    # Sorting: keyset pages on (sort column, id), see pagination.py
+    students = keyset_paginate(query, sort_column(sort_by, Student), Student.id,
+                               descending=(sort_order == 'desc'))
 
-    # Get all courses for dropdown (from CourseDetails table to show all available courses)
-    course_details = CourseDetails.query.with_entities(CourseDetails.course_full_name).distinct().all()
-    courses = [course[0] for course in course_details if course[0]]
-
-    # Also add currently assigned courses from students to ensure all are visible
-    student_courses = db.session.query(Student.current_course).distinct().filter(Student.current_course != None).all()
-    for course in student_courses:
-        if course[0] and course[0] not in courses:
-            courses.append(course[0])
-
-    courses = sorted(courses)
+    # All catalog courses plus currently assigned courses, from the facet cache
+    courses = facet_cache.course_options()
 
     return render_template('students/students.html', students=students, courses=courses)
 
@@ -354,7 +327,7 @@ def add_student():
             flash('Please select a course.', 'error')
             return render_template('students/student_form.html', form=form, title='Add Student', today_date=date.today().strftime('%Y-%m-%d'))
 
-        course_details = CourseDetails.query.filter_by(course_full_name=course_name).first()
+        course_details = catalog_cache.get_course_detail(course_name)
         if not course_details:
             flash('Course details not found. Please select a valid course.', 'error')
             return render_template('students/student_form.html', form=form, title='Add Student', today_date=date.today().strftime('%Y-%m-%d'))
@@ -362,16 +335,9 @@ def add_student():
         course_short = course_details.course_short_name
         student_unique_id = generate_student_id(course_short, date.today().year)
 
-        # Double-check for uniqueness (safety measure)
-        existing_student = Student.query.filter_by(student_unique_id=student_unique_id).first()
-        counter = 1
-        base_id = student_unique_id
-        while existing_student:
-            # If somehow we still have a duplicate, increment until unique
-            year_short = str(date.today().year)[-2:]
-            counter += 1
-            student_unique_id = f"{course_short}-{year_short}-{counter:03d}"
-            existing_student = Student.query.filter_by(student_unique_id=student_unique_id).first()
+        # Skip IDs that were taken outside the counter (e.g. imported with an explicit Student ID)
+        while Student.query.filter_by(student_unique_id=student_unique_id).first():
+            student_unique_id = generate_student_id(course_short, date.today().year)
 
         # Get data from form, using request.form as fallback
         student = Student(
@@ -403,16 +369,13 @@ def add_student():
         )
 
         try:
-            # Update concatenated address before saving
-            student.update_concatenated_address()
-
             db.session.add(student)
             db.session.flush()  # This will assign the auto-generated ID
 
             # Create initial fee record if current course is selected
             if student.current_course:
-                course = Course.query.filter_by(course_short_name=course_short).first()
-                course_detail = CourseDetails.query.filter_by(course_full_name=student.current_course).first()
+                course = catalog_cache.get_course(course_short)
+                course_detail = catalog_cache.get_course_detail(student.current_course)
 
             if student.current_course and course_detail:
                 # Get fee data from form (submitted via JavaScript) - use total_course_fees from course_details
@@ -499,28 +462,16 @@ def add_student():
                     pending_dues_for_libraries=pending_dues_for_libraries,
                     pending_dues_for_hostel=pending_dues_for_hostel,
                     exam_admit_card_issued=exam_admit_card_issued,
-                    # Initialize installments to 0
-                    installment_1=0,
-                    installment_2=0,
-                    installment_3=0,
-                    installment_4=0,
-                    installment_5=0,
-                    installment_6=0
+                    total_fees_paid=0
                 )
                 db.session.add(fee_record)
-                db.session.flush()  # Flush to get the auto-calculated total_fee from database
+                db.session.flush()  # Flush recalculates total_fee, total_fees_paid and total_amount_due
 
-                # Only update total_fees_paid from installments sum (total_fee is handled by database)
-                fee_record.update_total_fees_paid()
-                
                 # Log the fee record creation
                 app.logger.info(f"Created fee record for student {student.student_unique_id} with course {course_detail.course_full_name}")
 
             db.session.commit()
 
-            # Run fee calculation synchronization
-            run_fee_calculation_sync()
-
             flash('Student added successfully with fee record!', 'success')
             return redirect(url_for('students'))
         except Exception as e:
@@ -533,15 +484,9 @@ def add_student():
 @login_required
 def student_summary():
     # Student summary dashboard with charts
-    course_counts = db.session.query(
-        Student.current_course, 
-        func.count(Student.id)
-    ).filter(Student.current_course != None).group_by(Student.current_course).all()
-
-    category_counts = db.session.query(
-        Student.category, 
-        func.count(Student.id)
-    ).filter(Student.category != None).group_by(Student.category).all()
+    facets = facet_cache.get_facets()
+    course_counts = facets['student_courses']
+    category_counts = facets['categories']
 
     monthly_admissions = db.session.query(
         func.extract('month', Student.admission_date),
@@ -568,7 +513,7 @@ def student_summary():
     total_courses_available = Course.query.count()
 
     # Get courses with enrolled students
-    courses_with_students = db.session.query(Student.current_course).distinct().filter(Student.current_course != None).count()
+    courses_with_students = len(course_counts)
 
     # Provide default empty data if no students exist
     if not course_counts:
@@ -684,6 +629,7 @@ def add_course_details():
                     fee_record.total_course_fees = total_fees
                     fee_record.total_fee = total_fees
 
+            catalog_cache.invalidate_catalog()
             db.session.commit()
             flash('Course details added successfully!', 'success')
             return redirect(url_for('course_details'))
@@ -715,6 +661,7 @@ def edit_course_details(detail_id):
         course_detail.total_course_fees = total_fees
 
         try:
+            catalog_cache.invalidate_catalog()
             db.session.commit()
             flash('Course details updated successfully!', 'success')
             return redirect(url_for('course_details'))
@@ -734,6 +681,7 @@ def delete_course_details(detail_id):
 
     try:
         db.session.delete(course_detail)
+        catalog_cache.invalidate_catalog()
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -796,6 +744,7 @@ def add_course():
 
         try:
             db.session.add(course)
+            catalog_cache.invalidate_catalog()
             db.session.commit()
             flash('Course added successfully!', 'success')
             return redirect(url_for('courses'))
@@ -857,6 +806,7 @@ def edit_course(course_id):
         course.duration = int(form.duration.data) if form.duration.data else course.duration
 
         try:
+            catalog_cache.invalidate_catalog()
             db.session.commit()
             flash('Course updated successfully!', 'success')
             return redirect(url_for('courses'))
@@ -904,6 +854,7 @@ def delete_course(course_id):
 
         # Delete the course
         db.session.delete(course)
+        catalog_cache.invalidate_catalog()
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -918,7 +869,6 @@ def fees():
         flash('You do not have permission to access this page.', 'error')
         return redirect(url_for('dashboard'))
 
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     course_filter = request.args.get('course', '')
     dues_issued_filter = request.args.get('dues_issued', '')
@@ -932,14 +882,9 @@ def fees():
 
     # Search filters
     if search:
-        search_filter = or_(
-            Student.first_name.contains(search),
-            Student.last_name.contains(search),
-            Student.student_unique_id.contains(search),
-            Student.current_course.contains(search),
-            CollegeFees.course_full_name.contains(search)
-        )
-        query = query.filter(search_filter)
+        query = query.filter(student_search.search_ids(
+            search, CollegeFees.id, CollegeFees.student_id, CollegeFees.course_full_name
+        ))
 
     if course_filter:
         query = query.filter(
@@ -961,33 +906,15 @@ def fees():
 
 
 
-    # Sorting
-    if hasattr(Student, sort_by):
-        if sort_order == 'desc':
-            query = query.order_by(getattr(Student, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Student, sort_by))
-    elif hasattr(CollegeFees, sort_by):
-        if sort_order == 'desc':
-            query = query.order_by(getattr(CollegeFees, sort_by).desc())
-        else:
-            query = query.order_by(getattr(CollegeFees, sort_by))
-
-    fees = query.paginate(page=page, per_page=20, error_out=False)
+    # Payments for the page in one extra query instead of one per row
+    query = query.options(selectinload(CollegeFees.payments))
 
-    # Log the number of fee records found
-    total_fee_records = db.session.query(CollegeFees).count()
-    app.logger.info(f"Total fee records in database: {total_fee_records}")
-    app.logger.info(f"Fee records displayed on page: {len(fees.items)}")
+    # Sorting: keyset pages on (sort column, fee record id), see pagination.py
+    fees = keyset_paginate(query, sort_column(sort_by, Student, CollegeFees), CollegeFees.id,
+                           descending=(sort_order == 'desc'))
 
-    # Get unique courses for filter - include both from students and fee records
-    student_courses = db.session.query(Student.current_course).distinct().filter(Student.current_course != None).all()
-    fee_courses = db.session.query(CollegeFees.course_full_name).distinct().filter(CollegeFees.course_full_name != None).all()
-    
-    # Combine and deduplicate courses
-    all_courses = set([course[0] for course in student_courses if course[0]])
-    all_courses.update([course[0] for course in fee_courses if course[0]])
-    courses = sorted(list(all_courses))
+    # Courses for filter - both from students and fee records, from the facet cache
+    courses = facet_cache.fee_course_options()
 
     return render_template('fees/fees.html', fees=fees, courses=courses)
 
@@ -1002,18 +929,18 @@ def payment():
     student_id = request.args.get('student_id', type=int)
 
     form = PaymentForm()
-    form.student_id.choices = [(s.id, f"{s.student_unique_id} - {s.first_name} {s.last_name}") for s in Student.query.filter(Student.student_status != 'Graduated').all()]
 
     # Pre-select student if coming from "+Pay" button
     if student_id and request.method == 'GET':
         form.student_id.data = student_id
 
     if form.validate_on_submit():
-        student = Student.query.get(form.student_id.data)
+        # Looked up once while validating the student field
+        student = form.student_id.student
         amount = form.amount.data
 
-        # Find student's fee record
-        fee_record = CollegeFees.query.filter_by(student_id=student.id).first()
+        # Find student's fee record, locked until commit so concurrent payments serialise
+        fee_record = fee_ledger.lock_fee_record(student.id)
         if not fee_record:
             flash('No fee record found for this student.', 'error')
             return redirect(url_for('payment'))
@@ -1024,14 +951,14 @@ def payment():
             fee_record.course_full_name = student.current_course
 
             # Find and set coursedetail_id and course_id based on current course
-            course_detail = CourseDetails.query.filter_by(course_full_name=student.current_course).first()
+            course_entry = catalog_cache.get_course_entry(student.current_course)
+            course_detail = course_entry.course_detail if course_entry else None
             if course_detail:
                 fee_record.coursedetail_id = course_detail.id
 
                 # Get course_id from course_detail's course_short_name
-                course = Course.query.filter_by(course_short_name=course_detail.course_short_name).first()
-                if course:
-                    fee_record.course_id = course.course_id
+                if course_entry.course:
+                    fee_record.course_id = course_entry.course.course_id
 
             # If no exact match found, try to find by course short name pattern
             elif not course_detail:
@@ -1039,33 +966,16 @@ def payment():
                 course_parts = student.current_course.split(' ')
                 if course_parts:
                     potential_short_name = course_parts[0]
-                    course = Course.query.filter_by(course_short_name=potential_short_name).first()
+                    course = catalog_cache.get_course(potential_short_name)
                     if course:
                         fee_record.course_id = course.course_id
                         # Try to find a matching course detail
-                        course_detail = CourseDetails.query.filter_by(course_short_name=potential_short_name).first()
+                        course_detail = catalog_cache.get_first_course_detail(potential_short_name)
                         if course_detail:
                             fee_record.coursedetail_id = course_detail.id
 
-        # Find next available installment slot
-        installments = [
-            (fee_record.installment_1, 'installment_1', 'invoice1_number'),
-            (fee_record.installment_2, 'installment_2', 'invoice2_number'),
-            (fee_record.installment_3, 'installment_3', 'invoice3_number'),
-            (fee_record.installment_4, 'installment_4', 'invoice4_number'),
-            (fee_record.installment_5, 'installment_5', 'invoice5_number'),
-            (fee_record.installment_6, 'installment_6', 'invoice6_number'),
-        ]
-
-        next_slot = None
-        for i, (value, field, invoice_field) in enumerate(installments):
-            if value == 0:
-                next_slot = (i + 1, field, invoice_field)
-                break
-
-        if not next_slot:
-            flash('All installment slots are filled for this student.', 'error')
-            return redirect(url_for('payment'))
+        # Payments are numbered per fee record with no upper limit
+        installment_number = fee_ledger.next_installment_number(fee_record)
 
         # Generate invoice - use the historical course information from fee record
         invoice_number = generate_invoice_number()
@@ -1074,23 +984,18 @@ def payment():
             course_id=fee_record.course_id,  # Use the course_id from fee record snapshot
             invoice_number=invoice_number,
             invoice_amount=amount,
-            installment_number=next_slot[0]
+            installment_number=installment_number
         )
 
-        # Update fee record
-        setattr(fee_record, next_slot[1], amount)
-        setattr(fee_record, next_slot[2], invoice_number)
-
-        # Update total_fees_paid using the formula
-        fee_record.update_total_fees_paid()
+        # Append to the payment ledger and bump the total_fees_paid rollup
+        fee_ledger.record_payment(fee_record, amount, invoice_number=invoice_number,
+                                  payment_mode=form.payment_mode.data, installment_number=installment_number)
 
         try:
             db.session.add(invoice)
+            # Commit flushes fee_record, which recalculates its totals
             db.session.commit()
 
-            # Run fee calculation synchronization
-            run_fee_calculation_sync()
-
             flash('Payment processed successfully!', 'success')
             return redirect(url_for('view_fee_detail', fee_id=fee_record.id))
         except Exception as e:
@@ -1103,114 +1008,83 @@ def payment():
     if student_id:
         selected_student = Student.query.get(student_id)
         if selected_student:
-            selected_fee_record = CollegeFees.query.filter_by(student_id=student_id).first()
+            selected_fee_record = fee_ledger.current_fee_record(student_id)
 
     return render_template('fees/payment_form.html', form=form, title='Process Payment', 
                          selected_student=selected_student, selected_fee_record=selected_fee_record)
 
+@app.route('/fees/payments/bulk', methods=['GET', 'POST'])
+@login_required
+def bulk_payments_upload():
+    """Post a bank/UPI statement of payments in one transaction"""
+    wants_json = request.args.get('format') == 'json'
+    if not can_edit_module(current_user, 'fees') or current_user.role.access_type != 'Edit':
+        if wants_json:
+            return jsonify({'error': 'Permission denied'}), 403
+        flash('You do not have permission to access this page.', 'error')
+        return redirect(url_for('dashboard'))
+
+    summary = None
+    if request.method == 'POST':
+        file = request.files.get('payment_file')
+        if not file or file.filename == '':
+            if wants_json:
+                return jsonify({'success': False, 'error': 'No file selected for upload.'}), 400
+            flash('No file selected for upload.', 'error')
+            return redirect(url_for('bulk_payments_upload'))
+
+        try:
+            records = read_payment_file(file)
+        except ValueError as e:
+            if wants_json:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            flash(f'Upload failed: {str(e)}', 'error')
+            return redirect(url_for('bulk_payments_upload'))
+
+        success, summary = post_bulk_payments(records, payment_mode=request.form.get('payment_mode') or 'Online')
+        app.logger.info(f"Bulk payments by {current_user.username}: {summary['posted']} posted, "
+                        f"{summary['skipped']} skipped, {summary['errors']} errors")
+
+        if wants_json:
+            return jsonify({'success': success, **summary})
+        flash(f"Posted {summary['posted']} payments, skipped {summary['skipped']}, {summary['errors']} errors.",
+              'success' if success else 'error')
+
+    return render_template('fees/bulk_payments.html', title='Bulk Payments', summary=summary,
+                           payment_modes=PAYMENT_MODES)
+
 # Exam Routes
 @app.route('/exam-summary')
 @login_required
 def exam_summary():
-    # Get all exams for calculations
-    all_exams = Exam.query.join(Student).all()
-
-    # Calculate statistics
-    total_exams = len(all_exams)
-    passed_exams = [exam for exam in all_exams if exam.overall_status == 'Pass']
-    failed_exams = [exam for exam in all_exams if exam.overall_status == 'Fail']
-
-    pass_rate = (len(passed_exams) / total_exams * 100) if total_exams > 0 else 0
-    average_score = sum(exam.percentage for exam in all_exams) / total_exams if total_exams > 0 else 0
-    failed_students = len(failed_exams)
-
-    # Grade distribution
-    grades = {}
-    for exam in all_exams:
-        grade = exam.grade or 'F'
-        grades[grade] = grades.get(grade, 0) + 1
-
-    grade_distribution = [grades.get(grade, 0) for grade in ['A+', 'A', 'B+', 'B', 'C+', 'C', 'F']]
-
-    # Subject performance (calculate average for each subject across all exams)
-    subject_data = {}
-    for exam in all_exams:
-        subjects = [
-            (exam.subject1_name, exam.subject1_obtained_marks, exam.subject1_max_marks),
-            (exam.subject2_name, exam.subject2_obtained_marks, exam.subject2_max_marks),
-            (exam.subject3_name, exam.subject3_obtained_marks, exam.subject3_max_marks),
-            (exam.subject4_name, exam.subject4_obtained_marks, exam.subject4_max_marks),
-            (exam.subject5_name, exam.subject5_obtained_marks, exam.subject5_max_marks),
-            (exam.subject6_name, exam.subject6_obtained_marks, exam.subject6_max_marks),
-        ]
-
-        for name, obtained, max_marks in subjects:
-            if name and obtained is not None and max_marks and max_marks > 0:
-                percentage = (obtained / max_marks) * 100
-                if name not in subject_data:
-                    subject_data[name] = []
-                subject_data[name].append(percentage)
-
-    subject_names = list(subject_data.keys())
-    subject_averages = [sum(scores) / len(scores) if scores else 0 for scores in subject_data.values()]
-
-    # Course performance - get actual course data from database
-    course_data = {}
-    for exam in all_exams:
-        course = exam.student.current_course
-        if course and exam.percentage is not None:
-            if course not in course_data:
-                course_data[course] = []
-            course_data[course].append(float(exam.percentage))
-
-    # Ensure we have meaningful course names and data
-    course_names = []
-    course_averages = []
-    for course, scores in course_data.items():
-        if scores:  # Only include courses with actual exam data
-            course_names.append(course)
-            course_averages.append(round(sum(scores) / len(scores), 1))
-
+    # All figures are aggregated in the database and cached (see exam_analytics)
+    dashboard = exam_analytics.exam_dashboard()
+    total_exams = dashboard['stats']['total_exams']
+    pass_rate = dashboard['stats']['pass_rate']
+    average_score = dashboard['stats']['average_score']
+    failed_students = dashboard['stats']['failed_students']
+
+    grade_distribution = dashboard['grade_distribution']
+    subject_names = dashboard['subject_names']
+    subject_averages = dashboard['subject_averages']
+
+    course_names = dashboard['course_names']
+    course_averages = dashboard['course_averages']
     # If no course data, provide default
     if not course_names:
         course_names = ['No Course Data']
         course_averages = [0]
 
-    # Semester trend - get actual semester data from database
-    semester_data = {}
-    for exam in all_exams:
-        semester = exam.semester
-        if semester and exam.percentage is not None:
-            if semester not in semester_data:
-                semester_data[semester] = []
-            semester_data[semester].append(float(exam.percentage))
-
-    # Sort semesters logically and calculate averages
-    semester_labels = []
-    semester_averages = []
-    if semester_data:
-        # Sort semester labels naturally
-        sorted_semesters = sorted(semester_data.keys(), key=lambda x: (
-            x.split()[1] if len(x.split()) > 1 else x,  # Sort by year/number
-            x.split()[0] if len(x.split()) > 1 else x   # Then by semester name
-        ))
-
-        for semester in sorted_semesters:
-            scores = semester_data[semester]
-            if scores:  # Only include semesters with actual exam data
-                semester_labels.append(semester)
-                semester_averages.append(round(sum(scores) / len(scores), 1))
-
+    semester_labels = dashboard['semester_labels']
+    semester_averages = dashboard['semester_averages']
     # If no semester data, provide default
     if not semester_labels:
         semester_labels = ['No Semester Data']
         semester_averages = [0]
 
-    # Top performers (top 10)
-    top_performers = sorted(all_exams, key=lambda x: x.percentage or 0, reverse=True)[:10]
-
-    # Recent exam activities (last 20)
-    recent_exams = Exam.query.join(Student).order_by(Exam.created_at.desc()).limit(20).all()
+    # Top performers (top 10) and recent exam activities (last 20)
+    top_performers = exam_analytics.top_performers(10)
+    recent_exams = exam_analytics.recent_exams(20)
 
     # Upcoming exams (placeholder - you might want to create a separate table for scheduled exams)
     upcoming_exams = []
@@ -1234,7 +1108,6 @@ def exam_summary():
 @app.route('/exams')
 @login_required
 def exams():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     course_filter = request.args.get('course', '')
     semester_filter = request.args.get('semester', '')
@@ -1248,14 +1121,7 @@ def exams():
 
     # Search filters
     if search:
-        search_filter = or_(
-            Student.first_name.contains(search),
-            Student.last_name.contains(search),
-            Student.student_unique_id.contains(search),
-            Exam.exam_name.contains(search),
-            Student.current_course.contains(search)
-        )
-        query = query.filter(search_filter)
+        query = query.filter(student_search.search_ids(search, Exam.id, Exam.student_id, Exam.exam_name))
 
     if course_filter:
         query = query.filter(Student.current_course.contains(course_filter))
@@ -1272,26 +1138,13 @@ def exams():
         elif promotion_filter == 'pending':
             query = query.filter(Exam.promotion_processed == False)
 
-    # Sorting
-    if hasattr(Exam, sort_by):
-        if sort_order == 'desc':
-            query = query.order_by(getattr(Exam, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Exam, sort_by))
-    elif hasattr(Student, sort_by):
-        if sort_order == 'desc':
-            query = query.order_by(getattr(Student, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Student, sort_by))
-
-    exams = query.paginate(page=page, per_page=20, error_out=False)
-
-    # Get filter options
-    courses = db.session.query(Student.current_course).distinct().filter(Student.current_course != None).all()
-    courses = [course[0] for course in courses]
+    # Sorting: keyset pages on (sort column, exam id), see pagination.py
+    exams = keyset_paginate(query, sort_column(sort_by, Exam, Student), Exam.id,
+                            descending=(sort_order == 'desc'))
 
-    semesters = db.session.query(Exam.semester).distinct().filter(Exam.semester != None).all()
-    semesters = [sem[0] for sem in semesters]
+    # Filter options from the facet cache
+    courses = facet_cache.student_course_options()
+    semesters = facet_cache.semester_options()
 
     return render_template('exams/exams.html', exams=exams, courses=courses, semesters=semesters)
 
@@ -1303,8 +1156,6 @@ def add_exam():
         return redirect(url_for('dashboard'))
 
     form = ExamForm()
-    # Set student choices excluding graduated students
-    form.student_id.choices = [(s.id, f"{s.student_unique_id} - {s.first_name} {s.last_name}") for s in Student.query.filter(Student.student_status != 'Graduated').all()]
 
     if request.method == 'POST':
         # Get data from form
@@ -1316,14 +1167,12 @@ def add_exam():
         coursedetail_id = None
         course_full_name = None
 
-        if student and student.current_course:
-            course_detail = CourseDetails.query.filter_by(course_full_name=student.current_course).first()
-            if course_detail:
-                coursedetail_id = course_detail.id
-                course_full_name = course_detail.course_full_name
-                course = Course.query.filter_by(course_short_name=course_detail.course_short_name).first()
-                if course:
-                    course_id = course.course_id
+        course_entry = catalog_cache.get_course_entry(student.current_course) if student else None
+        if course_entry:
+            coursedetail_id = course_entry.course_detail.id
+            course_full_name = course_entry.course_detail.course_full_name
+            if course_entry.course:
+                course_id = course_entry.course.course_id
 
         exam_name = form.exam_name.data
         exam_date = form.exam_date.data
@@ -1379,6 +1228,7 @@ def add_exam():
 
         try:
             db.session.add(exam)
+            exam_analytics.invalidate_exam_dashboard()
             db.session.commit()
             flash('Exam results saved successfully!', 'success')
             return redirect(url_for('exams'))
@@ -1439,13 +1289,12 @@ def edit_exam(exam_id):
         # This maintains historical accuracy even if student has been promoted
         # Only update if the exam doesn't have course information yet
         if not exam.course_full_name and exam.student and exam.student.current_course:
-            course_detail = CourseDetails.query.filter_by(course_full_name=exam.student.current_course).first()
-            if course_detail:
-                exam.coursedetail_id = course_detail.id
-                exam.course_full_name = course_detail.course_full_name
-                course = Course.query.filter_by(course_short_name=course_detail.course_short_name).first()
-                if course:
-                    exam.course_id = course.course_id
+            course_entry = catalog_cache.get_course_entry(exam.student.current_course)
+            if course_entry:
+                exam.coursedetail_id = course_entry.course_detail.id
+                exam.course_full_name = course_entry.course_detail.course_full_name
+                if course_entry.course:
+                    exam.course_id = course_entry.course.course_id
         exam.exam_name = form.exam_name.data
         exam.exam_date = form.exam_date.data
         exam.subject1_name = subject1_name
@@ -1464,6 +1313,7 @@ def edit_exam(exam_id):
         exam.overall_status = status
 
         try:
+            exam_analytics.invalidate_exam_dashboard()
             db.session.commit()
             flash('Exam results updated successfully!', 'success')
             return redirect(url_for('exams'))
@@ -1473,59 +1323,6 @@ def edit_exam(exam_id):
 
     return render_template('exams/exam_form.html', form=form, title='Edit Exam Results', exam=exam)
 
-def parse_year_semester(year_semester):
-    """Parse year_semester string to extract numeric order for progression"""
-    if not year_semester:
-        return None
-
-    year_semester = year_semester.strip().lower()
-
-    # Handle semester patterns (1st sem, 2nd sem, etc.)
-    import re
-    sem_match = re.search(r'(\d+)(?:st|nd|rd|th)?\s*sem', year_semester)
-    if sem_match:
-        return int(sem_match.group(1))
-
-    # Handle year patterns (1st year, 2nd year, etc.)  
-    year_match = re.search(r'(\d+)(?:st|nd|rd|th)?\s*year', year_semester)
-    if year_match:
-        return int(year_match.group(1))
-
-    # Handle direct numbers
-    if year_semester.isdigit():
-        return int(year_semester)
-
-    # Handle special cases
-    special_cases = {
-        'fy': 1, 'sy': 2, 'ty': 3,
-        'final': 99, 'final year': 99
-    }
-    if year_semester in special_cases:
-        return special_cases[year_semester]
-
-    return None
-
-def get_course_progression(course_full_name_base):
-    """Get ordered progression of course levels"""
-    # Extract the base course name (without semester/year info)
-    base_name = course_full_name_base.split(' - ')[0] if ' - ' in course_full_name_base else course_full_name_base
-
-    # Find all course details for this base course
-    course_details = CourseDetails.query.filter(
-        CourseDetails.course_full_name.like(f"{base_name}%")
-    ).all()
-
-    # Sort by parsed year_semester value
-    progression = []
-    for detail in course_details:
-        order = parse_year_semester(detail.year_semester)
-        if order is not None:
-            progression.append((order, detail.course_full_name, detail.year_semester))
-
-    # Sort by order and return course names
-    progression.sort(key=lambda x: x[0])
-    return [item[1] for item in progression]
-
 @app.route('/students/bulk-promote', methods=['POST'])
 @login_required
 def bulk_promote_students():
@@ -1541,183 +1338,20 @@ def bulk_promote_students():
         if not students_data:
             return jsonify({'error': 'No students selected for promotion'}), 400
         
-        results = []
-        
-        for student_data in students_data:
-            student_id = student_data.get('student_id')
-            exam_id = student_data.get('exam_id')
-            student_name = student_data.get('student_name', 'Unknown')
-            
-            try:
-                student = Student.query.get(student_id)
-                if not student:
-                    results.append({
-                        'success': False,
-                        'student_id': student_id,
-                        'student_name': student_name,
-                        'error': 'Student not found'
-                    })
-                    continue
-                
-                # Check if student is dropped out (but allow graduated students)
-                if student.student_status == 'Dropout':
-                    results.append({
-                        'success': False,
-                        'student_id': student_id,
-                        'student_name': student_name,
-                        'error': 'Student status is Dropout'
-                    })
-                    continue
-                
-                # Get the exam
-                exam = Exam.query.filter_by(
-                    id=exam_id,
-                    student_id=student_id,
-                    overall_status='Pass',
-                    promotion_processed=False
-                ).first()
-                
-                if not exam:
-                    results.append({
-                        'success': False,
-                        'student_id': student_id,
-                        'student_name': student_name,
-                        'error': 'No eligible exam found for promotion'
-                    })
-                    continue
-                
-                current_course = student.current_course
-                if not current_course:
-                    results.append({
-                        'success': False,
-                        'student_id': student_id,
-                        'student_name': student_name,
-                        'error': 'No current course assigned'
-                    })
-                    continue
-                
-                # Get course progression
-                progression = get_course_progression(current_course)
-                if not progression:
-                    results.append({
-                        'success': False,
-                        'student_id': student_id,
-                        'student_name': student_name,
-                        'error': 'No course progression found'
-                    })
-                    continue
-                
-                # Find current position
-                current_index = None
-                for i, course_name in enumerate(progression):
-                    if course_name == current_course:
-                        current_index = i
-                        break
-                
-                if current_index is None:
-                    results.append({
-                        'success': False,
-                        'student_id': student_id,
-                        'student_name': student_name,
-                        'error': 'Current course not in progression'
-                    })
-                    continue
-                
-                # Check if final level
-                if current_index >= len(progression) - 1:
-                    # At final level - check if more progression exists
-                    base_name = current_course.split(' - ')[0] if ' - ' in current_course else current_course
-                    current_sem_info = current_course.split(' - ')[1] if ' - ' in current_course else ''
-                    
-                    import re
-                    sem_match = re.search(r'(\d+)(?:st|nd|rd|th)?\s*sem', current_sem_info.lower())
-                    year_match = re.search(r'(\d+)(?:st|nd|rd|th)?\s*year', current_sem_info.lower())
-                    
-                    next_course_name = None
-                    if sem_match:
-                        current_num = int(sem_match.group(1))
-                        next_num = current_num + 1
-                        ordinal = {1: '1st', 2: '2nd', 3: '3rd'}.get(next_num, f'{next_num}th')
-                        potential_next = f"{base_name} - {ordinal} Sem"
-                        
-                        if CourseDetails.query.filter_by(course_full_name=potential_next).first():
-                            next_course_name = potential_next
-                    elif year_match:
-                        current_num = int(year_match.group(1))
-                        next_num = current_num + 1
-                        ordinal = {1: '1st', 2: '2nd', 3: '3rd'}.get(next_num, f'{next_num}th')
-                        potential_next = f"{base_name} - {ordinal} Year"
-                        
-                        if CourseDetails.query.filter_by(course_full_name=potential_next).first():
-                            next_course_name = potential_next
-                    
-                    if next_course_name:
-                        # Promote to next semester/year
-                        old_course = student.current_course
-                        student.current_course = next_course_name
-                        
-                        # If student was graduated, set them back to Active status when promoting
-                        if student.student_status == 'Graduated':
-                            student.student_status = 'Active'
-                        
-                        exam.promotion_processed = True
-                        db.session.commit()
-                        
-                        results.append({
-                            'success': True,
-                            'student_id': student_id,
-                            'student_name': student_name,
-                            'action': 'promoted',
-                            'previous_course': old_course,
-                            'current_course': next_course_name,
-                            'message': f'Promoted from {old_course} to {next_course_name}'
-                        })
-                    else:
-                        # Graduate student
-                        student.student_status = 'Graduated'
-                        exam.promotion_processed = True
-                        db.session.commit()
-                        
-                        results.append({
-                            'success': True,
-                            'student_id': student_id,
-                            'student_name': student_name,
-                            'action': 'graduated',
-                            'message': 'Student graduated'
-                        })
-                else:
-                    # Promote to next level from progression
-                    next_course = progression[current_index + 1]
-                    old_course = student.current_course
-                    student.current_course = next_course
-                    
-                    # If student was graduated, set them back to Active status when promoting
-                    if student.student_status == 'Graduated':
-                        student.student_status = 'Active'
-                    
-                    exam.promotion_processed = True
-                    db.session.commit()
-                    
-                    results.append({
-                        'success': True,
-                        'student_id': student_id,
-                        'student_name': student_name,
-                        'action': 'promoted',
-                        'previous_course': old_course,
-                        'current_course': next_course,
-                        'message': f'Promoted from {old_course} to {next_course}'
-                    })
-                
-            except Exception as e:
-                db.session.rollback()
-                results.append({
-                    'success': False,
-                    'student_id': student_id,
-                    'student_name': student_name,
-                    'error': str(e)
-                })
-                app.logger.error(f"Error promoting student {student_id}: {str(e)}")
-        
+        # Students, exams and progressions are loaded once for the whole batch
+        rollover_report = []
+        results = promotion.promote_students([{
+            'student_id': student_data.get('student_id'),
+            'exam_id': student_data.get('exam_id'),
+            'student_name': student_data.get('student_name', 'Unknown'),
+        } for student_data in students_data], rollover_report=rollover_report)
+
+        fee_records_created = sum(created for _, created, _ in rollover_report)
+        app.logger.info(
+            f"Bulk promotion: {len(results)} students, {fee_records_created} fee records rolled over "
+            f"in {sum(seconds for _, _, seconds in rollover_report):.3f}s ({len(rollover_report)} chunks)"
+        )
+
         # Return summary
         success_count = sum(1 for r in results if r['success'])
         return jsonify({
@@ -1725,6 +1359,7 @@ def bulk_promote_students():
             'total': len(results),
             'successful': success_count,
             'failed': len(results) - success_count,
+            'fee_records_created': fee_records_created,
             'results': results
         })
         
@@ -1733,6 +1368,23 @@ def bulk_promote_students():
         app.logger.error(f"Bulk promotion error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/students/bulk-promote/preview')
+@login_required
+def bulk_promote_preview():
+    """Who a bulk promotion would promote, graduate or skip (and why), without writing anything"""
+    if not can_edit_module(current_user, 'students'):
+        return jsonify({'error': 'Permission denied'}), 403
+
+    try:
+        course = request.args.get('course', '').strip() or None
+        semester = request.args.get('semester', '').strip() or None
+        preview = promotion.preview_promotions(course=course, semester=semester)
+
+        return jsonify({'success': True, 'course': course, 'semester': semester, **preview})
+    except Exception as e:
+        app.logger.error(f"Bulk promotion preview error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/students/promote/<int:student_id>', methods=['POST'])
 @login_required
 def promote_student(student_id):
@@ -1747,144 +1399,44 @@ def promote_student(student_id):
         return jsonify({'error': f'Cannot promote student with status: Dropout'}), 400
 
     try:
-        # Get exam ID from request data if provided
+        # Get exam ID from request data if provided (otherwise the latest unprocessed exam is used)
         data = request.get_json() or {}
         exam_id = data.get('exam_id')
 
-        if exam_id:
-            # Use specific exam if provided
-            latest_exam = db.session.query(Exam).filter_by(
-                id=exam_id,
-                student_id=student_id,
-                overall_status='Pass',
-                promotion_processed=False
-            ).first()
-        else:
-            # Fallback to latest unprocessed exam
-            latest_exam = db.session.query(Exam).filter_by(
-                student_id=student_id,
-                overall_status='Pass',
-                promotion_processed=False
-            ).order_by(Exam.created_at.desc()).first()
-
-        if not latest_exam:
-            return jsonify({
-                'error': 'Student must have unprocessed passing exam results before promotion'
-            }), 400
-
-        current_course = student.current_course
-        if not current_course:
-            return jsonify({'error': 'Student has no current course assigned'}), 400
-
-        # Get course progression using more robust logic
-        progression = get_course_progression(current_course)
-        if not progression:
-            return jsonify({'error': 'No course progression found'}), 400
-
-        # Find current position in progression
-        current_index = None
-        for i, course_name in enumerate(progression):
-            if course_name == current_course:
-                current_index = i
-                break
-
-        if current_index is None:
-            return jsonify({'error': 'Current course not found in progression sequence'}), 400
-
-        # Check if this is the final level
-        if current_index >= len(progression) - 1:
-            # At final level - need to determine if this is truly the end or if more progression exists
-            # Check if there are higher semesters/years available
-            base_name = current_course.split(' - ')[0] if ' - ' in current_course else current_course
-            
-            # Extract current semester/year info
-            current_sem_info = current_course.split(' - ')[1] if ' - ' in current_course else ''
-            
-            # Try to find next progression (e.g., 4th Sem -> 5th Sem, 1st year -> 2nd year)
-            import re
-            sem_match = re.search(r'(\d+)(?:st|nd|rd|th)?\s*sem', current_sem_info.lower())
-            year_match = re.search(r'(\d+)(?:st|nd|rd|th)?\s*year', current_sem_info.lower())
-            
-            next_course_name = None
-            if sem_match:
-                current_num = int(sem_match.group(1))
-                # Try to construct next semester name
-                next_num = current_num + 1
-                ordinal = {1: '1st', 2: '2nd', 3: '3rd'}.get(next_num, f'{next_num}th')
-                potential_next = f"{base_name} - {ordinal} Sem"
-                
-                # Check if this course exists
-                if CourseDetails.query.filter_by(course_full_name=potential_next).first():
-                    next_course_name = potential_next
-            elif year_match:
-                current_num = int(year_match.group(1))
-                next_num = current_num + 1
-                ordinal = {1: '1st', 2: '2nd', 3: '3rd'}.get(next_num, f'{next_num}th')
-                potential_next = f"{base_name} - {ordinal} Year"
-                
-                if CourseDetails.query.filter_by(course_full_name=potential_next).first():
-                    next_course_name = potential_next
-            
-            if next_course_name:
-                # Promote to the next semester/year
-                old_course = student.current_course
-                student.current_course = next_course_name
-                
-                # If student was graduated, set them back to Active status when promoting
-                if student.student_status == 'Graduated':
-                    student.student_status = 'Active'
-                
-                latest_exam.promotion_processed = True
-                db.session.commit()
-                
-                app.logger.info(f"Student {student.student_unique_id} promoted from {old_course} to {next_course_name}")
-                
-                return jsonify({
-                    'success': True,
-                    'message': f'Student {student.first_name} {student.last_name} promoted from {old_course} to {next_course_name}',
-                    'action': 'promoted',
-                    'previous_course': old_course,
-                    'current_course': next_course_name,
-                    'student_status': student.student_status
-                })
-            else:
-                # No next semester/year found - graduate the student
-                student.student_status = 'Graduated'
-                latest_exam.promotion_processed = True
-                db.session.commit()
-
-                app.logger.info(f"Student {student.student_unique_id} graduated from {current_course}")
-
-                return jsonify({
-                    'success': True, 
-                    'message': f'Student {student.first_name} {student.last_name} has been graduated!',
-                    'action': 'graduated',
-                    'current_course': current_course,
-                    'student_status': 'Graduated'
-                })
+        student_name = f"{student.first_name} {student.last_name}"
+        result = promotion.promote_students([{
+            'student_id': student_id,
+            'exam_id': exam_id,
+            'student_name': student_name,
+        }])[0]
 
-        # Promote to next level from progression
-        next_course = progression[current_index + 1]
+        if not result['success']:
+            error = result['error']
+            if error == 'No eligible exam found for promotion':
+                error = 'Student must have unprocessed passing exam results before promotion'
+            return jsonify({'error': error}), 400
 
-        # Check for duplicate promotion (prevent promoting twice to same level)
-        if student.current_course == next_course:
-            return jsonify({'error': 'Student is already at this level'}), 400
+        student = Student.query.get(student_id)
+        if result['action'] == 'graduated':
+            app.logger.info(f"Student {student.student_unique_id} graduated from {student.current_course}")
 
-        # Update student's course and mark exam as processed
-        old_course = student.current_course
-        student.current_course = next_course
-        latest_exam.promotion_processed = True
-        db.session.commit()
+            return jsonify({
+                'success': True,
+                'message': f'Student {student_name} has been graduated!',
+                'action': 'graduated',
+                'current_course': student.current_course,
+                'student_status': 'Graduated'
+            })
 
         # Log the promotion
-        app.logger.info(f"Student {student.student_unique_id} ({student.first_name} {student.last_name}) promoted from {old_course} to {next_course}")
+        app.logger.info(f"Student {student.student_unique_id} ({student_name}) promoted from {result['previous_course']} to {result['current_course']}")
 
         return jsonify({
-            'success': True, 
-            'message': f'Student {student.first_name} {student.last_name} promoted from {old_course} to {next_course}',
+            'success': True,
+            'message': f"Student {student_name} promoted from {result['previous_course']} to {result['current_course']}",
             'action': 'promoted',
-            'previous_course': old_course,
-            'current_course': next_course,
+            'previous_course': result['previous_course'],
+            'current_course': result['current_course'],
             'student_status': student.student_status
         })
 
@@ -1904,11 +1456,10 @@ def analytics():
 @login_required
 def api_get_subjects(course_name):
     try:
-        # Extract course short name from full name
-        course_detail = CourseDetails.query.filter_by(course_full_name=course_name).first()
-        if course_detail:
-            subjects = Subject.query.filter_by(course_short_name=course_detail.course_short_name).all()
-            subject_list = [{'name': s.subject_name, 'type': s.subject_type} for s in subjects]
+        # Subjects are cached with the course they belong to
+        course_entry = catalog_cache.get_course_entry(course_name)
+        if course_entry:
+            subject_list = [{'name': s.subject_name, 'type': s.subject_type} for s in course_entry.subjects]
             return jsonify({'success': True, 'subjects': subject_list})
         else:
             return jsonify({'success': False, 'subjects': []})
@@ -1919,7 +1470,7 @@ def api_get_subjects(course_name):
 @login_required
 def api_get_course_fees(course_name):
     try:
-        course_detail = CourseDetails.query.filter_by(course_full_name=course_name).first()
+        course_detail = catalog_cache.get_course_detail(course_name)
         if course_detail:
             fees_data = {
                 'course_tuition_fee': float(course_detail.course_tuition_fee or 0),
@@ -1952,7 +1503,7 @@ def api_student_stats():
             and_(
                 Student.current_course.isnot(None),
                 Student.current_course != '',
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Student.admission_date, year)
             )
         ).group_by(Student.current_course).all()
 
@@ -1992,11 +1543,7 @@ def api_student_stats():
 @login_required
 def api_course_list():
     try:
-        courses = db.session.query(Student.current_course).distinct().filter(
-            Student.current_course.isnot(None)
-        ).all()
-        course_list = [course[0] for course in courses if course[0]]
-        return jsonify({'courses': sorted(course_list)})
+        return jsonify({'courses': facet_cache.student_course_options()})
     except Exception as e:
         print(f"Error in api_course_list: {e}")
         return jsonify({'courses': []})
@@ -2009,13 +1556,13 @@ def api_dashboard_stats():
 
         # Filter students based on admission year
         total_students = Student.query.filter(
-            func.extract('year', Student.admission_date) == year
+            year_range_filter(Student.admission_date, year)
         ).count()
 
         active_students = Student.query.filter(
             and_(
                 Student.student_status == 'Active',
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Student.admission_date, year)
             )
         ).count()
 
@@ -2023,14 +1570,14 @@ def api_dashboard_stats():
         total_collected_fees = db.session.query(
             func.sum(func.coalesce(Invoice.invoice_amount, 0))
         ).join(Student).filter(
-            func.extract('year', Student.admission_date) == year
+            year_range_filter(Student.admission_date, year)
         ).scalar() or 0
 
         # Calculate pending fees for students admitted in the selected year
         total_fees_due = db.session.query(
             func.sum(func.coalesce(CollegeFees.total_fee, 0))
         ).join(Student).filter(
-            func.extract('year', Student.admission_date) == year
+            year_range_filter(Student.admission_date, year)
         ).scalar() or 0
 
         pending_fees = max(0, total_fees_due - total_collected_fees)
@@ -2070,8 +1617,8 @@ def api_fee_stats():
             func.sum(func.coalesce(Invoice.invoice_amount, 0))
         ).join(Student).filter(
             and_(
-                func.extract('year', Invoice.date_time) == year,
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Invoice.date_time, year),
+                year_range_filter(Student.admission_date, year)
             )
         ).group_by(func.extract('month', Invoice.date_time)).order_by(func.extract('month', Invoice.date_time)).all()
 
@@ -2100,6 +1647,36 @@ def api_fee_stats():
             'amounts': [0] * 12
         })
 
+@app.route('/api/changes')
+@login_required
+def api_changes():
+    """Rows changed since a cursor, for delta sync: ?type=students&cursor=<next_cursor>[&limit=500]
+
+    Start with ?since=<ISO timestamp> (or neither, for everything), then pass each
+    response's next_cursor back until has_more is false; keep the last cursor for the next sync.
+    """
+    data_type = request.args.get('type', '')
+    if data_type not in change_feed.CHANGE_FEEDS:
+        return jsonify({'success': False, 'error': f'Unknown type: {data_type}'}), 400
+    if not can_edit_module(current_user, _export_module(data_type)):
+        return jsonify({'error': 'Permission denied'}), 403
+
+    try:
+        since = change_feed.parse_since(request.args.get('since'))
+        changes = change_feed.get_changes(
+            data_type,
+            cursor=request.args.get('cursor'),
+            since=since,
+            limit=request.args.get('limit', change_feed.CHANGE_FEED_LIMIT, type=int),
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Change feed failed for {data_type}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, **changes})
+
 @app.route('/api/search-students')
 @login_required
 def api_search_students():
@@ -2109,27 +1686,15 @@ def api_search_students():
         return jsonify({'success': False, 'students': []})
 
     try:
-        # Search students by name or ID, excluding graduated students
-        search_filter = and_(
-            or_(
-                Student.first_name.ilike(f'%{query}%'),
-                Student.last_name.ilike(f'%{query}%'),
-                Student.student_unique_id.ilike(f'%{query}%'),
-                func.concat(Student.first_name, ' ', Student.last_name).ilike(f'%{query}%')
-            ),
-            Student.student_status != 'Graduated'
-        )
-
-        students = Student.query.filter(search_filter).limit(10).all()
-
+        # ID prefix matches first, then name/ID/course matches by relevance, excluding graduated students
         students_data = []
-        for student in students:
+        for student in student_search.search_students(query):
             students_data.append({
-                'id': student.id,
-                'student_unique_id': student.student_unique_id,
-                'first_name': student.first_name,
-                'last_name': student.last_name,
-                'current_course': student.current_course or 'No Course Assigned'
+                'id': student['id'],
+                'student_unique_id': student['student_unique_id'],
+                'first_name': student['first_name'],
+                'last_name': student['last_name'],
+                'current_course': student['current_course'] or 'No Course Assigned'
             })
 
         return jsonify({'success': True, 'students': students_data})
@@ -2147,7 +1712,7 @@ def api_student_fee_details(student_id):
                 'error': 'Student not found'
             }), 404
 
-        fee_record = CollegeFees.query.filter_by(student_id=student_id).first()
+        fee_record = fee_ledger.current_fee_record(student_id)
 
         if not fee_record:
             return jsonify({
@@ -2164,26 +1729,9 @@ def api_student_fee_details(student_id):
                 'payment_history': []
             })
 
-        # Calculate paid amount and next installment
-        installments = [
-            float(fee_record.installment_1 or 0),
-            float(fee_record.installment_2 or 0),
-            float(fee_record.installment_3 or 0),
-            float(fee_record.installment_4 or 0),
-            float(fee_record.installment_5 or 0),
-            float(fee_record.installment_6 or 0)
-        ]
-
-        paid_amount = sum(installments)
-        next_installment = 1
-
-        # Find next available installment
-        for i, amount in enumerate(installments):
-            if float(amount or 0) == 0:
-                next_installment = i + 1
-                break
-        else:
-            next_installment = 7  # All installments paid
+        # Paid amount is the ledger rollup; payments are numbered with no upper limit
+        paid_amount = float(fee_record.total_fees_paid or 0)
+        next_installment = fee_ledger.next_installment_number(fee_record)
 
         # Use total_amount_after_rebate if available, otherwise use total_fee
         # Prioritize total_amount_after_rebate for accurate due amount calculation
@@ -2277,6 +1825,7 @@ def add_subject(course_id):
 
         try:
             db.session.add(subject)
+            catalog_cache.invalidate_catalog()
             db.session.commit()
             flash('Subject added successfully!', 'success')
             return redirect(url_for('course_subjects', course_id=course_id))
@@ -2370,6 +1919,8 @@ def edit_subject(subject_id):
                 subject.subject_name = new_subject_name
                 subject.subject_type = form.subject_type.data
                 
+                catalog_cache.invalidate_catalog()
+                exam_analytics.invalidate_exam_dashboard()
                 db.session.commit()
                 flash(f'Subject updated successfully! All student and exam records have been updated from "{old_subject_name}" to "{new_subject_name}".', 'success')
                 return redirect(url_for('course_subjects', course_id=course.course_id))
@@ -2381,6 +1932,7 @@ def edit_subject(subject_id):
             # Only subject type changed
             form.populate_obj(subject)
             try:
+                catalog_cache.invalidate_catalog()
                 db.session.commit()
                 flash('Subject updated successfully!', 'success')
                 return redirect(url_for('course_subjects', course_id=course.course_id))
@@ -2400,6 +1952,7 @@ def delete_subject(subject_id):
 
     try:
         db.session.delete(subject)
+        catalog_cache.invalidate_catalog()
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -2413,7 +1966,6 @@ def invoices():
         flash('You do not have permission to access this page.', 'error')
         return redirect(url_for('dashboard'))
 
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
@@ -2424,13 +1976,9 @@ def invoices():
 
     # Search filters
     if search:
-        search_filter = or_(
-            Invoice.invoice_number.contains(search),
-            Student.first_name.contains(search),
-            Student.last_name.contains(search),
-            Student.student_unique_id.contains(search)
-        )
-        query = query.filter(search_filter)
+        query = query.filter(student_search.search_ids(
+            search, Invoice.id, Invoice.student_id, Invoice.invoice_number
+        ))
 
     # Date filters
     if date_from:
@@ -2447,22 +1995,12 @@ def invoices():
         except ValueError:
             pass
 
-    # Sorting
-    if hasattr(Invoice, sort_by):
-        if sort_order == 'desc':
-            query = query.order_by(getattr(Invoice, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Invoice, sort_by))
-    elif hasattr(Student, sort_by):
-        if sort_order == 'desc':
-            query = query.order_by(getattr(Student, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Student, sort_by))
-    else:
+    # Sorting: keyset pages on (sort column, invoice id), see pagination.py
+    column = sort_column(sort_by, Invoice, Student)
+    if column is None:
         # Default ordering by date
-        query = query.order_by(Invoice.date_time.desc())
-
-    invoices = query.paginate(page=page, per_page=20, error_out=False)
+        column, sort_order = Invoice.date_time, 'desc'
+    invoices = keyset_paginate(query, column, Invoice.id, descending=(sort_order == 'desc'))
     return render_template('fees/invoices.html', invoices=invoices)
 
 @app.route('/students/<int:student_id>')
@@ -2507,30 +2045,25 @@ def edit_student(student_id):
         form.subject_3_name.data = student.subject_3_name
 
     # Get existing fee record for the student
-    fee_record = CollegeFees.query.filter_by(student_id=student.id).first()
+    fee_record = fee_ledger.current_fee_record(student.id)
 
     # Get course details for fee information
-    course_detail = None
-    if student.current_course:
-        course_detail = CourseDetails.query.filter_by(course_full_name=student.current_course).first()
+    course_detail = catalog_cache.get_course_detail(student.current_course)
 
     if form.validate_on_submit():
         form.populate_obj(student)
         student.updated_at = datetime.utcnow()
 
         try:
-            # Update concatenated address after form data changes
-            student.update_concatenated_address()
-
             # Check if fee record exists, create if student has course but no fee record
-            fee_record = CollegeFees.query.filter_by(student_id=student.id).first()
+            fee_record = fee_ledger.current_fee_record(student.id)
             
             if not fee_record and student.current_course:
                 # Create new fee record for student with course
-                course_detail = CourseDetails.query.filter_by(course_full_name=student.current_course).first()
+                course_detail = catalog_cache.get_course_detail(student.current_course)
                 if course_detail:
                     course_short = course_detail.course_short_name
-                    course = Course.query.filter_by(course_short_name=course_short).first()
+                    course = catalog_cache.get_course(course_short)
                     
                     # Get fee data from form
                     total_course_fees = float(request.form.get('fee_total_course_fees', course_detail.total_course_fees) or 0)
@@ -2586,23 +2119,17 @@ def edit_student(student_id):
                         pending_dues_for_libraries=pending_dues_for_libraries,
                         pending_dues_for_hostel=pending_dues_for_hostel,
                         exam_admit_card_issued=exam_admit_card_issued,
-                        installment_1=0,
-                        installment_2=0,
-                        installment_3=0,
-                        installment_4=0,
-                        installment_5=0,
-                        installment_6=0
+                        total_fees_paid=0
                     )
                     db.session.add(fee_record)
                     db.session.flush()
-                    fee_record.update_total_fees_paid()
                     app.logger.info(f"Created fee record for existing student {student.student_unique_id}")
 
             # Update fee record if fee data is provided
             if fee_record:
                 # Synchronize total_course_fees from course_details if course has changed
                 if student.current_course:
-                    course_detail = CourseDetails.query.filter_by(course_full_name=student.current_course).first()
+                    course_detail = catalog_cache.get_course_detail(student.current_course)
                     if course_detail:
                         # Update total_course_fees from course_details to ensure consistency
                         fee_record.total_course_fees = float(course_detail.total_course_fees or 0)
@@ -2668,14 +2195,10 @@ def edit_student(student_id):
                 if request.form.get('fee_miscellaneous_fee_3'):
                     fee_record.miscellaneous_fee_3 = float(request.form.get('fee_miscellaneous_fee_3', 0) or 0)
 
-                # Database automatically calculates both total_fee and total_fees_paid
-                # No manual calculation needed as database formulas handle both
+                # total_fee, total_fees_paid and total_amount_due are recalculated on flush
 
             db.session.commit()
 
-            # Run fee calculation synchronization
-            run_fee_calculation_sync()
-
             flash('Student and fee details updated successfully!', 'success')
             return redirect(url_for('students'))
         except Exception as e:
@@ -2742,32 +2265,12 @@ def fee_summary():
         flash('You do not have permission to access this page.', 'error')
         return redirect(url_for('dashboard'))
 
-    # Calculate total fees due, collected, and pending
-    total_fees_due = db.session.query(func.sum(CollegeFees.total_fee)).scalar() or 0
-    total_fees_collected = db.session.query(func.sum(CollegeFees.total_fees_paid)).scalar() or 0
-    total_pending_dues = max(0, total_fees_due - total_fees_collected)
-
-    # Students with dues - count students where total_fees_paid < total_fee
-    students_with_dues = db.session.query(func.count(CollegeFees.id)).filter(
-        CollegeFees.total_fees_paid < CollegeFees.total_fee
-    ).scalar() or 0
-
-    # Monthly collections data
-    current_year = datetime.now().year
-    monthly_collections = []
-    for month in range(1, 13):
-        monthly_total = db.session.query(
-            func.sum(Invoice.invoice_amount)
-        ).filter(
-            func.extract('month', Invoice.date_time) == month,
-            func.extract('year', Invoice.date_time) == current_year
-        ).scalar() or 0
-        monthly_collections.append(float(monthly_total))
+    summary = fee_reports.fee_summary_data()
 
     # Payment mode distribution - get actual data from invoices
     # For now using mock data since payment_mode field doesn't exist
     # You can add payment_mode column to Invoice model later
-    total_invoices = Invoice.query.count()
+    total_invoices = summary.pop('total_invoices')
     if total_invoices > 0:
         # Distribute based on realistic percentages
         cash_count = int(total_invoices * 0.65)
@@ -2780,73 +2283,10 @@ def fee_summary():
 
     payment_modes = ['Cash', 'Online', 'Cheque', 'DD']
 
-    # Course-wise fee collection
-    course_collections_data = db.session.query(
-        Student.current_course,
-        func.sum(Invoice.invoice_amount)
-    ).join(Invoice).filter(Student.current_course.isnot(None)).group_by(Student.current_course).all()
-
-    course_names = [course[0] for course in course_collections_data if course[0]]
-    course_collections = [float(course[1]) for course in course_collections_data if course[1]]
-
-    # Scholarship data - get actual counts from database
-    gov_scholarship_applied = Student.query.filter_by(scholarship_status='Applied').count()
-    gov_scholarship_approved = Student.query.filter_by(scholarship_status='Approved').count() 
-    gov_scholarship_granted = Student.query.filter_by(scholarship_status='Granted').count()
-
-    meera_scholarship_applied = Student.query.filter_by(rebate_meera_scholarship_status='Applied').count()
-    meera_scholarship_approved = Student.query.filter_by(rebate_meera_scholarship_status='Approved').count()
-    meera_scholarship_granted = Student.query.filter_by(rebate_meera_scholarship_status='Granted').count()
-
-    # Calculate merit and need-based from fee records
-    merit_applied = db.session.query(func.count(CollegeFees.id)).filter(
-        CollegeFees.scholarship_applied == True,
-        CollegeFees.government_scholarship_amount > 0
-    ).scalar() or 0
-
-    merit_approved = db.session.query(func.count(CollegeFees.id)).filter(
-        CollegeFees.scholarship_approved == True,
-        CollegeFees.government_scholarship_amount > 0
-    ).scalar() or 0
-
-    merit_granted = db.session.query(func.count(CollegeFees.id)).filter(
-        CollegeFees.scholarship_granted == True,
-        CollegeFees.government_scholarship_amount > 0
-    ).scalar() or 0
-
-    # Need-based can be calculated from meera rebate
-    need_applied = db.session.query(func.count(CollegeFees.id)).filter(
-        CollegeFees.meera_rebate_applied == True,
-        CollegeFees.meera_rebate_amount > 0
-    ).scalar() or 0
-
-    need_approved = db.session.query(func.count(CollegeFees.id)).filter(
-        CollegeFees.meera_rebate_approved == True,
-        CollegeFees.meera_rebate_amount > 0
-    ).scalar() or 0
-
-    need_granted = db.session.query(func.count(CollegeFees.id)).filter(
-        CollegeFees.meera_rebate_granted == True,
-        CollegeFees.meera_rebate_amount > 0
-    ).scalar() or 0
-
-    scholarship_applied = [gov_scholarship_applied, meera_scholarship_applied, merit_applied, need_applied]
-    scholarship_approved = [gov_scholarship_approved, meera_scholarship_approved, merit_approved, need_approved]
-    scholarship_granted = [gov_scholarship_granted, meera_scholarship_granted, merit_granted, need_granted]
-
     return render_template('fees/fee_summary.html',
-                         total_fees_due=total_fees_due,
-                         total_fees_collected=total_fees_collected,
-                         total_pending_dues=total_pending_dues,
-                         students_with_dues=students_with_dues,
-                         monthly_collections=monthly_collections,
                          payment_modes=payment_modes,
                          payment_mode_counts=payment_mode_counts,
-                         course_names=course_names,
-                         course_collections=course_collections,
-                         scholarship_applied=scholarship_applied,
-                         scholarship_approved=scholarship_approved,
-                         scholarship_granted=scholarship_granted)
+                         **summary)
 
 @app.route('/fees/view/<int:fee_id>')
 @login_required
@@ -2898,7 +2338,7 @@ def student_fee_statement_pdf(student_id):
         return redirect(url_for('dashboard'))
 
     student = Student.query.get_or_404(student_id)
-    fee_record = CollegeFees.query.filter_by(student_id=student_id).first()
+    fee_record = fee_ledger.current_fee_record(student_id)
     invoices = Invoice.query.filter_by(student_id=student_id).order_by(Invoice.date_time.desc()).all()
 
     pdf_data = generate_pdf_fee_statement(student, fee_record, invoices)
@@ -2917,7 +2357,7 @@ def student_fee_statement_print(student_id):
         return redirect(url_for('dashboard'))
 
     student = Student.query.get_or_404(student_id)
-    fee_record = CollegeFees.query.filter_by(student_id=student_id).first()
+    fee_record = fee_ledger.current_fee_record(student_id)
 
     # Generate PDF without payment history for printing
     pdf_data = generate_pdf_fee_statement_print(student, fee_record)
@@ -2967,23 +2407,12 @@ def api_fee_summary_stats():
     try:
         year = request.args.get('year', datetime.now().year, type=int)
 
-        # Calculate total fees due, collected, and pending for selected year
-        total_fees_due = db.session.query(func.sum(CollegeFees.total_fee)).join(Student).filter(
-            func.extract('year', Student.admission_date) == year
-        ).scalar() or 0
-
-        total_fees_collected = db.session.query(func.sum(CollegeFees.total_fees_paid)).join(Student).filter(
-            func.extract('year', Student.admission_date) == year
-        ).scalar() or 0
-
-        total_pending_dues = max(0, total_fees_due - total_fees_collected)
-
-        students_with_dues = db.session.query(func.count(CollegeFees.id)).join(Student).filter(
-            and_(
-                CollegeFees.total_fees_paid < CollegeFees.total_fee,
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
+        # Totals for the selected year in one query
+        totals = fee_reports.fee_totals(year)
+        total_fees_due = totals['total_fees_due']
+        total_fees_collected = totals['total_fees_collected']
+        total_pending_dues = totals['total_pending_dues']
+        students_with_dues = totals['students_with_dues']
 
         return jsonify({
             'success': True,
@@ -3021,7 +2450,7 @@ def api_payment_mode_stats():
             and_(
                 CollegeFees.payment_mode.isnot(None),
                 CollegeFees.payment_mode != '',
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Student.admission_date, year)
             )
         ).group_by(CollegeFees.payment_mode).all()
 
@@ -3037,7 +2466,7 @@ def api_payment_mode_stats():
         total_actual = sum(payment_mode_dict.values())
         if total_actual == 0:
             total_invoices = db.session.query(func.count(Invoice.id)).join(Student).filter(
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Student.admission_date, year)
             ).scalar() or 0
 
             if total_invoices > 0:
@@ -3073,15 +2502,7 @@ def api_course_fee_stats():
         all_course_names = [course[0] for course in all_courses if course[0]]
 
         # Course-wise fee collection for selected year
-        course_collections_data = db.session.query(
-            Student.current_course,
-            func.sum(Invoice.invoice_amount)
-        ).join(Invoice).filter(
-            and_(
-                Student.current_course.isnot(None),
-                func.extract('year', Student.admission_date) == year
-            )
-        ).group_by(Student.current_course).all()
+        course_collections_data = fee_reports.course_collections(year)
 
         # Create a dictionary for easy lookup
         collections_dict = {course[0]: float(course[1]) for course in course_collections_data if course[1]}
@@ -3123,102 +2544,8 @@ def api_scholarship_stats():
     try:
         year = request.args.get('year', datetime.now().year, type=int)
 
-        # Government scholarship data for selected year
-        gov_scholarship_applied = db.session.query(func.count(Student.id)).filter(
-            and_(
-                Student.scholarship_status == 'Applied',
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        gov_scholarship_approved = db.session.query(func.count(Student.id)).filter(
-            and_(
-                Student.scholarship_status == 'Approved',
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        gov_scholarship_granted = db.session.query(func.count(Student.id)).filter(
-            and_(
-                Student.scholarship_status == 'Granted',
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        # Meera rebate data for selected year
-        meera_scholarship_applied = db.session.query(func.count(Student.id)).filter(
-            and_(
-                Student.rebate_meera_scholarship_status == 'Applied',
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        meera_scholarship_approved = db.session.query(func.count(Student.id)).filter(
-            and_(
-                Student.rebate_meera_scholarship_status == 'Approved',
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        meera_scholarship_granted = db.session.query(func.count(Student.id)).filter(
-            and_(
-                Student.rebate_meera_scholarship_status == 'Granted',
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        # Merit and need-based from fee records for selected year
-        merit_applied = db.session.query(func.count(CollegeFees.id)).join(Student).filter(
-            and_(
-                CollegeFees.scholarship_applied == True,
-                CollegeFees.government_scholarship_amount > 0,
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        merit_approved = db.session.query(func.count(CollegeFees.id)).join(Student).filter(
-            and_(
-                CollegeFees.scholarship_approved == True,
-                CollegeFees.government_scholarship_amount > 0,
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        merit_granted = db.session.query(func.count(CollegeFees.id)).join(Student).filter(
-            and_(
-                CollegeFees.scholarship_granted == True,
-                CollegeFees.government_scholarship_amount > 0,
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        need_applied = db.session.query(func.count(CollegeFees.id)).join(Student).filter(
-            and_(
-                CollegeFees.meera_rebate_applied == True,
-                CollegeFees.meera_rebate_amount > 0,
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        need_approved = db.session.query(func.count(CollegeFees.id)).join(Student).filter(
-            and_(
-                CollegeFees.meera_rebate_approved == True,
-                CollegeFees.meera_rebate_amount > 0,
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        need_granted = db.session.query(func.count(CollegeFees.id)).join(Student).filter(
-            and_(
-                CollegeFees.meera_rebate_granted == True,
-                CollegeFees.meera_rebate_amount > 0,
-                func.extract('year', Student.admission_date) == year
-            )
-        ).scalar() or 0
-
-        scholarship_applied = [gov_scholarship_applied, meera_scholarship_applied, merit_applied, need_applied]
-        scholarship_approved = [gov_scholarship_approved, meera_scholarship_approved, merit_approved, need_approved]
-        scholarship_granted = [gov_scholarship_granted, meera_scholarship_granted, merit_granted, need_granted]
+        # All twelve counts for the selected year in one query
+        scholarship_applied, scholarship_approved, scholarship_granted = fee_reports.scholarship_counts(year)
 
         return jsonify({
             'success': True,
@@ -3263,14 +2590,14 @@ def api_student_summary_stats():
 
         # Total admissions for the year
         total_admissions = Student.query.filter(
-            func.extract('year', Student.admission_date) == year
+            year_range_filter(Student.admission_date, year)
         ).count()
 
         # Government scholarship applied for the year
         gov_scholarship_applied = Student.query.filter(
             and_(
                 Student.scholarship_status == 'Applied',
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Student.admission_date, year)
             )
         ).count()
 
@@ -3278,7 +2605,7 @@ def api_student_summary_stats():
         meera_rebate_applied = Student.query.filter(
             and_(
                 Student.rebate_meera_scholarship_status == 'Applied',
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Student.admission_date, year)
             )
         ).count()
 
@@ -3316,7 +2643,7 @@ def api_student_category_stats():
         # Get all students for the selected year first
         all_students_query = db.session.query(Student).filter(
             and_(
-                func.extract('year', Student.admission_date) == year,
+                year_range_filter(Student.admission_date, year),
                 Student.admission_date.isnot(None)
             )
         )
@@ -3339,7 +2666,7 @@ def api_student_category_stats():
             func.count(Student.id)
         ).filter(
             and_(
-                func.extract('year', Student.admission_date) == year,
+                year_range_filter(Student.admission_date, year),
                 Student.admission_date.isnot(None)
             )
         ).group_by(Student.category).order_by(func.count(Student.id).desc()).all()
@@ -3399,7 +2726,7 @@ def api_monthly_admissions_stats():
         ).filter(
             and_(
                 Student.admission_date.isnot(None),
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Student.admission_date, year)
             )
         ).group_by(func.extract('month', Student.admission_date)).all()
 
@@ -3448,33 +2775,57 @@ def api_monthly_admissions_stats():
             'total_admissions': 0
         })
 
-@app.route('/api/exam-summary-stats')
+@app.route('/api/exam-dashboard')
 @login_required
-def api_exam_summary_stats():
+def api_exam_dashboard():
+    """All five exam summary panels for one admission year in a single response"""
     try:
         year = request.args.get('year', datetime.now().year, type=int)
+        dashboard = exam_analytics.exam_dashboard(year)
 
-        # Get exams for students admitted in the selected year
-        all_exams = Exam.query.join(Student).filter(
-            func.extract('year', Student.admission_date) == year
-        ).all()
+        return jsonify({
+            'success': True,
+            'year': year,
+            'stats': dashboard['stats'],
+            'grade_distribution': dashboard['grade_distribution'],
+            'subject_names': dashboard['subject_names'] or ['No Data'],
+            'subject_averages': dashboard['subject_averages'] or [0],
+            'course_names': dashboard['course_names'] or ['No Data'],
+            'course_averages': dashboard['course_averages'] or [0],
+            'semester_labels': dashboard['semester_labels'] or ['No Data'],
+            'semester_averages': dashboard['semester_averages'] or [0]
+        })
+    except Exception as e:
+        app.logger.error(f"Error in api_exam_dashboard: {e}")
+        return jsonify({
+            'success': False,
+            'stats': {
+                'total_exams': 0,
+                'pass_rate': 0.0,
+                'average_score': 0.0,
+                'failed_students': 0
+            },
+            'grade_distribution': [0, 0, 0, 0, 0, 0, 0],
+            'subject_names': ['Error Loading'],
+            'subject_averages': [0],
+            'course_names': ['Error Loading'],
+            'course_averages': [0],
+            'semester_labels': ['Error Loading'],
+            'semester_averages': [0]
+        })
 
-        total_exams = len(all_exams)
-        passed_exams = [exam for exam in all_exams if exam.overall_status == 'Pass']
-        failed_exams = [exam for exam in all_exams if exam.overall_status == 'Fail']
+@app.route('/api/exam-summary-stats')
+@login_required
+def api_exam_summary_stats():
+    try:
+        year = request.args.get('year', datetime.now().year, type=int)
 
-        pass_rate = (len(passed_exams) / total_exams * 100) if total_exams > 0 else 0
-        average_score = sum(exam.percentage for exam in all_exams) / total_exams if total_exams > 0 else 0
-        failed_students = len(failed_exams)
+        # Exams for students admitted in the selected year
+        dashboard = exam_analytics.exam_dashboard(year)
 
         return jsonify({
             'success': True,
-            'stats': {
-                'total_exams': total_exams,
-                'pass_rate': pass_rate,
-                'average_score': average_score,
-                'failed_students': failed_students
-            }
+            'stats': dashboard['stats']
         })
     except Exception as e:
         app.logger.error(f"Error in api_exam_summary_stats: {e}")
@@ -3494,16 +2845,7 @@ def api_grade_distribution_stats():
     try:
         year = request.args.get('year', datetime.now().year, type=int)
 
-        all_exams = Exam.query.join(Student).filter(
-            func.extract('year', Student.admission_date) == year
-        ).all()
-
-        grades = {}
-        for exam in all_exams:
-            grade = exam.grade or 'F'
-            grades[grade] = grades.get(grade, 0) + 1
-
-        grade_distribution = [grades.get(grade, 0) for grade in ['A+', 'A', 'B+', 'B', 'C+', 'C', 'F']]
+        grade_distribution = exam_analytics.exam_dashboard(year)['grade_distribution']
 
         return jsonify({
             'success': True,
@@ -3522,30 +2864,9 @@ def api_subject_performance_stats():
     try:
         year = request.args.get('year', datetime.now().year, type=int)
 
-        all_exams = Exam.query.join(Student).filter(
-            func.extract('year', Student.admission_date) == year
-        ).all()
-
-        subject_data = {}
-        for exam in all_exams:
-            subjects = [
-                (exam.subject1_name, exam.subject1_obtained_marks, exam.subject1_max_marks),
-                (exam.subject2_name, exam.subject2_obtained_marks, exam.subject2_max_marks),
-                (exam.subject3_name, exam.subject3_obtained_marks, exam.subject3_max_marks),
-                (exam.subject4_name, exam.subject4_obtained_marks, exam.subject4_max_marks),
-                (exam.subject5_name, exam.subject5_obtained_marks, exam.subject5_max_marks),
-                (exam.subject6_name, exam.subject6_obtained_marks, exam.subject6_max_marks),
-            ]
-
-            for name, obtained, max_marks in subjects:
-                if name and obtained is not None and max_marks and max_marks > 0:
-                    percentage = (obtained / max_marks) * 100
-                    if name not in subject_data:
-                        subject_data[name] = []
-                    subject_data[name].append(percentage)
-
-        subject_names = list(subject_data.keys())
-        subject_averages = [sum(scores) / len(scores) if scores else 0 for scores in subject_data.values()]
+        dashboard = exam_analytics.exam_dashboard(year)
+        subject_names = dashboard['subject_names']
+        subject_averages = dashboard['subject_averages']
 
         if not subject_names:
             subject_names = ['No Data']
@@ -3570,24 +2891,9 @@ def api_course_performance_stats():
     try:
         year = request.args.get('year', datetime.now().year, type=int)
 
-        all_exams = Exam.query.join(Student).filter(
-            func.extract('year', Student.admission_date) == year
-        ).all()
-
-        course_data = {}
-        for exam in all_exams:
-            course = exam.student.current_course
-            if course and exam.percentage is not None:
-                if course not in course_data:
-                    course_data[course] = []
-                course_data[course].append(float(exam.percentage))
-
-        course_names = []
-        course_averages = []
-        for course, scores in course_data.items():
-            if scores:
-                course_names.append(course)
-                course_averages.append(round(sum(scores) / len(scores), 1))
+        dashboard = exam_analytics.exam_dashboard(year)
+        course_names = dashboard['course_names']
+        course_averages = dashboard['course_averages']
 
         if not course_names:
             course_names = ['No Data']
@@ -3612,31 +2918,9 @@ def api_semester_trend_stats():
     try:
         year = request.args.get('year', datetime.now().year, type=int)
 
-        all_exams = Exam.query.join(Student).filter(
-            func.extract('year', Student.admission_date) == year
-        ).all()
-
-        semester_data = {}
-        for exam in all_exams:
-            semester = exam.semester
-            if semester and exam.percentage is not None:
-                if semester not in semester_data:
-                    semester_data[semester] = []
-                semester_data[semester].append(float(exam.percentage))
-
-        semester_labels = []
-        semester_averages = []
-        if semester_data:
-            sorted_semesters = sorted(semester_data.keys(), key=lambda x: (
-                x.split()[1] if len(x.split()) > 1 else x,
-                x.split()[0] if len(x.split()) > 1 else x
-            ))
-
-            for semester in sorted_semesters:
-                scores = semester_data[semester]
-                if scores:
-                    semester_labels.append(semester)
-                    semester_averages.append(round(sum(scores) / len(scores), 1))
+        dashboard = exam_analytics.exam_dashboard(year)
+        semester_labels = dashboard['semester_labels']
+        semester_averages = dashboard['semester_averages']
 
         if not semester_labels:
             semester_labels = ['No Data']
@@ -3761,7 +3045,7 @@ def api_debug_student_data():
         # Get all students for debugging
         all_students = Student.query.all()
         students_for_year = Student.query.filter(
-            func.extract('year', Student.admission_date) == year
+            year_range_filter(Student.admission_date, year)
         ).all()
 
         debug_info = {
@@ -3872,7 +3156,7 @@ def api_student_breakdown_data():
             and_(
                 Student.current_course.isnot(None),
                 Student.current_course != '',
-                func.extract('year', Student.admission_date) == year
+                year_range_filter(Student.admission_date, year)
             )
         ).group_by(Student.current_course).all()
 
@@ -3882,7 +3166,7 @@ def api_student_breakdown_data():
             func.count(Student.id)
         ).filter(
             and_(
-                func.extract('year', Student.admission_date) == year,
+                year_range_filter(Student.admission_date, year),
                 Student.admission_date.isnot(None)
             )
         ).group_by(Student.category).all()
@@ -4065,7 +3349,7 @@ def view_invoice(invoice_id):
 
     invoice = Invoice.query.get_or_404(invoice_id)
     student = Student.query.get_or_404(invoice.student_id)
-    fee_record = CollegeFees.query.filter_by(student_id=student.id).first()
+    fee_record = fee_ledger.current_fee_record(student.id)
 
     return render_template('fees/invoice_view.html', invoice=invoice, student=student, fee_record=fee_record)
 
@@ -4118,39 +3402,86 @@ def internal_error(error):
     return render_template('errors/500.html'), 500
 
 # Bulk Export Routes
+# Sheets that can go into a multi-sheet workbook: data_type -> (sheet title, data function)
+WORKBOOK_SHEETS = {
+    'students': ('Students', get_students_export_data),
+    'fees': ('Fees', get_fees_export_data),
+    'invoices': ('Invoices', get_invoices_export_data),
+    'exams': ('Exams', get_exams_export_data),
+    'courses': ('Courses', get_courses_export_data),
+    'course_details': ('Course Details', get_course_details_export_data),
+    'subjects': ('Subjects', get_subjects_export_data),
+}
+
+def _export_module(data_type):
+    """Module whose edit permission covers exporting data_type"""
+    return {'course_details': 'courses', 'invoices': 'fees'}.get(data_type, data_type)
+
+@app.route('/export/workbook')
+@login_required
+def bulk_export_workbook():
+    """Export several datasets as one Excel workbook, e.g. ?sheets=students,fees,invoices"""
+    data_types = [name.strip() for name in request.args.get('sheets', 'students,fees,invoices').split(',') if name.strip()]
+    if not data_types or any(name not in WORKBOOK_SHEETS for name in data_types):
+        flash('Invalid data type for export.', 'error')
+        return redirect(url_for('dashboard'))
+    if not all(can_edit_module(current_user, _export_module(name)) for name in data_types):
+        flash('You do not have permission to export this data.', 'error')
+        return redirect(url_for('dashboard'))
+
+    try:
+        sheets = []
+        for name in dict.fromkeys(data_types):
+            title, get_data = WORKBOOK_SHEETS[name]
+            data, headers = get_data()
+            sheets.append((title, data, headers))
+        filename = f'{"_".join(dict.fromkeys(data_types))}_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        return export_workbook(sheets, filename)
+
+    except Exception as e:
+        flash(f'Export failed: {str(e)}', 'error')
+        return redirect(url_for('dashboard'))
+
 @app.route('/export/<data_type>/<format>')
 @login_required
 def bulk_export(data_type, format):
     """Bulk export data in various formats"""
-    if not can_edit_module(current_user, data_type if data_type not in ['course_details', 'invoices'] else ('courses' if data_type == 'course_details' else 'fees')):
+    if not can_edit_module(current_user, _export_module(data_type)):
         flash('You do not have permission to export this data.', 'error')
         return redirect(url_for('dashboard'))
 
+    try:
+        # ?since=<ISO timestamp> exports only the rows changed since then (UTC)
+        since = change_feed.parse_since(request.args.get('since'))
+    except ValueError:
+        flash('Invalid "since" timestamp; use ISO 8601, e.g. 2025-01-31T18:00:00.', 'error')
+        return redirect(url_for('dashboard'))
+
     try:
         # Get data based on type
         if data_type == 'students':
-            data, headers = get_students_export_data()
+            data, headers = get_students_export_data(since)
             filename = f'students_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
         elif data_type == 'courses':
-            data, headers = get_courses_export_data()
+            data, headers = get_courses_export_data(since)
             filename = f'courses_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
         elif data_type == 'course_details':
-            data, headers = get_course_details_export_data()
+            data, headers = get_course_details_export_data(since)
             filename = f'course_details_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
         elif data_type == 'fees':
-            data, headers = get_fees_export_data()
+            data, headers = get_fees_export_data(since)
             filename = f'fees_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
         elif data_type == 'invoices':
-            data, headers = get_invoices_export_data()
+            data, headers = get_invoices_export_data(since)
             filename = f'invoices_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
         elif data_type == 'exams':
-            data, headers = get_exams_export_data()
+            data, headers = get_exams_export_data(since)
             filename = f'exams_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
         elif data_type == 'users':
-            data, headers = get_users_export_data()
+            data, headers = get_users_export_data(since)
             filename = f'users_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
         elif data_type == 'subjects':
-            data, headers = get_subjects_export_data()
+            data, headers = get_subjects_export_data(since)
             filename = f'subjects_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
         else:
             flash('Invalid data type for export.', 'error')
@@ -4163,6 +3494,12 @@ def bulk_export(data_type, format):
             return export_to_excel(data, headers, f'{filename}.xlsx')
         elif format == 'json':
             return export_to_json(data, headers, f'{filename}.json')
+        elif format == 'ndjson':
+            return export_to_ndjson(data, headers, f'{filename}.ndjson')
+        elif format == 'parquet':
+            return export_to_parquet(data, headers, f'{filename}.parquet')
+        elif format == 'arrow':
+            return export_to_arrow(data, headers, f'{filename}.arrow')
         else:
             flash('Invalid export format.', 'error')
             return redirect(url_for('dashboard'))
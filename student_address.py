@@ -0,0 +1,42 @@
+"""
+Write-time maintenance of students.concatenated_address.
+
+concatenated_address is derived from street, area_village, city_tehsil and
+state. It is recomputed whenever a student is inserted, or flushed with one of
+those fields changed, so readers (the students export among them) never have
+to rebuild and write it back. CONCATENATED_ADDRESS_SQL is the same rule in
+SQL, used by the 'student-addresses' reconcile step to backfill rows written
+outside the ORM in one UPDATE.
+"""
+
+from sqlalchemy import event, inspect
+
+from models import Student
+
+ADDRESS_FIELDS = ('street', 'area_village', 'city_tehsil', 'state')
+
+
+def _address_part_sql(column):
+    # Mirrors build_concatenated_address(): trimmed, blank and 'nan' parts dropped
+    trimmed = f"btrim({column}, E' \\t\\r\\n')"
+    return f"CASE WHEN lower({trimmed}) IN ('', 'nan') THEN NULL ELSE {trimmed} END"
+
+
+CONCATENATED_ADDRESS_SQL = f"concat_ws(', ', {', '.join(_address_part_sql(field) for field in ADDRESS_FIELDS)})"
+
+
+def _update_on_insert(mapper, connection, target):
+    target.update_concatenated_address()
+
+
+def _update_on_address_change(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in ADDRESS_FIELDS):
+        target.update_concatenated_address()
+
+
+def init_app(app):
+    """Register the flush hooks that keep concatenated_address current"""
+    if not event.contains(Student, 'before_insert', _update_on_insert):
+        event.listen(Student, 'before_insert', _update_on_insert)
+        event.listen(Student, 'before_update', _update_on_address_change)
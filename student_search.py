@@ -0,0 +1,95 @@
+"""
+Indexed student search.
+
+students.search_text is a generated column holding "<unique id> <first name>
+<last name> <current course>", with a pg_trgm GiST index on it
+(add_student_search_indexes.py). One search_text ILIKE '%term%' predicate
+replaces the OR of ILIKE/contains on each column and on
+concat(first_name, ' ', last_name) that the list pages used, none of which
+could use an index.
+
+search_students() backs the /api/search-students typeahead: unique-ID prefix
+matches come first (served by a text_pattern_ops btree on student_unique_id),
+then substring matches ranked by trigram distance. GiST hands rows back in
+distance order, so the query stops after `limit` rows however many students
+match; benchmark_student_search.py measures it.
+
+The fees, exams and invoices lists also match their own column (course,
+exam name, invoice number). An OR across the two tables of the join can't
+use either index, so search_ids() looks each side up through its own trigram
+index and unions the row ids instead.
+"""
+
+from sqlalchemy import select, text, union
+
+from app import db
+from models import Student
+
+TYPEAHEAD_LIMIT = 10
+
+TYPEAHEAD_SQL = """
+    WITH matches AS (
+        (SELECT id, 0 AS tier, 0::real AS distance
+         FROM students
+         WHERE student_unique_id LIKE :prefix
+           AND student_status != 'Graduated'
+         ORDER BY student_unique_id
+         LIMIT :limit)
+        UNION ALL
+        (SELECT id, 1 AS tier, search_text <-> :term AS distance
+         FROM students
+         WHERE search_text ILIKE :pattern
+           AND student_status != 'Graduated'
+         ORDER BY search_text <-> :term
+         LIMIT :limit)
+    )
+    SELECT s.id, s.student_unique_id, s.first_name, s.last_name, s.current_course
+    FROM (
+        SELECT id, MIN(tier) AS tier, MIN(distance) AS distance
+        FROM matches
+        GROUP BY id
+    ) m
+    JOIN students s ON s.id = m.id
+    ORDER BY m.tier, m.distance, s.student_unique_id
+    LIMIT :limit
+"""
+
+
+def _escape_like(term):
+    """Escape LIKE wildcards so a search term is matched literally (backslash is the default escape)"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _pattern(term):
+    return f'%{_escape_like(term.strip())}%'
+
+
+def search_filter(term):
+    """Student predicate matching term anywhere in the ID, name or current course"""
+    return Student.search_text.ilike(_pattern(term))
+
+
+def search_ids(term, id_column, student_id_column, *columns):
+    """Predicate on id_column: rows whose student matches term, or whose own columns contain it.
+
+    Each branch is an indexed lookup (search_text, or a trigram index on the
+    column from add_student_search_indexes.py); the branches are UNIONed.
+    """
+    pattern = _pattern(term)
+    branches = [
+        select(id_column).join(Student, Student.id == student_id_column).where(Student.search_text.ilike(pattern))
+    ]
+    branches += [select(id_column).where(column.ilike(pattern)) for column in columns]
+    return id_column.in_(union(*branches))
+
+
+def search_students(term, limit=TYPEAHEAD_LIMIT):
+    """Ranked typeahead matches for term among students who haven't graduated"""
+    term = term.strip()
+    escaped = _escape_like(term)
+    return db.session.execute(text(TYPEAHEAD_SQL), {
+        'prefix': f'{escaped.upper()}%',
+        'pattern': f'%{escaped}%',
+        'term': term,
+        'limit': limit,
+    }).mappings().all()
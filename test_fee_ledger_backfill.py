@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+Online backfill check for the fee payments ledger.
+
+A payment posted before migrate_fee_payments_ledger.py reaches its fee record
+must be numbered after the record's legacy installment slots, and the batch
+backfill + rollup must then keep every rupee: legacy payments plus the new one.
+"""
+
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app import app, db
+from models import Student, CollegeFees, FeePayment
+from fee_ledger import record_payment, next_installment_number, next_installment_numbers
+from migrate_fee_payments_ledger import BACKFILL_SQL, COLLISIONS_SQL, ROLLUP_SQL
+
+TEST_STUDENT_ID = 'TEST-LEDGER-0001'
+
+
+def cleanup():
+    student = Student.query.filter_by(student_unique_id=TEST_STUDENT_ID).first()
+    if student:
+        fee_ids = [fee.id for fee in CollegeFees.query.filter_by(student_id=student.id)]
+        if fee_ids:
+            FeePayment.query.filter(FeePayment.fee_id.in_(fee_ids)).delete(synchronize_session=False)
+            CollegeFees.query.filter(CollegeFees.id.in_(fee_ids)).delete(synchronize_session=False)
+        db.session.delete(student)
+    db.session.commit()
+
+
+def test_payment_before_backfill():
+    """Assert a payment taken before the backfill doesn't cost a legacy payment"""
+    with app.app_context():
+        cleanup()
+        try:
+            student = Student(student_unique_id=TEST_STUDENT_ID, first_name='Ledger', last_name='Test',
+                              gender='Male')
+            db.session.add(student)
+            db.session.flush()
+
+            # A record from before the ledger: two legacy payments, nothing in fee_payments yet
+            fee_record = CollegeFees(student_id=student.id, total_course_fees=Decimal('5000'),
+                                     installment_1=Decimal('1000'), invoice1_number='LEGACY-1',
+                                     installment_2=Decimal('500'), invoice2_number='LEGACY-2',
+                                     total_fees_paid=Decimal('1500'))
+            db.session.add(fee_record)
+            db.session.commit()
+
+            assert next_installment_number(fee_record) == 3, "New payment would reuse a legacy number"
+            assert next_installment_numbers([fee_record.id]) == {fee_record.id: 3}
+
+            payment = record_payment(fee_record, Decimal('700'), invoice_number='NEW-1', payment_mode='Cash')
+            db.session.commit()
+            print(f"✓ Payment posted before the backfill is installment {payment.installment_number}")
+            assert payment.installment_number == 3
+
+            # The migration's batch for this record
+            params = {'start_id': fee_record.id - 1, 'end_id': fee_record.id}
+            collisions = db.session.execute(text(COLLISIONS_SQL), params).all()
+            inserted = db.session.execute(text(BACKFILL_SQL), params).rowcount
+            db.session.execute(text(ROLLUP_SQL), params)
+            db.session.commit()
+            db.session.refresh(fee_record)
+
+            ledger = {p.installment_number: p.amount for p in
+                      FeePayment.query.filter_by(fee_id=fee_record.id)}
+            print(f"✓ Backfill copied {inserted} legacy payments, {len(collisions)} collisions; "
+                  f"ledger {dict(sorted(ledger.items()))}, total_fees_paid {fee_record.total_fees_paid}")
+            assert not collisions, "Legacy payment collided with the new payment"
+            assert ledger == {1: Decimal('1000'), 2: Decimal('500'), 3: Decimal('700')}
+            assert fee_record.total_fees_paid == Decimal('2200'), "total_fees_paid lost a payment"
+
+            print("\n✓ Payments taken during the backfill are preserved")
+        finally:
+            cleanup()
+
+if __name__ == "__main__":
+    test_payment_before_backfill()
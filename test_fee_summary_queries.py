@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""
+Query-count check for the fee summary aggregates.
+
+The fee summary page must stay at three round trips and the scholarship and
+fee-total APIs at one, however many statuses, months or courses there are.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app import app, db
+import fee_reports
+
+
+@contextmanager
+def count_queries():
+    """Count statements sent to the database inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def check(name, func, budget):
+    with count_queries() as statements:
+        result = func()
+    ok = len(statements) <= budget
+    print(f"{'✓' if ok else '✗'} {name}: {len(statements)} queries (budget {budget})")
+    return ok, result
+
+
+def test_fee_summary_queries():
+    """Assert the query budget of each aggregate"""
+    with app.app_context():
+        year = datetime.now().year
+        results = [
+            check('fee_summary_data()', fee_reports.fee_summary_data, 3),
+            check('scholarship_counts(year)', lambda: fee_reports.scholarship_counts(year), 1),
+            check('fee_totals(year)', lambda: fee_reports.fee_totals(year), 1),
+            check('course_collections(year)', lambda: fee_reports.course_collections(year), 1),
+        ]
+
+        summary = results[0][1]
+        assert len(summary['monthly_collections']) == 12
+        for key in ('scholarship_applied', 'scholarship_approved', 'scholarship_granted'):
+            assert len(summary[key]) == 4, key
+
+        assert all(ok for ok, _ in results), "Query budget exceeded"
+        print("\n✓ Fee summary aggregates are within their query budgets")
+
+if __name__ == "__main__":
+    test_fee_summary_queries()
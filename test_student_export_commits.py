@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+Commit-count check for the students export.
+
+Exporting students is a read: it must not commit or send INSERT/UPDATE/DELETE,
+however many students there are. concatenated_address is maintained on write
+(student_address.py), so the exported value must already match the address
+fields.
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import app, db
+from bulk_operations import get_students_export_data, export_to_csv
+from models import build_concatenated_address
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+@contextmanager
+def count_commits():
+    """Count commits and write statements inside the block"""
+    counts = {'commits': 0, 'writes': 0}
+
+    def after_commit(session):
+        counts['commits'] += 1
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(WRITE_STATEMENTS):
+            counts['writes'] += 1
+
+    event.listen(db.session, 'after_commit', after_commit)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counts
+    finally:
+        event.remove(db.session, 'after_commit', after_commit)
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_student_export_commits():
+    """Assert the students export makes no commits and no writes"""
+    with app.app_context():
+        with count_commits() as counts:
+            rows, headers = get_students_export_data()
+            rows = list(rows)
+        print(f"{'✓' if counts['commits'] == 0 else '✗'} get_students_export_data(): "
+              f"{len(rows)} rows, {counts['commits']} commits, {counts['writes']} writes")
+        assert counts['commits'] == 0, "Export committed"
+        assert counts['writes'] == 0, "Export wrote to the database"
+
+        address_columns = [headers.index(name) for name in ('Street', 'Area/Village', 'City/Tehsil', 'State')]
+        concatenated_column = headers.index('Concatenated Address')
+        stale = [row[0] for row in rows
+                 if row[concatenated_column] != build_concatenated_address(*(row[i] for i in address_columns))]
+        print(f"{'✓' if not stale else '✗'} {len(stale)} stale concatenated addresses")
+        assert not stale, f"Stale concatenated_address for {stale[:10]} (run flask reconcile student-addresses)"
+
+        with app.test_request_context('/export/students/csv'):
+            with count_commits() as counts:
+                rows, headers = get_students_export_data()
+                response = export_to_csv(rows, headers, 'students.csv')
+                body = response.get_data()
+        print(f"{'✓' if counts['commits'] == 0 else '✗'} export_to_csv(): "
+              f"{len(body)} bytes, {counts['commits']} commits, {counts['writes']} writes")
+        assert counts['commits'] == 0, "CSV export committed"
+        assert counts['writes'] == 0, "CSV export wrote to the database"
+
+        print("\n✓ The students export is read-only")
+
+if __name__ == "__main__":
+    test_student_export_commits()
@@ -1,6 +1,14 @@
+"""
+Rewrite every student's concatenated_address in the current format (comma
+separated, blank and NaN parts left out).
 
-from app import app, db
-from models import Student
+The work is done by the set-based "student-addresses" reconcile step
+(flask reconcile student-addresses), which updates only the rows whose
+address differs, in one UPDATE ... FROM.
+"""
+
+from app import app
+from reconcile import run_and_report
 
 def update_concatenated_address_format():
     """Update all existing concatenated_address fields to use comma separator and exclude NaN values"""
@@ -8,26 +16,9 @@ def update_concatenated_address_format():
     with app.app_context():
         try:
             print("Updating concatenated_address format for all students...")
-            
-            students = Student.query.all()
-            updated_count = 0
-            
-            for student in students:
-                old_address = student.concatenated_address
-                
-                # Update using the new format
-                student.update_concatenated_address()
-                
-                if old_address != student.concatenated_address:
-                    updated_count += 1
-                    print(f"Updated student {student.student_unique_id}: '{old_address}' -> '{student.concatenated_address}'")
-            
-            db.session.commit()
-            print(f"✓ Successfully updated {updated_count} student records")
-            print(f"✓ Total students processed: {len(students)}")
+            run_and_report(['student-addresses'])
             
         except Exception as e:
-            db.session.rollback()
             print(f"✗ Error updating concatenated addresses: {str(e)}")
 
 if __name__ == "__main__":
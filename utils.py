@@ -1,6 +1,6 @@
 import os
 import secrets
-from datetime import datetime
+from datetime import datetime, date
 from flask import current_app
 from flask_mail import Mail, Message
 from reportlab.lib.pagesizes import letter, A4
@@ -11,6 +11,7 @@ from reportlab.lib import colors
 from reportlab.lib.units import inch
 import io
 from reportlab.pdfgen import canvas
+from sqlalchemy import text, and_
 
 from app import db
 from models import Student, UserRole
@@ -18,42 +19,91 @@ from models import Student, UserRole
 # Initialize Flask-Mail
 mail = Mail()
 
+def allocate_student_ids(course_short, year, count=1):
+    """Reserve count consecutive student IDs (BA-25-001 style) for a course and admission year.
+
+    Works like allocate_invoice_numbers: one locked counter row per (course, year) is bumped
+    in a short transaction of its own, so a batch of any size costs a single round trip.
+    """
+    year_short = str(year)[-2:]  # Last 2 digits of year
+    prefix = f"{course_short}-{year_short}-"
+
+    with db.engine.begin() as connection:
+        last_number = connection.execute(text("""
+            UPDATE student_id_sequences
+            SET last_number = last_number + :count
+            WHERE course_short = :course_short AND year = :year
+            RETURNING last_number
+        """), {'count': count, 'course_short': course_short, 'year': int(year)}).scalar()
+
+        if last_number is None:
+            # First ID for this course and year: seed from students that already exist
+            last_number = connection.execute(text("""
+                INSERT INTO student_id_sequences (course_short, year, last_number)
+                SELECT :course_short, :year,
+                       COALESCE(MAX(CAST(SUBSTRING(student_unique_id FROM :suffix_start) AS INTEGER)), 0) + :count
+                FROM students
+                WHERE LEFT(student_unique_id, :prefix_length) = :prefix
+                  AND SUBSTRING(student_unique_id FROM :suffix_start) ~ '^[0-9]+$'
+                ON CONFLICT (course_short, year)
+                DO UPDATE SET last_number = student_id_sequences.last_number + :count
+                RETURNING last_number
+            """), {
+                'count': count, 'course_short': course_short, 'year': int(year), 'prefix': prefix,
+                'prefix_length': len(prefix), 'suffix_start': len(prefix) + 1,
+            }).scalar()
+
+    first_number = last_number - count + 1
+    return [f"{prefix}{number:03d}" for number in range(first_number, last_number + 1)]
+
 def generate_student_id(course_short, year):
     """Generate unique student ID like BA-25-001"""
-    year_short = str(year)[-2:]  # Last 2 digits of year
+    return allocate_student_ids(course_short, year, 1)[0]
 
-    # Find existing students for this course and year pattern
-    pattern = f"{course_short}-{year_short}-%"
-    existing_students = Student.query.filter(Student.student_unique_id.like(pattern)).all()
-
-    # Extract the highest number from existing IDs
-    max_number = 0
-    for student in existing_students:
-        try:
-            # Extract number from ID like "BA-25-001" -> 1
-            id_parts = student.student_unique_id.split('-')
-            if len(id_parts) >= 3:
-                number = int(id_parts[2])
-                max_number = max(max_number, number)
-        except (ValueError, IndexError):
-            continue
-
-    # Generate next number
-    next_number = max_number + 1
-    return f"{course_short}-{year_short}-{next_number:03d}"
+def allocate_invoice_numbers(count=1):
+    """Reserve count consecutive invoice numbers for today from the per-day counter row.
 
-def generate_invoice_number():
-    """Generate unique invoice number"""
+    The counter is bumped in its own short transaction, so the row lock is only held
+    for one statement and concurrent workers never receive the same number. Numbers
+    reserved by a payment that later fails are simply skipped (gaps are allowed).
+    """
     today = datetime.now()
     date_str = today.strftime("%Y%m%d")
 
-    # Count invoices for today
-    pattern = f"INV{date_str}%"
-    from models import Invoice
-    count = Invoice.query.filter(Invoice.invoice_number.like(pattern)).count()
+    with db.engine.begin() as connection:
+        last_number = connection.execute(text("""
+            UPDATE invoice_sequences
+            SET last_number = last_number + :count
+            WHERE sequence_date = :sequence_date
+            RETURNING last_number
+        """), {'count': count, 'sequence_date': today.date()}).scalar()
+
+        if last_number is None:
+            # First invoice of the day: seed the counter from any invoices already issued today
+            last_number = connection.execute(text("""
+                INSERT INTO invoice_sequences (sequence_date, last_number)
+                SELECT :sequence_date, COALESCE(MAX(CAST(SUBSTRING(invoice_number FROM 12) AS INTEGER)), 0) + :count
+                FROM invoices
+                WHERE invoice_number ~ :pattern
+                ON CONFLICT (sequence_date)
+                DO UPDATE SET last_number = invoice_sequences.last_number + :count
+                RETURNING last_number
+            """), {'count': count, 'sequence_date': today.date(), 'pattern': f"^INV{date_str}[0-9]+$"}).scalar()
+
+    first_number = last_number - count + 1
+    return [f"INV{date_str}{number:04d}" for number in range(first_number, last_number + 1)]
 
-    next_number = count + 1
-    return f"INV{date_str}{next_number:04d}"
+def generate_invoice_number():
+    """Generate unique invoice number"""
+    return allocate_invoice_numbers(1)[0]
+
+def year_range_filter(column, year):
+    """Filter a date/datetime column to one calendar year.
+
+    Compares against Jan 1 of the year and of the next year instead of
+    extract('year', column) == year, so PostgreSQL can use an index on the column.
+    """
+    return and_(column >= date(year, 1, 1), column < date(year + 1, 1, 1))
 
 def calculate_grade(percentage):
     """Calculate grade based on percentage"""
@@ -559,14 +609,7 @@ def generate_pdf_fee_statement(student, fee_record, invoices):
         content.append(Spacer(1, 20))
 
         # Fee summary
-        total_paid = (
-            (fee_record.installment_1 or 0) +
-            (fee_record.installment_2 or 0) +
-            (fee_record.installment_3 or 0) +
-            (fee_record.installment_4 or 0) +
-            (fee_record.installment_5 or 0) +
-            (fee_record.installment_6 or 0)
-        )
+        total_paid = fee_record.total_fees_paid or 0
 
         balance_due = (fee_record.total_fee or 0) - total_paid
 
@@ -693,14 +736,7 @@ def generate_pdf_fee_statement_print(student, fee_record):
         content.append(Spacer(1, 20))
 
         # Fee summary
-        total_paid = (
-            (fee_record.installment_1 or 0) +
-            (fee_record.installment_2 or 0) +
-            (fee_record.installment_3 or 0) +
-            (fee_record.installment_4 or 0) +
-            (fee_record.installment_5 or 0) +
-            (fee_record.installment_6 or 0)
-        )
+        total_paid = fee_record.total_fees_paid or 0
 
         balance_due = (fee_record.total_fee or 0) - total_paid
 